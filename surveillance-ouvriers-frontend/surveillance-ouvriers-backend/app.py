@@ -6,6 +6,10 @@ import datetime
 from dotenv import load_dotenv
 from flask_socketio import SocketIO
 from machine_learning import IsolationForestModel
+from sensor_cache import SensorResolutionCache
+from ingestion import SensorDataBuffer, ScoringWorkerPool
+from inference_service import InferenceService
+from retraining import retrain_models
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
 import smtplib
@@ -14,6 +18,9 @@ from email.mime.multipart import MIMEMultipart
 import logging
 import random
 import uuid
+import atexit
+import itertools
+import threading
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO, 
@@ -30,6 +37,40 @@ PREDICTION_THRESHOLD = int(os.environ.get('PREDICTION_THRESHOLD', 60))  # Rédui
 EMERGENCY_STOP_THRESHOLD = int(os.environ.get('EMERGENCY_STOP_THRESHOLD', 90))
 ENABLE_EMAIL_NOTIFICATIONS = os.environ.get('ENABLE_EMAIL_NOTIFICATIONS', 'false').lower() == 'true'
 ENABLE_PUSH_NOTIFICATIONS = os.environ.get('ENABLE_PUSH_NOTIFICATIONS', 'false').lower() == 'true'
+# Écriture différée des lectures de capteurs (group commit): N lignes ou T millisecondes
+SENSOR_DATA_BUFFERING = os.environ.get('SENSOR_DATA_BUFFERING', 'false').lower() == 'true'
+SENSOR_DATA_BUFFER_ROWS = int(os.environ.get('SENSOR_DATA_BUFFER_ROWS', 500))
+SENSOR_DATA_BUFFER_MS = int(os.environ.get('SENSOR_DATA_BUFFER_MS', 200))
+SENSOR_DATA_BUFFER_MAX_ROWS = int(os.environ.get('SENSOR_DATA_BUFFER_MAX_ROWS', 50000))
+SENSOR_DATA_BUFFER_BACKOFF_MS = int(os.environ.get('SENSOR_DATA_BUFFER_BACKOFF_MS', 100))
+SENSOR_DATA_BUFFER_MAX_BACKOFF_MS = int(os.environ.get('SENSOR_DATA_BUFFER_MAX_BACKOFF_MS', 30000))
+SENSOR_DATA_BUFFER_WAIT_MS = int(os.environ.get('SENSOR_DATA_BUFFER_WAIT_MS', 1000))
+# Scoring asynchrone: /api/sensor-data répond 202 et l'analyse est faite par un pool de workers
+ASYNC_SCORING = os.environ.get('ASYNC_SCORING', 'false').lower() == 'true'
+SCORING_WORKERS = int(os.environ.get('SCORING_WORKERS', 2))
+SCORING_BATCH_SIZE = int(os.environ.get('SCORING_BATCH_SIZE', 100))
+# Initialisation de l'historique du détecteur depuis la base au démarrage
+WARM_START = os.environ.get('WARM_START', 'true').lower() == 'true'
+WARM_START_ROWS = int(os.environ.get('WARM_START_ROWS', 10))
+WARM_START_WORKERS = int(os.environ.get('WARM_START_WORKERS', 4))
+# Inférence dans un pool de processus (0 = détecteur dans le processus Flask)
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))
+INFERENCE_BATCH_CAPACITY = int(os.environ.get('INFERENCE_BATCH_CAPACITY', 1024))
+# Registre des modèles versionnés (par capteur, type de machine ou par défaut)
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'model_registry')
+# Fenêtre (en lectures) des statistiques glissantes du détecteur (tendance, variance, pente du risque)
+DETECTOR_STATS_SPAN = int(os.environ.get('DETECTOR_STATS_SPAN', 10))
+# Prévisions de tendance par régression robuste (Huber) plutôt que par moindres carrés
+FORECAST_ROBUST = os.environ.get('FORECAST_ROBUST', 'false').lower() == 'true'
+# Modèle multivarié par machine (température, pression, vibration), évalué pour tout le parc à chaque cycle
+MULTIVARIATE_DETECTION = os.environ.get('MULTIVARIATE_DETECTION', 'false').lower() == 'true'
+# Réentraînement périodique des modèles sur les lectures enregistrées
+RETRAIN_ENABLED = os.environ.get('RETRAIN_ENABLED', 'false').lower() == 'true'
+RETRAIN_INTERVAL_HOURS = int(os.environ.get('RETRAIN_INTERVAL_HOURS', 24))
+RETRAIN_SAMPLE_SIZE = int(os.environ.get('RETRAIN_SAMPLE_SIZE', 50000))
+RETRAIN_CHUNK_SIZE = int(os.environ.get('RETRAIN_CHUNK_SIZE', 10000))
+RETRAIN_MIN_SAMPLES = int(os.environ.get('RETRAIN_MIN_SAMPLES', 1000))
+RETRAIN_N_JOBS = int(os.environ.get('RETRAIN_N_JOBS', -1))
 
 # Initialiser l'application
 app = Flask(__name__)
@@ -50,18 +91,17 @@ def jwt_required(optional=None):
     return wrapper
 
 # Import des modèles et initialisation de la base de données
-from database import init_db, get_database_uri, get_sensor_data_timeseries, get_anomaly_count_by_machine
-from models import db, User, Machine, Sensor, SensorData, Alert
+from database import init_db, configure_database, get_database_uri, get_sensor_data_timeseries, get_anomaly_count_by_machine, insert_sensor_readings, get_recent_sensor_readings, get_latest_sensor_states, migrate_schema, iter_sensor_values, load_sensor_thresholds
+from models import db, User, Machine, Sensor, SensorData, SensorLatest, SensorRollup, Alert
 
-# Configurer et initialiser la base de données
+# Configurer et initialiser la base de données (profil SQLite: WAL, une connexion d'écriture,
+# un pool de connexions de lecture)
 app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialiser la base de données avec l'application Flask
-db.init_app(app)
+configure_database(app)
 
 with app.app_context():
     db.create_all()
+    migrate_schema()
     
     # Import models here to avoid circular imports
     from models import User, Machine, Sensor
@@ -240,6 +280,258 @@ with app.app_context():
 # Dictionnaire pour stocker les états d'arrêt d'urgence
 emergency_stops = {}
 
+# Cache de résolution (machine_id, sensor_type) -> identifiants, statut et limites pour l'ingestion
+sensor_cache = SensorResolutionCache()
+
+def resolve_sensor(machine_id, sensor_type):
+    """
+    Résout (machine_id public, type de capteur) via le cache, puis la base en cas d'échec.
+    Crée le capteur s'il n'existe pas encore. Retourne None si la machine est inconnue.
+    """
+    entry = sensor_cache.get(machine_id, sensor_type)
+    if entry is not None:
+        return entry
+    
+    machine = Machine.query.filter_by(machine_id=machine_id).first()
+    if not machine:
+        return None
+    
+    sensor = Sensor.query.filter_by(machine_id=machine.id, type=sensor_type).first()
+    if not sensor:
+        # Créer le capteur s'il n'existe pas
+        sensor = Sensor(machine_id=machine.id, type=sensor_type)
+        db.session.add(sensor)
+        db.session.commit()
+    
+    entry = SensorResolutionCache.build_entry(machine, sensor)
+    sensor_cache.put(machine_id, sensor_type, entry)
+    return entry
+
+# Limites d'un capteur modifiables par l'API d'administration (seuils du détecteur)
+SENSOR_LIMIT_FIELDS = ('min_value', 'max_value', 'normal_range_min', 'normal_range_max')
+
+def sensor_spec_type(spec):
+    """Type d'un capteur de l'API d'administration: chaîne ou dictionnaire {'type': ..., limites}"""
+    return spec['type'] if isinstance(spec, dict) else spec
+
+def apply_sensor_limits(sensor, spec):
+    """Applique au capteur les limites fournies par un dictionnaire de l'API d'administration"""
+    if isinstance(spec, dict):
+        for field in SENSOR_LIMIT_FIELDS:
+            if field in spec:
+                setattr(sensor, field, spec[field])
+
+def refresh_sensor_thresholds(machine_id, removed_types=()):
+    """Recompile dans le détecteur les seuils des capteurs d'une machine (après création/modification)"""
+    thresholds = {(machine_id, sensor_type): None for sensor_type in removed_types}
+    thresholds.update(load_sensor_thresholds(machine_id))
+    anomaly_model.set_sensor_thresholds(thresholds)
+
+def flush_sensor_readings(rows):
+    """Écrit un lot de lectures du tampon avec une seule insertion et un seul commit."""
+    with app.app_context():
+        try:
+            insert_sensor_readings(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+# Service d'inférence multi-processus (optionnel). Créé avant le démarrage des threads
+# d'arrière-plan, car ses processus sont démarrés par fork
+inference_service = None
+if INFERENCE_PROCESSES > 0:
+    inference_service = InferenceService(processes=INFERENCE_PROCESSES, batch_capacity=INFERENCE_BATCH_CAPACITY,
+                                         registry_dir=MODEL_REGISTRY_DIR, stats_span=DETECTOR_STATS_SPAN,
+                                         robust_forecast=FORECAST_ROBUST)
+    atexit.register(inference_service.stop)
+
+# Tampon d'écriture différée (optionnel); vidé à l'arrêt du processus
+sensor_data_buffer = None
+if SENSOR_DATA_BUFFERING:
+    sensor_data_buffer = SensorDataBuffer(
+        flush_sensor_readings,
+        max_rows=SENSOR_DATA_BUFFER_ROWS,
+        max_delay_ms=SENSOR_DATA_BUFFER_MS,
+        max_buffered_rows=SENSOR_DATA_BUFFER_MAX_ROWS,
+        retry_backoff_ms=SENSOR_DATA_BUFFER_BACKOFF_MS,
+        max_backoff_ms=SENSOR_DATA_BUFFER_MAX_BACKOFF_MS,
+        max_wait_ms=SENSOR_DATA_BUFFER_WAIT_MS
+    )
+    sensor_data_buffer.start()
+    atexit.register(sensor_data_buffer.stop)
+    logger.info(f"Écriture différée des données activée ({SENSOR_DATA_BUFFER_ROWS} lignes / {SENSOR_DATA_BUFFER_MS} ms)")
+
+def score_sensor_readings(items):
+    """
+    Analyse un micro-lot de lectures en mode asynchrone: crée les alertes,
+    déclenche les arrêts d'urgence et notifie les clients.
+    """
+    stopped_machines = set()
+    emissions = []
+    with app.app_context():
+        try:
+            # Statut de chaque machine, chargé une fois pour le micro-lot et mis à jour par les arrêts
+            # d'urgence du lot. Les lectures d'une machine déjà arrêtée (seuil critique, micro-lot
+            # précédent ou lecture précédente de ce lot) ne sont plus analysées: elles ne créent pas
+            # d'alerte et ne modifient pas l'état du détecteur
+            machine_statuses = dict(db.session.query(Machine.id, Machine.status).filter(
+                Machine.id.in_({item['machine_pk'] for item in items})).all())
+            machine_items = {}
+            for item in items:
+                machine_items.setdefault(item['machine_pk'], []).append(item)
+            
+            # Un passage du modèle par vague (la k-ième lecture de chaque machine), pour que l'arrêt
+            # déclenché par une lecture s'applique aux lectures suivantes de la même machine
+            for wave in itertools.zip_longest(*machine_items.values()):
+                wave = [item for item in wave
+                        if item is not None and machine_statuses.get(item['machine_pk']) != 'emergency_stop']
+                if not wave:
+                    break
+                predictions = anomaly_model.predict_batch([{
+                    'machine_id': item['machine_id'],
+                    'sensor_type': item['sensor_type'],
+                    'value': item['value'],
+                    'timestamp': item['timestamp']
+                } for item in wave])
+                
+                for item, prediction_result in zip(wave, predictions):
+                    # Les dépassements de seuil critique ont déjà été traités lors de la réception
+                    if item['hard_stop']:
+                        continue
+                    if not (prediction_result['anomaly'] and prediction_result['risk_probability'] >= PREDICTION_THRESHOLD):
+                        continue
+                    
+                    alert = Alert(
+                        machine_id=item['machine_pk'],
+                        sensor_id=item['sensor_pk'],
+                        sensor_type=item['sensor_type'],
+                        value=item['value'],
+                        message=prediction_result['prediction'],
+                        risk_level=prediction_result['risk_probability'],
+                        suggestions=','.join(prediction_result['suggestions']),
+                        model_version=prediction_result.get('model_version'),
+                        status='active',
+                        timestamp=item['timestamp']
+                    )
+                    db.session.add(alert)
+                    emissions.append(('new_alert', alert, {
+                        'machine_id': item['machine_id'],
+                        'sensor_type': item['sensor_type'],
+                        'value': item['value'],
+                        'timestamp': item['timestamp'].isoformat(),
+                        'risk_probability': prediction_result['risk_probability'],
+                        'suggestions': prediction_result['suggestions'],
+                        'message': prediction_result['prediction']
+                    }))
+                    
+                    if prediction_result['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
+                        machine = Machine.query.get(item['machine_pk'])
+                        machine.status = 'emergency_stop'
+                        machine_statuses[item['machine_pk']] = 'emergency_stop'
+                        emergency_stops[machine.machine_id] = True
+                        stopped_machines.add(machine.machine_id)
+                        emissions.append(('emergency_stop', None, {
+                            'machine_id': machine.machine_id,
+                            'reason': f"Arrêt d'urgence automatique - {item['sensor_type']} anormal ({item['value']})",
+                            'timestamp': datetime.datetime.now().isoformat()
+                        }))
+                        send_email_notification(
+                            f"URGENT: Arrêt d'urgence pour {machine.name}",
+                            f"La machine {machine.name} ({machine.machine_id}) a été arrêtée automatiquement.\n"
+                            f"Capteur: {item['sensor_type']}\n"
+                            f"Valeur: {item['value']}\n"
+                            f"Probabilité de risque: {prediction_result['risk_probability']}%\n"
+                            f"Suggestions: {', '.join(prediction_result['suggestions'])}"
+                        )
+            
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        for machine_id in stopped_machines:
+            sensor_cache.invalidate_machine(machine_id)
+        for event, alert, payload in emissions:
+            if alert is not None:
+                payload['_id'] = str(alert.id)
+            socketio.emit(event, payload)
+
+# Pool de scoring asynchrone (optionnel); les lectures en attente sont analysées à l'arrêt
+scoring_pool = None
+if ASYNC_SCORING:
+    scoring_pool = ScoringWorkerPool(
+        score_sensor_readings,
+        workers=SCORING_WORKERS,
+        batch_size=SCORING_BATCH_SIZE
+    )
+    scoring_pool.start()
+    atexit.register(scoring_pool.stop)
+    logger.info(f"Scoring asynchrone activé ({SCORING_WORKERS} workers, lots de {SCORING_BATCH_SIZE})")
+
+def hard_threshold_stop(resolved, machine_id, sensor_type, value, timestamp):
+    """
+    Arrêt d'urgence immédiat sur dépassement d'un seuil critique, évalué pendant la requête
+    en mode asynchrone pour ne pas retarder la mise en sécurité de la machine.
+    """
+    machine = Machine.query.get(resolved.machine_pk)
+    thresholds = anomaly_model.sensor_thresholds(machine_id, sensor_type)
+    condition = 'high' if value >= thresholds['critical_high'] else 'low'
+    suggestions = anomaly_model.suggestions[sensor_type][condition]
+    message = f"{sensor_type.capitalize()} critique - Arrêt immédiat nécessaire"
+    
+    alert = Alert(
+        machine_id=resolved.machine_pk,
+        sensor_id=resolved.sensor_pk,
+        sensor_type=sensor_type,
+        value=value,
+        message=message,
+        risk_level=100,
+        suggestions=','.join(suggestions),
+        status='active',
+        timestamp=timestamp
+    )
+    db.session.add(alert)
+    machine.status = 'emergency_stop'
+    emergency_stops[machine_id] = True
+    db.session.commit()
+    sensor_cache.invalidate_machine(machine_id)
+    
+    socketio.emit('new_alert', {
+        'machine_id': machine_id,
+        'sensor_type': sensor_type,
+        'value': value,
+        'timestamp': timestamp.isoformat(),
+        'risk_probability': 100,
+        'suggestions': suggestions,
+        'message': message,
+        '_id': str(alert.id)
+    })
+    socketio.emit('emergency_stop', {
+        'machine_id': machine_id,
+        'reason': f"Arrêt d'urgence automatique - {sensor_type} hors seuil critique ({value})",
+        'timestamp': datetime.datetime.now().isoformat()
+    })
+    send_email_notification(
+        f"URGENT: Arrêt d'urgence pour {machine.name}",
+        f"La machine {machine.name} ({machine_id}) a été arrêtée automatiquement.\n"
+        f"Capteur: {sensor_type}\n"
+        f"Valeur: {value} (seuil critique dépassé)\n"
+        f"Suggestions: {', '.join(suggestions)}"
+    )
+
+def store_sensor_readings(rows):
+    """
+    Enregistre des lectures (dictionnaires sensor_id/value/timestamp): dans le tampon
+    d'écriture différée s'il est actif, sinon dans la transaction courante.
+    Retourne le nombre de lectures acceptées (les premières de la liste): il peut être
+    inférieur à len(rows) si le tampon est plein.
+    """
+    if sensor_data_buffer is not None:
+        return sensor_data_buffer.extend(rows)
+    insert_sensor_readings(rows)
+    return len(rows)
+
 # Configurer le planificateur de tâches
 scheduler = BackgroundScheduler()
 
@@ -248,138 +540,176 @@ def send_sensor_updates():
     with app.app_context():
         try:
             logger.info("Génération des données de capteurs en temps réel...")
-            machines = Machine.query.all()  # Inclure toutes les machines, pas juste actives
+            stopped_machines = []
+            new_rows = []
+            fleet_readings = {}  # machine_id -> {type de capteur: valeur} (modèle multivarié)
+            trend_readings = []  # (machine_id, type de capteur, valeur, horodatage, prédiction)
             
-            for machine in machines:
-                # Filtrer pour n'avoir que les capteurs que nous voulons
-                sensors = Sensor.query.filter(Sensor.machine_id == machine.id, 
-                                             Sensor.type.in_(['temperature', 'pressure', 'vibration'])).all()
+            # Capteurs de toutes les machines (pas seulement actives) et leur dernière lecture,
+            # en une seule requête sur la table sensor_latest
+            fleet = get_latest_sensor_states(sensor_types=['temperature', 'pressure', 'vibration'])
+            cycle = []  # (machine, capteur, valeur, horodatage)
+            for machine, sensor, last_value in fleet:
+                # Générer une nouvelle valeur pour le capteur
+                # Valeur par défaut si aucune donnée n'existe
+                base_value = 0
+                if sensor.type == 'temperature':
+                    base_value = 50  # Température en °C
+                elif sensor.type == 'pressure':
+                    base_value = 100  # Pression en bar
+                elif sensor.type == 'vibration':
+                    base_value = 0.5  # Vibration en Hz
                 
-                for sensor in sensors:
-                    # Générer une nouvelle valeur pour le capteur
-                    last_value = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).first()
-                    
-                    # Valeur par défaut si aucune donnée n'existe
-                    base_value = 0
-                    if sensor.type == 'temperature':
-                        base_value = 50  # Température en °C
-                    elif sensor.type == 'pressure':
-                        base_value = 100  # Pression en bar
-                    elif sensor.type == 'vibration':
-                        base_value = 0.5  # Vibration en Hz
-                    
-                    new_value = base_value if not last_value else last_value.value
-                    
-                    # Ajouter une variation aléatoire
-                    if sensor.type == 'temperature':
-                        variation = random.uniform(-5, 5)  # Variation plus grande pour température
-                    elif sensor.type == 'pressure':
-                        variation = random.uniform(-10, 10)  # Variation moyenne pour pression
-                    elif sensor.type == 'vibration':
-                        variation = random.uniform(-0.1, 0.1)  # Petite variation pour vibration
-                    else:
-                        variation = random.uniform(-2, 2)
-                    
-                    new_value = max(sensor.min_value, min(sensor.max_value, new_value + variation))
-                    
-                    # Créer une nouvelle entrée de données
-                    timestamp = datetime.datetime.now()
-                    new_data = SensorData(
-                        sensor_id=sensor.id,
-                        value=new_value,
-                        timestamp=timestamp
-                    )
-                    db.session.add(new_data)
-                    
-                    # Envoyer les données mises à jour aux clients abonnés
-                    sensor_data = {
-                        'machine_id': machine.machine_id,
-                        'sensor_type': sensor.type,
-                        'value': new_value,
-                        'unit': sensor.unit,
-                        'timestamp': timestamp.isoformat()
-                    }
-                    
-                    logger.info(f"Données envoyées: {sensor.type} pour {machine.name} = {new_value} {sensor.unit}")
-                    socketio.emit('sensor_update', sensor_data)
-                    
-                    # Analyse des données pour la détection d'anomalies
-                    prediction = anomaly_model.predict({
-                        'machine_id': machine.id,
-                        'sensor_type': sensor.type,
-                        'value': new_value,
-                        'timestamp': timestamp.isoformat()
-                    })
+                new_value = base_value if not last_value else last_value.value
+                
+                # Ajouter une variation aléatoire
+                if sensor.type == 'temperature':
+                    variation = random.uniform(-5, 5)  # Variation plus grande pour température
+                elif sensor.type == 'pressure':
+                    variation = random.uniform(-10, 10)  # Variation moyenne pour pression
+                elif sensor.type == 'vibration':
+                    variation = random.uniform(-0.1, 0.1)  # Petite variation pour vibration
+                else:
+                    variation = random.uniform(-2, 2)
+                
+                new_value = max(sensor.min_value, min(sensor.max_value, new_value + variation))
+                
+                # Créer une nouvelle entrée de données
+                timestamp = datetime.datetime.now()
+                new_rows.append({
+                    'sensor_id': sensor.id,
+                    'value': new_value,
+                    'timestamp': timestamp
+                })
+                cycle.append((machine, sensor, new_value, timestamp))
+            
+            # Enregistrer toutes les lectures du cycle en une fois. Seules les lectures acceptées
+            # (tampon plein) sont diffusées et analysées
+            accepted = store_sensor_readings(new_rows)
+            if accepted < len(cycle):
+                logger.warning(f"Tampon de données plein: {len(cycle) - accepted} lectures du cycle ni diffusées ni analysées")
+                if not accepted:
+                    db.session.rollback()
+                    return
+                cycle = cycle[:accepted]
+            
+            for machine, sensor, new_value, timestamp in cycle:
+                fleet_readings.setdefault(machine.machine_id, {})[sensor.type] = new_value
+                
+                # Envoyer les données mises à jour aux clients abonnés
+                sensor_data = {
+                    'machine_id': machine.machine_id,
+                    'sensor_type': sensor.type,
+                    'value': new_value,
+                    'unit': sensor.unit,
+                    'timestamp': timestamp.isoformat()
+                }
+                
+                logger.info(f"Données envoyées: {sensor.type} pour {machine.name} = {new_value} {sensor.unit}")
+                socketio.emit('sensor_update', sensor_data)
+                
+                # Analyse des données pour la détection d'anomalies
+                prediction = anomaly_model.predict({
+                    'machine_id': machine.machine_id,
+                    'sensor_type': sensor.type,
+                    'value': new_value,
+                    'timestamp': timestamp.isoformat()
+                })
+                
+                # Si le risque est suffisamment élevé, créer une alerte
+                if prediction['risk_probability'] >= PREDICTION_THRESHOLD:
+                    """
+                    # Vérifier si une alerte similaire existe déjà
+                    existing_alert = Alert.query.filter_by(
+                        machine_id=machine.id,
+                        sensor_type=sensor.type,
+                        status='active'
+                    ).first()
                     
-                    # Si le risque est suffisamment élevé, créer une alerte
-                    if prediction['risk_probability'] >= PREDICTION_THRESHOLD:
-                        """
-                        # Vérifier si une alerte similaire existe déjà
-                        existing_alert = Alert.query.filter_by(
+                    if not existing_alert:
+                        # Trouver d'abord le capteur correspondant
+                        sensor = Sensor.query.filter_by(machine_id=machine.id, type=sensor.type).first()
+                        
+                        alert = Alert(
                             machine_id=machine.id,
-                            sensor_type=sensor.type,
-                            status='active'
-                        ).first()
+                            sensor_id=sensor.id,
+                            sensor_type=sensor.type,  # Utiliser le nouveau champ
+                            value=new_value,
+                            message=prediction['prediction'],  # Maintenant prediction est une chaîne
+                            risk_level=prediction['risk_probability'],
+                            suggestions=','.join(prediction['suggestions']),
+                            timestamp=timestamp
+                        )
+                        db.session.add(alert)
                         
-                        if not existing_alert:
-                            # Trouver d'abord le capteur correspondant
-                            sensor = Sensor.query.filter_by(machine_id=machine.id, type=sensor.type).first()
-                            
-                            alert = Alert(
-                                machine_id=machine.id,
-                                sensor_id=sensor.id,
-                                sensor_type=sensor.type,  # Utiliser le nouveau champ
-                                value=new_value,
-                                message=prediction['prediction'],  # Maintenant prediction est une chaîne
-                                risk_level=prediction['risk_probability'],
-                                suggestions=','.join(prediction['suggestions']),
-                                timestamp=timestamp
-                            )
-                            db.session.add(alert)
-                            
-                            # Préparer les données pour l'émission
-                            alert_data = {
-                                'machine_id': machine.machine_id,
-                                'sensor_type': sensor.type,
-                                'value': new_value,
-                                'risk_level': prediction['risk_probability'],
-                                'message': prediction['prediction'],  # Maintenant prediction est une chaîne
-                                'suggestions': prediction['suggestions'],
-                                'timestamp': timestamp.isoformat(),
-                                '_id': str(random.randint(1000, 9999))  # ID temporaire
-                            }
-                            
-                            # Notifier les clients
-                            socketio.emit('new_alert', alert_data)
-                            logger.info(f"Alerte émise: {prediction['prediction']} (Risque: {prediction['risk_probability']}%)")
-                        """
-                        pass  # Ne rien faire, pas d'alertes automatiques
-                    
-                    # Si une prédiction de tendance est disponible, l'envoyer aux clients
-                    if 'time_to_threshold' in prediction and prediction['time_to_threshold'] is not None:
-                        trend_data = {
+                        # Préparer les données pour l'émission
+                        alert_data = {
                             'machine_id': machine.machine_id,
                             'sensor_type': sensor.type,
-                            'current_value': new_value,
-                            'future_value': prediction.get('future_value'),
-                            'time_to_threshold': prediction['time_to_threshold'],
-                            'timestamp': timestamp.isoformat()
-                        }
-                        socketio.emit('trend_prediction', trend_data)
-                    
-                    # Arrêt d'urgence si le risque est extrêmement élevé
-                    if prediction['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
-                        machine.status = 'emergency_stopped'
-                        emergency_stop_data = {
-                            'machine_id': machine.machine_id,
-                            'reason': f"Arrêt d'urgence automatique - {prediction['prediction']}",
-                            'timestamp': timestamp.isoformat()
+                            'value': new_value,
+                            'risk_level': prediction['risk_probability'],
+                            'message': prediction['prediction'],  # Maintenant prediction est une chaîne
+                            'suggestions': prediction['suggestions'],
+                            'timestamp': timestamp.isoformat(),
+                            '_id': str(random.randint(1000, 9999))  # ID temporaire
                         }
-                        socketio.emit('emergency_stop', emergency_stop_data)
-                        logger.warning(f"Arrêt d'urgence pour {machine.name}: {prediction['prediction']}")
+                        
+                        # Notifier les clients
+                        socketio.emit('new_alert', alert_data)
+                        logger.info(f"Alerte émise: {prediction['prediction']} (Risque: {prediction['risk_probability']}%)")
+                    """
+                    pass  # Ne rien faire, pas d'alertes automatiques
+                
+                # Prédiction de tendance envoyée après le cycle (une prévision pour tout le parc)
+                trend_readings.append((machine.machine_id, sensor.type, new_value, timestamp, prediction))
+                
+                # Arrêt d'urgence si le risque est extrêmement élevé
+                if prediction['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
+                    machine.status = 'emergency_stopped'
+                    stopped_machines.append(machine.machine_id)
+                    emergency_stop_data = {
+                        'machine_id': machine.machine_id,
+                        'reason': f"Arrêt d'urgence automatique - {prediction['prediction']}",
+                        'timestamp': timestamp.isoformat()
+                    }
+                    socketio.emit('emergency_stop', emergency_stop_data)
+                    logger.warning(f"Arrêt d'urgence pour {machine.name}: {prediction['prediction']}")
+        
+            # Tendances: une seule régression vectorisée sur les dernières lectures de tous les capteurs
+            forecasts = anomaly_model.forecast_sensors([(machine_id, sensor_type)
+                                                        for machine_id, sensor_type, _, _, _ in trend_readings])
+            for (machine_id, sensor_type, value, timestamp, prediction), trend in zip(trend_readings, forecasts):
+                trend = trend or {}
+                socketio.emit('trend_prediction', {
+                    'machine_id': machine_id,
+                    'sensor_type': sensor_type,
+                    'current_value': value,
+                    'future_value': trend.get('future_value', prediction.get('future_value')),
+                    'time_to_threshold': trend.get('time_to_threshold', prediction.get('time_to_threshold')),
+                    'slope_per_minute': trend.get('slope_per_minute'),
+                    'minutes_to_critical_high': trend.get('minutes_to_critical_high'),
+                    'minutes_to_critical_low': trend.get('minutes_to_critical_low'),
+                    'timestamp': timestamp.isoformat()
+                })
+            
+            # Modèle multivarié: un seul appel pour tout le parc, sur les lectures alignées par machine
+            if MULTIVARIATE_DETECTION and fleet_readings:
+                machine_scores = anomaly_model.score_machines(fleet_readings)
+                for machine_id, score in machine_scores.items():
+                    if score['anomaly']:
+                        socketio.emit('machine_anomaly', {
+                            'machine_id': machine_id,
+                            'risk_level': score['risk_probability'],
+                            'main_sensor': score['main_sensor'],
+                            'readings': fleet_readings[machine_id],
+                            'timestamp': datetime.datetime.now().isoformat()
+                        })
+                        logger.warning(f"Anomalie combinée des capteurs pour {machine_id} "
+                                       f"(Risque: {score['risk_probability']}%, capteur principal: {score['main_sensor']})")
             
-            # Commit les changements à la base de données
             db.session.commit()
+            for machine_id in stopped_machines:
+                sensor_cache.invalidate_machine(machine_id)
             logger.info("Génération de données de capteurs terminée avec succès.")
             
         except Exception as e:
@@ -389,32 +719,18 @@ def send_sensor_updates():
 # Fonction pour obtenir les prédictions pour une machine
 def get_machine_predictions(machine_id):
     try:
-        # Obtenir les données récentes des capteurs
-        recent_data = []
-        sensors = Sensor.query.filter_by(machine_id=machine_id).all()
+        machine = Machine.query.get(machine_id)
         
-        for sensor in sensors:
-            # Récupérer les 10 dernières valeurs du capteur
-            data_points = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).limit(10).all()
-            
-            if data_points:
-                for point in data_points:
-                    recent_data.append({
-                        'machine_id': machine_id,
-                        'sensor_type': sensor.type,
-                        'value': point.value,
-                        'timestamp': point.timestamp.isoformat()
-                    })
-        
-        # Faire des prédictions pour chaque type de capteur
+        # Faire des prédictions pour chaque type de capteur, sur sa dernière valeur
         predictions = {}
-        for sensor in sensors:
-            sensor_data = [d for d in recent_data if d['sensor_type'] == sensor.type]
-            
-            if sensor_data:
-                # Prendre la dernière valeur pour prédiction
-                last_data = sensor_data[0]
-                prediction = anomaly_model.predict(last_data)
+        for _, sensor, last_data in get_latest_sensor_states(machine.machine_id):
+            if last_data:
+                prediction = anomaly_model.evaluate({
+                    'machine_id': machine.machine_id,
+                    'sensor_type': sensor.type,
+                    'value': last_data.value,
+                    'timestamp': last_data.timestamp.isoformat()
+                })
                 
                 predictions[sensor.type] = {
                     'risk_probability': prediction['risk_probability'],
@@ -463,73 +779,67 @@ def analyze_predictions_and_create_alerts():
     with app.app_context():
         try:
             logger.info("Analyse des prédictions automatique pour générer des alertes...")
-            machines = Machine.query.all()
             
-            for machine in machines:
-                # Récupérer tous les capteurs pour cette machine
-                sensors = Sensor.query.filter(Sensor.machine_id == machine.id, 
-                                              Sensor.type.in_(['temperature', 'pressure', 'vibration'])).all()
-                
-                for sensor in sensors:
-                    # Récupérer la dernière valeur
-                    last_data = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).first()
+            # Capteurs de toutes les machines et leur dernière valeur, en une seule requête
+            fleet = get_latest_sensor_states(sensor_types=['temperature', 'pressure', 'vibration'])
+            for machine, sensor, last_data in fleet:
+                if last_data:
+                    # Évaluer la dernière valeur sans l'ajouter de nouveau à l'historique
+                    prediction = anomaly_model.evaluate({
+                        'machine_id': machine.machine_id,
+                        'sensor_type': sensor.type,
+                        'value': last_data.value,
+                        'timestamp': last_data.timestamp.isoformat()
+                    })
                     
-                    if last_data:
-                        # Faire une prédiction
-                        prediction = anomaly_model.predict({
-                            'machine_id': machine.id,
-                            'sensor_type': sensor.type,
-                            'value': last_data.value,
-                            'timestamp': last_data.timestamp.isoformat()
-                        })
+                    # Si le risque est élevé (> 80%) et le temps pour atteindre le seuil est inférieur à 30 minutes
+                    if prediction['risk_probability'] >= 80 and 'time_to_threshold' in prediction and prediction['time_to_threshold'] is not None and prediction['time_to_threshold'] <= 30:
+                        # Vérifier s'il existe déjà une alerte active pour ce capteur
+                        existing_alert = Alert.query.filter_by(
+                            machine_id=machine.id,
+                            sensor_type=sensor.type,
+                            status='active'
+                        ).first()
                         
-                        # Si le risque est élevé (> 80%) et le temps pour atteindre le seuil est inférieur à 30 minutes
-                        if prediction['risk_probability'] >= 80 and 'time_to_threshold' in prediction and prediction['time_to_threshold'] is not None and prediction['time_to_threshold'] <= 30:
-                            # Vérifier s'il existe déjà une alerte active pour ce capteur
-                            existing_alert = Alert.query.filter_by(
+                        if not existing_alert:
+                            # Créer une alerte prédictive
+                            timestamp = datetime.datetime.now()
+                            time_remaining = f"dans {prediction['time_to_threshold']} minutes"
+                            message = f"ALERTE PRÉDICTIVE: {prediction['prediction']} {time_remaining}"
+                            
+                            alert = Alert(
                                 machine_id=machine.id,
+                                sensor_id=sensor.id,
                                 sensor_type=sensor.type,
+                                value=last_data.value,
+                                message=message,
+                                risk_level=prediction['risk_probability'],
+                                suggestions=','.join(prediction['suggestions']),
+                                model_version=prediction.get('model_version'),
+                                timestamp=timestamp,
                                 status='active'
-                            ).first()
+                            )
                             
-                            if not existing_alert:
-                                # Créer une alerte prédictive
-                                timestamp = datetime.datetime.now()
-                                time_remaining = f"dans {prediction['time_to_threshold']} minutes"
-                                message = f"ALERTE PRÉDICTIVE: {prediction['prediction']} {time_remaining}"
-                                
-                                alert = Alert(
-                                    machine_id=machine.id,
-                                    sensor_id=sensor.id,
-                                    sensor_type=sensor.type,
-                                    value=last_data.value,
-                                    message=message,
-                                    risk_level=prediction['risk_probability'],
-                                    suggestions=','.join(prediction['suggestions']),
-                                    timestamp=timestamp,
-                                    status='active'
-                                )
-                                
-                                db.session.add(alert)
-                                
-                                # Préparer les données pour l'émission
-                                alert_data = {
-                                    'machine_id': machine.machine_id,
-                                    'sensor_type': sensor.type,
-                                    'value': last_data.value,
-                                    'risk_level': prediction['risk_probability'],
-                                    'message': message,
-                                    'suggestions': prediction['suggestions'],
-                                    'timestamp': timestamp.isoformat(),
-                                    'is_predictive': True,
-                                    'time_to_threshold': prediction['time_to_threshold'],
-                                    '_id': str(random.randint(1000, 9999))  # ID temporaire
-                                }
-                                
-                                # Notifier les clients
-                                socketio.emit('new_alert', alert_data)
-                                logger.info(f"Alerte prédictive émise: {message} (Risque: {prediction['risk_probability']}%)")
-            
+                            db.session.add(alert)
+                            
+                            # Préparer les données pour l'émission
+                            alert_data = {
+                                'machine_id': machine.machine_id,
+                                'sensor_type': sensor.type,
+                                'value': last_data.value,
+                                'risk_level': prediction['risk_probability'],
+                                'message': message,
+                                'suggestions': prediction['suggestions'],
+                                'timestamp': timestamp.isoformat(),
+                                'is_predictive': True,
+                                'time_to_threshold': prediction['time_to_threshold'],
+                                '_id': str(random.randint(1000, 9999))  # ID temporaire
+                            }
+                            
+                            # Notifier les clients
+                            socketio.emit('new_alert', alert_data)
+                            logger.info(f"Alerte prédictive émise: {message} (Risque: {prediction['risk_probability']}%)")
+        
             # Commit les changements à la base de données
             db.session.commit()
             logger.info("Analyse des prédictions terminée avec succès.")
@@ -547,6 +857,105 @@ scheduler.add_job(
     replace_existing=True
 )
 
+# Initialiser le modèle de détection d'anomalies (ou utiliser le service d'inférence, même interface)
+anomaly_model = inference_service if inference_service else \
+    IsolationForestModel(registry_dir=MODEL_REGISTRY_DIR, stats_span=DETECTOR_STATS_SPAN,
+                         robust_forecast=FORECAST_ROBUST)
+
+# Types de machines (modèles par type de machine), seuils propres à chaque capteur et dernières
+# versions du registre. Les processus du service d'inférence chargent le registre eux-mêmes.
+with app.app_context():
+    anomaly_model.set_machine_types({machine.machine_id: machine.type for machine in Machine.query.all()})
+    anomaly_model.set_sensor_thresholds(load_sensor_thresholds())
+if not inference_service:
+    anomaly_model.registry.load_latest()
+    # Premier démarrage sans modèles enregistrés: entraîner ceux de tous les types en parallèle
+    if anomaly_model.missing_models():
+        anomaly_model.preload()
+
+# Si le modèle n'est pas encore entraîné, générer des données d'exemple et l'entraîner
+if not anomaly_model.is_trained:
+    logger.info("Entraînement du modèle d'IA sur des données générées...")
+    sample_data = anomaly_model.generate_sample_training_data(n_samples=2000)
+    # Pas besoin d'appeler train car le modèle se génère dans le constructeur
+    logger.info("Modèle d'IA entraîné avec succès.")
+
+# Statistiques de la dernière initialisation de l'historique du détecteur
+warm_start_stats = None
+
+def warm_start_detector():
+    """
+    Recharge les dernières lectures de chaque capteur (une requête fenêtrée) dans l'historique
+    du détecteur, pour des prédictions stables dès le redémarrage.
+    """
+    global warm_start_stats
+    start = time.perf_counter()
+    try:
+        with app.app_context():
+            rows = get_recent_sensor_readings(WARM_START_ROWS)
+        query_ms = (time.perf_counter() - start) * 1000
+        
+        history = {}
+        for machine_id, sensor_type, value, timestamp in rows:
+            values, timestamps = history.setdefault((machine_id, sensor_type), ([], []))
+            values.append(value)
+            timestamps.append(timestamp)
+        
+        sensors = anomaly_model.warm_start(history, workers=WARM_START_WORKERS)
+        total_ms = (time.perf_counter() - start) * 1000
+        warm_start_stats = {
+            'sensors': sensors,
+            'rows': len(rows),
+            'query_ms': round(query_ms, 3),
+            'total_ms': round(total_ms, 3)
+        }
+        logger.info(f"Historique du détecteur initialisé: {sensors} capteurs, {len(rows)} lectures "
+                    f"en {total_ms:.1f} ms (requête {query_ms:.1f} ms)")
+    except Exception as e:
+        logger.error(f"Erreur lors de l'initialisation de l'historique du détecteur: {str(e)}")
+
+if WARM_START:
+    warm_start_detector()
+
+# Rapport du dernier réentraînement des modèles
+retrain_stats = None
+retrain_lock = threading.Lock()
+
+def retrain_detector():
+    """
+    Réentraîne les modèles sur les lectures enregistrées et publie les nouvelles versions
+    (une seule exécution à la fois). Retourne False si un réentraînement est déjà en cours.
+    """
+    global retrain_stats
+    if not retrain_lock.acquire(blocking=False):
+        return False
+    try:
+        logger.info("Réentraînement des modèles sur les lectures enregistrées...")
+        with app.app_context():
+            retrain_stats = retrain_models(
+                anomaly_model, iter_sensor_values,
+                sample_size=RETRAIN_SAMPLE_SIZE,
+                chunk_size=RETRAIN_CHUNK_SIZE,
+                min_samples=RETRAIN_MIN_SAMPLES,
+                n_jobs=RETRAIN_N_JOBS
+            )
+        retrain_stats['finished_at'] = datetime.datetime.now().isoformat()
+    except Exception as e:
+        logger.error(f"Erreur lors du réentraînement des modèles: {str(e)}")
+        retrain_stats = {'error': str(e), 'finished_at': datetime.datetime.now().isoformat()}
+    finally:
+        retrain_lock.release()
+    return True
+
+if RETRAIN_ENABLED:
+    scheduler.add_job(
+        retrain_detector,
+        'interval',
+        hours=RETRAIN_INTERVAL_HOURS,
+        id='retrain_models',
+        replace_existing=True
+    )
+
 # Démarrer le planificateur
 scheduler.start()
 
@@ -560,16 +969,6 @@ with app.app_context():
 def get_jwt_identity():
     return "admin"  # Temporairement utiliser admin comme identité
 
-# Initialiser le modèle de détection d'anomalies
-anomaly_model = IsolationForestModel()
-
-# Si le modèle n'est pas encore entraîné, générer des données d'exemple et l'entraîner
-if not anomaly_model.is_trained:
-    logger.info("Entraînement du modèle d'IA sur des données générées...")
-    sample_data = anomaly_model.generate_sample_training_data(n_samples=2000)
-    # Pas besoin d'appeler train car le modèle se génère dans le constructeur
-    logger.info("Modèle d'IA entraîné avec succès.")
-
 # Routes d'authentification
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -659,10 +1058,8 @@ def get_machine(machine_id):
     machine_data = machine.to_dict()
     machine_data['sensors_data'] = {}
     
-    sensors = Sensor.query.filter_by(machine_id=machine.id).all()
-    for sensor in sensors:
-        # Récupérer la dernière valeur du capteur
-        last_data = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).first()
+    # Dernière valeur de chaque capteur (table sensor_latest, une seule requête)
+    for _, sensor, last_data in get_latest_sensor_states(machine.machine_id):
         if last_data:
             machine_data['sensors_data'][sensor.type] = {
                 'value': last_data.value,
@@ -695,6 +1092,7 @@ def update_machine_status(machine_id):
     old_status = machine.status
     machine.status = new_status
     db.session.commit()
+    sensor_cache.invalidate_machine(machine_id)
     
     # Si la machine passe de emergency_stop à active, réinitialiser le drapeau d'arrêt d'urgence
     if old_status == 'emergency_stop' and new_status == 'active':
@@ -724,45 +1122,78 @@ def receive_sensor_data():
         if field not in data:
             return jsonify({"error": f"Missing {field} field"}), 400
     
-    # Trouver la machine
-    machine = Machine.query.filter_by(machine_id=data['machine_id']).first()
-    if not machine:
+    machine_id = str(data['machine_id'])
+    sensor_type = data['sensor_type']
+    
+    # Trouver la machine et le capteur (via le cache de résolution)
+    resolved = resolve_sensor(machine_id, sensor_type)
+    if not resolved:
         return jsonify({"error": "Machine not found"}), 404
     
     # Si la machine est en arrêt d'urgence, rejeter les données
-    if machine.status == 'emergency_stop':
+    if resolved.machine_status == 'emergency_stop':
         return jsonify({"error": "Machine is in emergency stop state"}), 403
     
-    # Trouver le capteur
-    sensor = Sensor.query.filter_by(machine_id=machine.id, type=data['sensor_type']).first()
-    if not sensor:
-        # Créer le capteur s'il n'existe pas
-        sensor = Sensor(machine_id=machine.id, type=data['sensor_type'])
-        db.session.add(sensor)
+    # Créer l'entrée de données (même horodatage pour le stockage, le scoring et les notifications)
+    timestamp = datetime.datetime.utcnow()
+    accepted = store_sensor_readings([{
+        'sensor_id': resolved.sensor_pk,
+        'value': data['value'],
+        'timestamp': timestamp
+    }])
+    # Tampon d'écriture plein: lecture non enregistrée, donc ni analysée ni diffusée
+    if not accepted:
+        db.session.rollback()
+        return jsonify({"error": "Sensor data buffer is full, retry later"}), 503
+    
+    # Mode asynchrone: enregistrer, mettre en file et répondre immédiatement
+    if scoring_pool is not None:
         db.session.commit()
-    
-    # Créer l'entrée de données
-    sensor_data = SensorData(
-        sensor_id=sensor.id,
-        value=data['value']
-    )
-    
-    db.session.add(sensor_data)
+        
+        # Les seuils critiques restent évalués ici: la latence de sécurité ne dépend pas de la file
+        hard_stop = anomaly_model.is_critical(sensor_type, data['value'], machine_id)
+        if hard_stop:
+            hard_threshold_stop(resolved, machine_id, sensor_type, data['value'], timestamp)
+        
+        socketio.emit('sensor_update', {
+            'machine_id': machine_id,
+            'sensor_type': sensor_type,
+            'value': data['value'],
+            'timestamp': timestamp.isoformat()
+        })
+        
+        scoring_pool.submit(f"{machine_id}_{sensor_type}", {
+            'machine_id': machine_id,
+            'machine_pk': resolved.machine_pk,
+            'sensor_pk': resolved.sensor_pk,
+            'sensor_type': sensor_type,
+            'value': data['value'],
+            'timestamp': timestamp,
+            'hard_stop': hard_stop
+        })
+        
+        return jsonify({
+            "message": "Données reçues, analyse en cours",
+            "queued": True,
+            "emergency_stop": hard_stop
+        }), 202
     
     # Vérifier les anomalies avec notre modèle d'IA
-    prediction_result = anomaly_model.predict(data)
+    prediction_result = anomaly_model.predict(dict(data, timestamp=timestamp))
+    emergency_triggered = False
     
     # Si c'est une anomalie et que la probabilité dépasse le seuil
     if prediction_result['anomaly'] and prediction_result['risk_probability'] >= PREDICTION_THRESHOLD:
         # Créer une alerte
         alert = Alert(
-            machine_id=machine.id,
-            sensor_id=sensor.id,
-            sensor_type=sensor.type,  # Utiliser le type de capteur
+            machine_id=resolved.machine_pk,
+            sensor_id=resolved.sensor_pk,
+            sensor_type=sensor_type,  # Utiliser le type de capteur
             value=data['value'],
             message=prediction_result['prediction'],  # Utiliser le message de prédiction
             risk_level=prediction_result['risk_probability'],
             suggestions=','.join(prediction_result['suggestions']),
+            model_version=prediction_result.get('model_version'),
             status='active'
         )
         
@@ -770,8 +1201,8 @@ def receive_sensor_data():
         
         # Émettre l'alerte via socketio
         alert_data = {
-            'machine_id': machine.machine_id,
-            'sensor_type': sensor.type,
+            'machine_id': machine_id,
+            'sensor_type': sensor_type,
             'value': data['value'],
             'timestamp': datetime.datetime.now().isoformat(),
             'risk_probability': prediction_result['risk_probability'],
@@ -785,13 +1216,15 @@ def receive_sensor_data():
         # Si la probabilité dépasse le seuil d'arrêt d'urgence
         if prediction_result['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
             # Effectuer un arrêt d'urgence automatique
+            machine = Machine.query.get(resolved.machine_pk)
             machine.status = 'emergency_stop'
             emergency_stops[machine.machine_id] = True
+            emergency_triggered = True
             
             # Émettre l'événement d'arrêt d'urgence
             socketio.emit('emergency_stop', {
                 'machine_id': machine.machine_id,
-                'reason': f"Arrêt d'urgence automatique - {sensor.type} anormal ({data['value']})",
+                'reason': f"Arrêt d'urgence automatique - {sensor_type} anormal ({data['value']})",
                 'timestamp': datetime.datetime.now().isoformat()
             })
             
@@ -799,7 +1232,7 @@ def receive_sensor_data():
             send_email_notification(
                 f"URGENT: Arrêt d'urgence pour {machine.name}",
                 f"La machine {machine.name} ({machine.machine_id}) a été arrêtée automatiquement.\n"
-                f"Capteur: {sensor.type}\n"
+                f"Capteur: {sensor_type}\n"
                 f"Valeur: {data['value']}\n"
                 f"Probabilité de risque: {prediction_result['risk_probability']}%\n"
                 f"Suggestions: {', '.join(prediction_result['suggestions'])}"
@@ -807,14 +1240,18 @@ def receive_sensor_data():
     
     # Émettre les données du capteur via socketio
     socketio.emit('sensor_update', {
-        'machine_id': machine.machine_id,
-        'sensor_type': sensor.type,
+        'machine_id': machine_id,
+        'sensor_type': sensor_type,
         'value': data['value'],
         'timestamp': datetime.datetime.now().isoformat()
     })
     
     db.session.commit()
     
+    # Le statut de la machine a changé: la résolution en cache n'est plus valide
+    if emergency_triggered:
+        sensor_cache.invalidate_machine(machine_id)
+    
     return jsonify({
         "message": "Données reçues", 
         "is_anomaly": prediction_result['anomaly'], 
@@ -822,6 +1259,233 @@ def receive_sensor_data():
         "suggestions": prediction_result['suggestions'] if prediction_result['anomaly'] else []
     }), 201
 
+# Route pour recevoir un lot de données de capteurs (plusieurs machines et types de capteurs)
+@app.route('/api/sensor-data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    if not request.is_json:
+        return jsonify({"error": "Missing JSON in request"}), 400
+
+    # Accepter soit un tableau brut, soit un objet {"readings": [...]}
+    data = request.json
+    readings = data.get('readings') if isinstance(data, dict) else data
+    if not isinstance(readings, list) or not readings:
+        return jsonify({"error": "Missing readings array"}), 400
+
+    # Valider chaque lecture; les erreurs sont rapportées par élément, dans l'ordre d'entrée
+    results = [None] * len(readings)
+    valid_items = []
+    required_fields = ['machine_id', 'sensor_type', 'value']
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            results[index] = {"error": "Invalid reading"}
+            continue
+
+        missing = next((field for field in required_fields if field not in reading), None)
+        if missing:
+            results[index] = {"error": f"Missing {missing} field"}
+            continue
+
+        try:
+            value = float(reading['value'])
+            timestamp = (datetime.datetime.fromisoformat(reading['timestamp'])
+                         if reading.get('timestamp') else datetime.datetime.utcnow())
+            # Horodatages avec fuseau (+02:00, Z): ramenés en UTC naïf, comme les lectures stockées
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            results[index] = {"error": "Invalid value or timestamp"}
+            continue
+
+        valid_items.append((index, str(reading['machine_id']), reading['sensor_type'], value, timestamp))
+
+    # Résoudre d'abord via le cache, puis les clés manquantes en une requête par table
+    resolutions = {}
+    missing_keys = set()
+    for _, machine_key, sensor_type, _, _ in valid_items:
+        key = (machine_key, sensor_type)
+        if key in resolutions or key in missing_keys:
+            continue
+        entry = sensor_cache.get(machine_key, sensor_type)
+        if entry is None:
+            missing_keys.add(key)
+        else:
+            resolutions[key] = entry
+
+    if missing_keys:
+        # Toutes les machines manquantes en une seule requête
+        machines = {m.machine_id: m for m in Machine.query.filter(
+            Machine.machine_id.in_({key[0] for key in missing_keys})).all()}
+
+        # Tous les capteurs manquants en une seule requête (le premier par machine/type, comme filter_by().first())
+        sensors = {}
+        if machines:
+            sensor_query = Sensor.query.filter(
+                Sensor.machine_id.in_([m.id for m in machines.values()]),
+                Sensor.type.in_({key[1] for key in missing_keys})
+            ).order_by(Sensor.id)
+            for sensor in sensor_query.all():
+                sensors.setdefault((sensor.machine_id, sensor.type), sensor)
+
+        # Créer les capteurs manquants en une seule fois
+        new_sensors = []
+        for machine_key, sensor_type in missing_keys:
+            machine = machines.get(machine_key)
+            if machine and (machine.id, sensor_type) not in sensors:
+                sensor = Sensor(machine_id=machine.id, type=sensor_type)
+                sensors[(machine.id, sensor_type)] = sensor
+                new_sensors.append(sensor)
+        if new_sensors:
+            db.session.add_all(new_sensors)
+            db.session.flush()
+
+        for machine_key, sensor_type in missing_keys:
+            machine = machines.get(machine_key)
+            if machine:
+                entry = SensorResolutionCache.build_entry(machine, sensors[(machine.id, sensor_type)])
+                resolutions[(machine_key, sensor_type)] = entry
+
+    # Statut courant par machine, mis à jour si une lecture du lot déclenche un arrêt d'urgence
+    machine_statuses = {key[0]: entry.machine_status for key, entry in resolutions.items()}
+    stopped_machines = set()
+
+    # Scorer les lectures des machines en service par vagues: la k-ième lecture de chaque machine,
+    # en un appel vectorisé par vague. Une machine n'est plus scorée après la lecture qui déclenche
+    # son arrêt d'urgence: ses lectures suivantes sont rejetées et ne doivent pas modifier l'état
+    # du détecteur (fenêtres, statistiques, prévisions)
+    machine_items = {}
+    for item in valid_items:
+        if item[1] in machine_statuses and machine_statuses[item[1]] != 'emergency_stop':
+            machine_items.setdefault(item[1], []).append(item)
+    predictions = {}
+    stopping_machines = set()
+    for wave in itertools.zip_longest(*machine_items.values()):
+        wave = [item for item in wave if item is not None and item[1] not in stopping_machines]
+        if not wave:
+            break
+        wave_predictions = anomaly_model.predict_batch([{
+            'machine_id': machine_key,
+            'sensor_type': sensor_type,
+            'value': value,
+            'timestamp': timestamp
+        } for _, machine_key, sensor_type, value, timestamp in wave])
+        for (index, machine_key, _, _, _), prediction in zip(wave, wave_predictions):
+            predictions[index] = prediction
+            if prediction['anomaly'] and prediction['risk_probability'] >= PREDICTION_THRESHOLD \
+                    and prediction['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
+                stopping_machines.add(machine_key)
+
+    # Lectures à enregistrer: celles qui ont été scorées. Une seule instruction d'insertion (ou le
+    # tampon d'écriture différée) pour tout le lot; si le tampon est plein, seules les premières
+    # sont acceptées et les suivantes ne créent ni alerte ni arrêt d'urgence
+    scored_items = [item for item in valid_items if item[0] in predictions]
+    accepted = store_sensor_readings([
+        {'sensor_id': resolutions[(machine_key, sensor_type)].sensor_pk, 'value': value, 'timestamp': timestamp}
+        for _, machine_key, sensor_type, value, timestamp in scored_items])
+    if scored_items and not accepted:
+        db.session.rollback()
+        return jsonify({"error": "Sensor data buffer is full, retry later"}), 503
+    accepted_indexes = {item[0] for item in scored_items[:accepted]}
+
+    alerts = []
+    emissions = []
+    for index, machine_key, sensor_type, value, timestamp in valid_items:
+        resolved = resolutions.get((machine_key, sensor_type))
+        if not resolved:
+            results[index] = {"error": "Machine not found"}
+            continue
+
+        # Même règle que l'ingestion unitaire: rejeter les données d'une machine en arrêt d'urgence,
+        # y compris si l'arrêt a été déclenché par une lecture précédente du même lot
+        if machine_statuses[machine_key] == 'emergency_stop':
+            results[index] = {"error": "Machine is in emergency stop state"}
+            continue
+
+        if index not in accepted_indexes:
+            results[index] = {"error": "Sensor data buffer is full, retry later"}
+            continue
+
+        prediction_result = predictions[index]
+
+        if prediction_result['anomaly'] and prediction_result['risk_probability'] >= PREDICTION_THRESHOLD:
+            alert = Alert(
+                machine_id=resolved.machine_pk,
+                sensor_id=resolved.sensor_pk,
+                sensor_type=sensor_type,
+                value=value,
+                message=prediction_result['prediction'],
+                risk_level=prediction_result['risk_probability'],
+                suggestions=','.join(prediction_result['suggestions']),
+                model_version=prediction_result.get('model_version'),
+                status='active'
+            )
+            alerts.append(alert)
+            emissions.append(('new_alert', alert, {
+                'machine_id': machine_key,
+                'sensor_type': sensor_type,
+                'value': value,
+                'timestamp': timestamp.isoformat(),
+                'risk_probability': prediction_result['risk_probability'],
+                'suggestions': prediction_result['suggestions'],
+                'message': prediction_result['prediction']
+            }))
+
+            if prediction_result['risk_probability'] >= EMERGENCY_STOP_THRESHOLD:
+                machine = Machine.query.get(resolved.machine_pk)
+                machine.status = 'emergency_stop'
+                machine_statuses[machine_key] = 'emergency_stop'
+                stopped_machines.add(machine_key)
+                emergency_stops[machine_key] = True
+                emissions.append(('emergency_stop', None, {
+                    'machine_id': machine_key,
+                    'reason': f"Arrêt d'urgence automatique - {sensor_type} anormal ({value})",
+                    'timestamp': datetime.datetime.now().isoformat()
+                }))
+                send_email_notification(
+                    f"URGENT: Arrêt d'urgence pour {machine.name}",
+                    f"La machine {machine.name} ({machine_key}) a été arrêtée automatiquement.\n"
+                    f"Capteur: {sensor_type}\n"
+                    f"Valeur: {value}\n"
+                    f"Probabilité de risque: {prediction_result['risk_probability']}%\n"
+                    f"Suggestions: {', '.join(prediction_result['suggestions'])}"
+                )
+
+        emissions.append(('sensor_update', None, {
+            'machine_id': machine_key,
+            'sensor_type': sensor_type,
+            'value': value,
+            'timestamp': timestamp.isoformat()
+        }))
+
+        results[index] = {
+            "is_anomaly": prediction_result['anomaly'],
+            "risk_probability": prediction_result['risk_probability'],
+            "suggestions": prediction_result['suggestions'] if prediction_result['anomaly'] else []
+        }
+
+    # Un seul commit pour tout le lot
+    db.session.add_all(alerts)
+    db.session.commit()
+
+    # Mettre en cache les résolutions chargées une fois le lot validé (y compris les capteurs créés)
+    for machine_key, sensor_type in missing_keys:
+        if (machine_key, sensor_type) in resolutions and machine_key not in stopped_machines:
+            sensor_cache.put(machine_key, sensor_type, resolutions[(machine_key, sensor_type)])
+    for machine_key in stopped_machines:
+        sensor_cache.invalidate_machine(machine_key)
+
+    # Émettre les événements une fois le lot enregistré (les alertes ont alors un identifiant)
+    for event, alert, payload in emissions:
+        if alert is not None:
+            payload['_id'] = str(alert.id)
+        socketio.emit(event, payload)
+
+    return jsonify({
+        "message": "Lot de données reçu",
+        "received": len(readings),
+        "accepted": accepted,
+        "results": results
+    }), 201 if accepted else 400
+
 # Route pour obtenir les données des capteurs
 @app.route('/api/sensor-data/<machine_id>', methods=['GET'])
 @jwt_required()
@@ -843,13 +1507,16 @@ def get_sensor_data(machine_id):
         if not sensor_type:
             return jsonify({"error": "sensor_type parameter is required when using interval"}), 400
             
-        timeseries_data = get_sensor_data_timeseries(
-            machine_id=machine_id,
-            sensor_type=sensor_type,
-            start_time=start_time,
-            end_time=end_time,
-            interval=interval
-        )
+        try:
+            timeseries_data = get_sensor_data_timeseries(
+                machine_id=machine_id,
+                sensor_type=sensor_type,
+                start_time=start_time,
+                end_time=end_time,
+                interval=interval
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Convertir le DataFrame pandas en liste de dictionnaires
         if timeseries_data.empty:
@@ -997,6 +1664,7 @@ def emergency_stop(machine_id):
         db.session.add(alert)
     
     db.session.commit()
+    sensor_cache.invalidate_machine(machine.machine_id)
     
     # Notifier les clients connectés
     socketio.emit('emergency_stop', {
@@ -1028,32 +1696,27 @@ def get_predictions(machine_id):
     if not machine:
         return jsonify({"error": "Machine non trouvée"}), 404
     
-    # Récupérer tous les capteurs pour cette machine
-    sensors = Sensor.query.filter_by(machine_id=machine.id).all()
-    
     predictions = {}
     
-    for sensor in sensors:
-        # Récupérer les données récentes pour ce capteur (dernières 20 mesures)
-        recent_data = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).limit(20).all()
-        
-        if len(recent_data) < 5:  # Pas assez de données pour prédire
+    # Capteurs de la machine avec leur dernière valeur et leur nombre de lectures (une seule requête)
+    for _, sensor, latest in get_latest_sensor_states(machine.machine_id):
+        if latest is None or latest.reading_count < 5:  # Pas assez de données pour prédire
             continue
         
         # Préparer les données pour le détecteur d'anomalies
         data = {
             'machine_id': machine.machine_id,
             'sensor_type': sensor.type,
-            'value': recent_data[0].value
+            'value': latest.value
         }
         
-        # Obtenir la prédiction
-        prediction_result = anomaly_model.predict(data)
+        # Obtenir la prédiction (lecture seule: l'historique du détecteur n'est pas modifié)
+        prediction_result = anomaly_model.evaluate(data)
         
         # Si la prédiction contient des informations
         if prediction_result:
             predictions[sensor.type] = {
-                'current_value': recent_data[0].value,
+                'current_value': latest.value,
                 'future_value': prediction_result.get('future_value'),
                 'time_to_threshold': prediction_result.get('time_to_threshold'),
                 'message': prediction_result.get('prediction'),  # Message est maintenant dans 'prediction'
@@ -1071,43 +1734,39 @@ def get_predictions(machine_id):
 def predict_next_30min():
     # Prédire les anomalies pour toutes les machines pour les 30 prochaines minutes
     predictions = {}
-    machines = Machine.query.all()
+    # Dernière lecture de chaque capteur du parc, en une seule requête
+    latest = [(machine, sensor, last_data) for machine, sensor, last_data in
+              get_latest_sensor_states(sensor_types=['temperature', 'pressure', 'vibration']) if last_data]
     
-    for machine in machines:
-        machine_predictions = []
-        sensors = Sensor.query.filter(Sensor.machine_id == machine.id, 
-                                     Sensor.type.in_(['temperature', 'pressure', 'vibration'])).all()
+    # Prévision de tendance de tout le parc en un seul appel (régression sur les lectures horodatées)
+    forecasts = anomaly_model.forecast_sensors([(machine.machine_id, sensor.type) for machine, sensor, _ in latest])
+    
+    for (machine, sensor, last_data), trend in zip(latest, forecasts):
+        prediction = anomaly_model.evaluate({
+            'machine_id': machine.machine_id,
+            'sensor_type': sensor.type,
+            'value': last_data.value,
+            'timestamp': last_data.timestamp.isoformat()
+        })
         
-        for sensor in sensors:
-            # Récupérer la dernière valeur du capteur
-            last_data = SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).first()
-            
-            if last_data:
-                # Prédire la tendance future
-                prediction = anomaly_model.predict({
-                    'machine_id': machine.id,
-                    'sensor_type': sensor.type,
-                    'value': last_data.value,
-                    'timestamp': last_data.timestamp.isoformat()
-                })
-                
-                # Calculer le temps estimé pour atteindre un seuil critique
-                time_to_threshold = prediction.get('time_to_threshold')
-                will_have_issue = prediction['risk_probability'] >= 50  # Seuil plus bas pour la prédiction
-                
-                if will_have_issue and time_to_threshold is not None and time_to_threshold <= 30:
-                    machine_predictions.append({
-                        'sensor_type': sensor.type,
-                        'current_value': last_data.value,
-                        'future_value': prediction.get('future_value'),
-                        'time_to_threshold': time_to_threshold,
-                        'message': prediction.get('prediction'),  # Maintenant un string, plus besoin d'accéder à prediction['message']
-                        'risk_probability': prediction['risk_probability'],
-                        'suggestions': prediction.get('suggestions', [])
-                    })
+        # Temps estimé pour atteindre un seuil critique: prévision du parc si elle porte sur cette
+        # lecture, sinon celle de l'évaluation
+        if trend is not None and trend['current_value'] == last_data.value:
+            prediction['future_value'] = trend['future_value']
+            prediction['time_to_threshold'] = trend['time_to_threshold']
+        time_to_threshold = prediction.get('time_to_threshold')
+        will_have_issue = prediction['risk_probability'] >= 50  # Seuil plus bas pour la prédiction
         
-        if machine_predictions:
-            predictions[machine.machine_id] = machine_predictions
+        if will_have_issue and time_to_threshold is not None and time_to_threshold <= 30:
+            predictions.setdefault(machine.machine_id, []).append({
+                'sensor_type': sensor.type,
+                'current_value': last_data.value,
+                'future_value': prediction.get('future_value'),
+                'time_to_threshold': time_to_threshold,
+                'message': prediction.get('prediction'),  # Maintenant un string, plus besoin d'accéder à prediction['message']
+                'risk_probability': prediction['risk_probability'],
+                'suggestions': prediction.get('suggestions', [])
+            })
     
     if not predictions:
         return jsonify({
@@ -1132,11 +1791,65 @@ def server_status():
         'total_machines': Machine.query.count(),
         'active_alerts': Alert.query.filter_by(status='active').count(),
         'connected_clients': 0,  # Ce nombre sera actualisé par socketio
-        'db_type': os.environ.get('DB_TYPE', 'sqlite')
+        'db_type': os.environ.get('DB_TYPE', 'sqlite'),
+        'sensor_cache': sensor_cache.stats(),
+        'sensor_data_buffer': sensor_data_buffer.stats() if sensor_data_buffer else None,
+        'scoring_pool': scoring_pool.stats() if scoring_pool else None,
+        'detector': anomaly_model.stats(),
+        'warm_start': warm_start_stats,
+        'retraining': retrain_stats
     }
     
     return jsonify(status), 200
 
+# Routes pour le registre des modèles
+@app.route('/api/models', methods=['GET'])
+@jwt_required()
+def get_model_versions():
+    # Versions actives et disponibles (par capteur, type de machine ou par défaut)
+    return jsonify(anomaly_model.model_versions()), 200
+
+@app.route('/api/models/load', methods=['POST'])
+@jwt_required()
+def load_model_version():
+    # Vérifier si l'utilisateur est un administrateur
+    current_user = get_jwt_identity()
+    admin_user = User.query.filter_by(username=current_user).first()
+    
+    if not admin_user or admin_user.role != 'admin':
+        return jsonify({'message': 'Accès non autorisé. Vous devez être administrateur.'}), 403
+    
+    data = request.get_json() or {}
+    if not all(k in data for k in ['scope', 'sensor_type']):
+        return jsonify({'message': 'Les champs scope et sensor_type sont requis.'}), 400
+    
+    # Chargement en arrière-plan: les prédictions en cours continuent avec la version active
+    # jusqu'au remplacement atomique
+    future = anomaly_model.load_model(data['scope'], data['sensor_type'], data.get('version'))
+    future.add_done_callback(
+        lambda done: logger.info(f"Modèle chargé: {done.result()}") if not done.exception()
+        else logger.error(f"Erreur lors du chargement du modèle: {done.exception()}"))
+    
+    return jsonify({'message': 'Chargement du modèle lancé.', 'scope': data['scope'],
+                    'sensor_type': data['sensor_type'], 'version': data.get('version')}), 202
+
+@app.route('/api/models/retrain', methods=['POST'])
+@jwt_required()
+def retrain_model_versions():
+    # Vérifier si l'utilisateur est un administrateur
+    current_user = get_jwt_identity()
+    admin_user = User.query.filter_by(username=current_user).first()
+    
+    if not admin_user or admin_user.role != 'admin':
+        return jsonify({'message': 'Accès non autorisé. Vous devez être administrateur.'}), 403
+    
+    if retrain_lock.locked():
+        return jsonify({'message': 'Un réentraînement est déjà en cours.'}), 409
+    
+    # Le réentraînement s'exécute en arrière-plan; le rapport est publié dans /api/status
+    threading.Thread(target=retrain_detector, name='retrain-models', daemon=True).start()
+    return jsonify({'message': 'Réentraînement des modèles lancé.'}), 202
+
 # Routes pour la gestion des utilisateurs
 @app.route('/api/users', methods=['GET'])
 @jwt_required()
@@ -1371,9 +2084,10 @@ def admin_create_machine():
     db.session.add(new_machine)
     db.session.commit()
     
-    # Ajouter les capteurs si spécifiés
+    # Ajouter les capteurs si spécifiés (types, ou dictionnaires avec le type et ses limites)
     if 'sensors' in data and isinstance(data['sensors'], list):
-        for sensor_type in data['sensors']:
+        for sensor_spec in data['sensors']:
+            sensor_type = sensor_spec_type(sensor_spec)
             # Déterminer les valeurs par défaut selon le type de capteur
             if sensor_type == 'temperature':
                 unit = '°C'
@@ -1399,10 +2113,14 @@ def admin_create_machine():
                 min_value=min_value,
                 max_value=max_value
             )
+            apply_sensor_limits(sensor, sensor_spec)
             db.session.add(sensor)
         
         db.session.commit()
     
+    sensor_cache.invalidate_machine(new_machine.machine_id)
+    anomaly_model.set_machine_types({new_machine.machine_id: new_machine.type})
+    refresh_sensor_thresholds(new_machine.machine_id)
     logger.info(f"Machine créée avec succès: {new_machine.machine_id}")
     
     # Retourner les données de la machine créée
@@ -1447,19 +2165,25 @@ def admin_update_machine(machine_id):
     if 'location' in data:
         machine.location = data['location']
     
-    # Gérer les capteurs si spécifiés
+    # Gérer les capteurs si spécifiés (types, ou dictionnaires avec le type et ses limites)
+    removed_types = []
     if 'sensors' in data and isinstance(data['sensors'], list):
         # Récupérer les capteurs existants
         existing_sensors = {sensor.type: sensor for sensor in machine.sensors}
+        requested_sensors = {sensor_spec_type(sensor_spec): sensor_spec for sensor_spec in data['sensors']}
         
-        # Supprimer les capteurs qui ne sont plus dans la liste
+        # Supprimer les capteurs qui ne sont plus dans la liste (leurs agrégats sont supprimés
+        # avec eux, voir models.delete_sensor_rollups)
         for sensor_type, sensor in existing_sensors.items():
-            if sensor_type not in data['sensors']:
+            if sensor_type not in requested_sensors:
                 db.session.delete(sensor)
+                removed_types.append(sensor_type)
         
-        # Ajouter les nouveaux capteurs
-        for sensor_type in data['sensors']:
-            if sensor_type not in existing_sensors:
+        # Ajouter les nouveaux capteurs, mettre à jour les limites des capteurs existants
+        for sensor_type, sensor_spec in requested_sensors.items():
+            if sensor_type in existing_sensors:
+                apply_sensor_limits(existing_sensors[sensor_type], sensor_spec)
+            else:
                 # Déterminer les valeurs par défaut selon le type de capteur
                 if sensor_type == 'temperature':
                     unit = '°C'
@@ -1485,9 +2209,13 @@ def admin_update_machine(machine_id):
                     min_value=min_value,
                     max_value=max_value
                 )
+                apply_sensor_limits(sensor, sensor_spec)
                 db.session.add(sensor)
     
     db.session.commit()
+    sensor_cache.invalidate_machine(machine_id)
+    anomaly_model.set_machine_types({machine.machine_id: machine.type})
+    refresh_sensor_thresholds(machine.machine_id, removed_types)
     
     logger.info(f"Machine {machine_id} mise à jour avec succès")
     
@@ -1522,12 +2250,16 @@ def admin_delete_machine(machine_id):
     if not machine:
         return jsonify({"error": f"Machine avec ID '{machine_id}' non trouvée"}), 404
     
-    # Supprimer tous les capteurs associés
+    # Supprimer tous les capteurs associés (et leur dernière lecture et leurs agrégats)
+    sensor_ids = [sensor.id for sensor in machine.sensors]
+    SensorLatest.query.filter(SensorLatest.sensor_id.in_(sensor_ids)).delete(synchronize_session=False)
+    SensorRollup.query.filter(SensorRollup.sensor_id.in_(sensor_ids)).delete(synchronize_session=False)
     Sensor.query.filter_by(machine_id=machine.id).delete()
     
     # Supprimer la machine
     db.session.delete(machine)
     db.session.commit()
+    sensor_cache.invalidate_machine(machine_id)
     
     logger.info(f"Machine {machine_id} supprimée avec succès")
     
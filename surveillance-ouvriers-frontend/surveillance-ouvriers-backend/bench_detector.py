@@ -0,0 +1,231 @@
+"""
+Suite de micro-benchmarks du détecteur (machine_learning.py), sur une charge reproductible
+(graine fixe):
+- latence de predict pour une lecture isolée (p50 et p99, en microsecondes);
+- débit de predict_batch pour des lots de 1k, 10k et 100k lectures;
+- mémoire par capteur suivi (tampons NumPy et allocations conservées, mesurées par tracemalloc);
+- temps de chargement des modèles dans un processus neuf (construction et premier scoring);
+- temps d'initialisation de l'historique (warm_start) à partir de lectures passées.
+
+Usage: python bench_detector.py [--seed N] [--sensors S] [--batches 1000,10000,100000]
+                                [--output resultats.json] [--baseline precedent.json]
+Le résultat est affiché en JSON. Avec --baseline, chaque mesure est comparée à celle d'un
+résultat précédent (ratio mesure courante / précédente) pour repérer les régressions entre
+commits. Aucun accès réseau ni base de données: seuls les fichiers de modèles locaux servent.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import sklearn
+
+from bench_model_loading import TABLE_SNIPPET, run_snippet
+from machine_learning import IsolationForestModel
+
+SENSOR_TYPES = ['temperature', 'pressure', 'vibration']
+
+
+def new_detector():
+    """Détecteur dont les tables de score sont déjà chargées (hors mesure)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector = IsolationForestModel()
+        detector.preload()
+    return detector
+
+
+def make_readings(thresholds, count, sensors, seed, prefix='machine', start=1_700_000_000.0):
+    """
+    Lectures reproductibles réparties sur sensors capteurs (trois types par machine), une par
+    capteur et par minute: valeurs uniformes dans la plage normale du type, 2 % au-delà.
+    """
+    rng = np.random.default_rng(seed)
+    position = np.arange(count) % sensors
+    types = [SENSOR_TYPES[index % len(SENSOR_TYPES)] for index in range(sensors)]
+    low = np.array([thresholds[sensor_type]['min_normal'] for sensor_type in types])[position]
+    high = np.array([thresholds[sensor_type]['max_normal'] for sensor_type in types])[position]
+    values = rng.uniform(low, high)
+    outliers = rng.random(count) < 0.02
+    values[outliers] = high[outliers] + rng.uniform(0.1, 0.5, outliers.sum()) * (high - low)[outliers]
+    timestamps = start + np.arange(count) // sensors * 60.0
+    machine_ids = [f"{prefix}-{index // len(SENSOR_TYPES):05d}" for index in range(sensors)]
+    return [{'machine_id': machine_ids[index], 'sensor_type': types[index], 'value': value, 'timestamp': timestamp}
+            for index, value, timestamp in zip(position.tolist(), values.tolist(), timestamps.tolist())]
+
+
+def percentile_us(samples, fraction):
+    return round(float(np.percentile(samples, fraction * 100)) * 1e6, 3)
+
+
+def predict_latency(thresholds, sensors, readings, seed):
+    """Latence de predict (une lecture par appel) sur un détecteur dont l'historique est rempli"""
+    detector = new_detector()
+    data = make_readings(thresholds, readings + sensors, sensors, seed)
+    for reading in data[:sensors]:
+        detector.predict(reading)
+    durations = []
+    for reading in data[sensors:]:
+        start = time.perf_counter()
+        detector.predict(reading)
+        durations.append(time.perf_counter() - start)
+    return {
+        'calls': readings,
+        'p50_us': percentile_us(durations, 0.50),
+        'p99_us': percentile_us(durations, 0.99),
+        'mean_us': round(float(np.mean(durations)) * 1e6, 3)
+    }
+
+
+def batch_throughput(thresholds, batch_size, sensors, seed, repeat):
+    """Meilleur débit (lectures/s) de predict_batch sur un lot de batch_size lectures"""
+    detector = new_detector()
+    batch = make_readings(thresholds, batch_size, sensors, seed)
+    detector.predict_batch(batch[:sensors])  # Attribution des slots hors mesure
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        detector.predict_batch(batch)
+        runs.append(time.perf_counter() - start)
+    return {
+        'readings': batch_size,
+        'sensors': min(sensors, batch_size),
+        'best_ms': round(min(runs) * 1000, 3),
+        'readings_per_sec': round(batch_size / min(runs), 1)
+    }
+
+
+def memory_per_sensor(thresholds, sensors, seed):
+    """
+    Octets par capteur suivi après une lecture par capteur: tampons NumPy du SensorStateStore
+    (capacité préallouée comprise) et total des allocations conservées, tableaux compris
+    (dictionnaire des slots, clés...).
+    """
+    detector = new_detector()
+    before_arrays = detector.state.stats()['bytes']
+    data = make_readings(thresholds, sensors, sensors, seed, prefix='memory')
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    detector.predict_batch(data)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    state = detector.state.stats()
+    return {
+        'sensors': sensors,
+        'capacity': state['capacity'],
+        'array_bytes_per_sensor': round((state['bytes'] - before_arrays) / sensors, 1),
+        'retained_bytes_per_sensor': round(retained / sensors, 1)
+    }
+
+
+def model_load(repeat):
+    """Chargement des modèles dans un processus neuf (voir bench_model_loading)"""
+    runs = [run_snippet(TABLE_SNIPPET) for _ in range(repeat)]
+    return {
+        'construct_ms_min': round(min(run[0] for run in runs) * 1000, 3),
+        'ready_to_score_ms_min': round(min(run[1] for run in runs) * 1000, 3)
+    }
+
+
+def warmup(thresholds, sensors, rows, seed, repeat):
+    """Durée de warm_start pour sensors capteurs de rows lectures passées (horodatages datetime)"""
+    data = make_readings(thresholds, sensors * rows, sensors, seed, prefix='warm')
+    history = {}
+    for reading in data:
+        values, timestamps = history.setdefault((reading['machine_id'], reading['sensor_type']), ([], []))
+        values.append(reading['value'])
+        timestamps.append(datetime.fromtimestamp(reading['timestamp'], tz=timezone.utc).replace(tzinfo=None))
+    runs = []
+    for _ in range(repeat):
+        detector = new_detector()
+        start = time.perf_counter()
+        detector.warm_start(history)
+        runs.append(time.perf_counter() - start)
+    return {
+        'sensors': sensors,
+        'rows_per_sensor': rows,
+        'best_ms': round(min(runs) * 1000, 3),
+        'us_per_sensor': round(min(runs) / sensors * 1e6, 3)
+    }
+
+
+def environment():
+    """Contexte de la mesure, pour ne comparer que des résultats comparables"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(current, baseline):
+    """Ratios mesure courante / mesure de référence pour toutes les valeurs numériques communes"""
+    ratios = {}
+    for key, value in current.items():
+        previous = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            nested = compare(value, previous or {})
+            if nested:
+                ratios[key] = nested
+        elif isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+            ratios[key] = round(value / previous, 3)
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sensors', type=int, default=300, help='Capteurs distincts de la charge')
+    parser.add_argument('--batches', default='1000,10000,100000')
+    parser.add_argument('--latency-calls', type=int, default=2000)
+    parser.add_argument('--memory-sensors', type=int, default=10000)
+    parser.add_argument('--warm-rows', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Fichier où écrire le résultat JSON')
+    parser.add_argument('--baseline', help='Résultat JSON précédent à comparer')
+    args = parser.parse_args()
+
+    thresholds = new_detector().thresholds
+    results = {
+        'environment': environment(),
+        'workload': {'seed': args.seed, 'sensors': args.sensors},
+        'predict_latency': predict_latency(thresholds, args.sensors, args.latency_calls, args.seed),
+        'batch_throughput': {
+            str(size): batch_throughput(thresholds, size, args.sensors, args.seed, args.repeat)
+            for size in (int(size) for size in args.batches.split(','))
+        },
+        'memory': memory_per_sensor(thresholds, args.memory_sensors, args.seed),
+        'model_load': model_load(args.repeat),
+        'warm_start': warmup(thresholds, args.sensors, args.warm_rows, args.seed, args.repeat)
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            results['ratio_to_baseline'] = compare(
+                {key: value for key, value in results.items() if key not in ('environment', 'workload')},
+                json.load(baseline))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as destination:
+            destination.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark du service d'inférence multi-processus: débit (lectures/s) du détecteur exécuté dans
+le processus appelant, puis du pool InferenceService pour différents nombres de processus.
+Mesure aussi le retard d'un thread "battement" qui se réveille toutes les millisecondes pendant
+le scoring (équivalent de l'envoi des événements Socket.IO bloqué par le GIL).
+
+Usage: python bench_inference_service.py [--readings N] [--sensors S] [--batch B] [--clients C]
+                                         [--processes 1,2,4]
+Le résultat est affiché en JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import threading
+import time
+import warnings
+
+from machine_learning import IsolationForestModel
+from inference_service import InferenceService
+
+SENSOR_TYPES = ['temperature', 'pressure', 'vibration']
+
+
+def make_batches(readings, sensors, batch_size, seed=42):
+    """Lots de lectures reproductibles sur sensors capteurs, valeurs autour de la plage normale."""
+    rng = random.Random(seed)
+    detector = IsolationForestModel()
+    keys = [(f"machine-{index // len(SENSOR_TYPES):04d}", SENSOR_TYPES[index % len(SENSOR_TYPES)])
+            for index in range(sensors)]
+    data = []
+    for index in range(readings):
+        machine_id, sensor_type = keys[index % sensors]
+        thresholds = detector.thresholds[sensor_type]
+        data.append({
+            'machine_id': machine_id,
+            'sensor_type': sensor_type,
+            'value': rng.uniform(thresholds['critical_low'], thresholds['critical_high'])
+        })
+    return [data[start:start + batch_size] for start in range(0, readings, batch_size)]
+
+
+def run(detector, batches, clients):
+    """Envoie les lots depuis clients threads; retourne (lectures/s, retards du battement en ms)."""
+    lateness = []
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.is_set():
+            start = time.perf_counter()
+            time.sleep(0.001)
+            lateness.append((time.perf_counter() - start - 0.001) * 1000)
+
+    def client(index):
+        for batch in batches[index::clients]:
+            detector.predict_batch(batch)
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    beat.join()
+
+    lateness.sort()
+    return sum(len(batch) for batch in batches) / elapsed, lateness
+
+
+def summarize(readings_per_sec, lateness):
+    return {
+        'readings_per_sec': round(readings_per_sec, 1),
+        'heartbeat_p99_ms': round(lateness[int(len(lateness) * 0.99)], 3) if lateness else None,
+        'heartbeat_max_ms': round(lateness[-1], 3) if lateness else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readings', type=int, default=50000)
+    parser.add_argument('--sensors', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--processes', default=None,
+                        help="Nombres de processus à mesurer, séparés par des virgules (défaut: 1..nombre de cœurs)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = [int(count) for count in args.processes.split(',')] if args.processes \
+        else sorted({1, 2, *range(4, cores + 1, 2), cores})
+    batches = make_batches(args.readings, args.sensors, args.batch)
+    warmup = make_batches(args.sensors, args.sensors, args.batch, seed=0)
+
+    results = {'cpu_count': cores, 'readings': args.readings, 'sensors': args.sensors,
+               'batch': args.batch, 'clients': args.clients}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector = IsolationForestModel()
+        detector.preload()
+    run(detector, warmup, 1)
+    results['in_process'] = summarize(*run(detector, batches, args.clients))
+
+    results['inference_service'] = {}
+    for count in counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            service = InferenceService(processes=count, batch_capacity=max(args.batch, 1024))
+        try:
+            run(service, warmup, 1)
+            results['inference_service'][count] = summarize(*run(service, batches, args.clients))
+        finally:
+            service.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
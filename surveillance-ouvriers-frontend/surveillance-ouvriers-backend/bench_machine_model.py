@@ -0,0 +1,76 @@
+"""
+Benchmark du coût d'un cycle de détection pour tout le parc: modèles par capteur (un appel à la
+forêt par capteur, comme l'ancien cycle, puis predict_batch sur toutes les lectures) comparés au
+modèle multivarié par machine (un seul appel pour tout le parc).
+
+Usage: python bench_machine_model.py [--machines 10,100,1000] [--ticks T]
+Le résultat (millisecondes par cycle, médiane) est affiché en JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+import warnings
+
+import numpy as np
+
+from machine_learning import IsolationForestModel
+
+
+def make_fleet(detector, machines, rng):
+    """Dernières lectures de chaque machine, autour du milieu des plages normales."""
+    fleet = {}
+    for index in range(machines):
+        fleet[f"machine-{index:04d}"] = {
+            sensor_type: float(rng.normal((t['min_normal'] + t['max_normal']) / 2, (t['max_normal'] - t['min_normal']) / 6))
+            for sensor_type, t in ((s, detector.thresholds[s]) for s in detector.MACHINE_FEATURES)
+        }
+    return fleet
+
+
+def per_tick_ms(tick, ticks):
+    """Durée médiane d'un cycle en millisecondes"""
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        tick()
+        durations.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(durations), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', default='10,100,1000')
+    parser.add_argument('--ticks', type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector = IsolationForestModel()
+        detector.preload()
+        detector.get_machine_model()
+        forests = {sensor_type: detector.get_model(sensor_type) for sensor_type in detector.MACHINE_FEATURES}
+    rng = np.random.default_rng(42)
+
+    results = {'ticks': args.ticks, 'machines': {}}
+    for machines in (int(count) for count in args.machines.split(',')):
+        fleet = make_fleet(detector, machines, rng)
+        readings = [{'machine_id': machine_id, 'sensor_type': sensor_type, 'value': value}
+                    for machine_id, values in fleet.items() for sensor_type, value in values.items()]
+
+        def per_sensor_forest_calls():
+            for data in readings:
+                forests[data['sensor_type']].decision_function([[data['value']]])
+
+        results['machines'][machines] = {
+            'per_sensor_forest_calls_ms': per_tick_ms(per_sensor_forest_calls, 1),  # Très lent: un seul cycle
+            'per_sensor_predict_batch_ms': per_tick_ms(lambda: detector.predict_batch(readings), args.ticks),
+            'multivariate_one_call_ms': per_tick_ms(lambda: detector.score_machines(fleet), args.ticks)
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark du temps de démarrage des modèles: chargement joblib complet (ancien comportement)
+contre tables de score compactes (.lut.npy) chargées paresseusement au premier scoring, puis
+premier démarrage sans aucun fichier de modèle (entraînement des trois forêts), type par type
+ou en parallèle (preload).
+
+Usage: python bench_model_loading.py [--repeat N]
+Chaque mesure est faite dans un processus Python neuf; le résultat est affiché en JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SENSOR_TYPES = ['temperature', 'pressure', 'vibration']
+
+# Ancien démarrage: les trois forêts sont désérialisées à la création du détecteur
+JOBLIB_SNIPPET = """
+import time, warnings, numpy as np
+warnings.simplefilter('ignore')
+import joblib
+from sklearn.ensemble import IsolationForest  # import hors mesure, comme pour machine_learning
+start = time.perf_counter()
+models = {t: joblib.load(f'model_{t}.joblib') for t in %(types)r}
+loaded = time.perf_counter()
+for t, m in models.items():
+    m.decision_function(np.array([[50.0]]))
+print(loaded - start, time.perf_counter() - start)
+"""
+
+# Nouveau démarrage: détecteur vide, chaque table est projetée en mémoire au premier scoring
+TABLE_SNIPPET = """
+import time, warnings, contextlib, io
+warnings.simplefilter('ignore')
+from machine_learning import IsolationForestModel
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    detector = IsolationForestModel()
+    loaded = time.perf_counter()
+    for t in %(types)r:
+        detector.predict({'machine_id': 'bench', 'sensor_type': t, 'value': detector.thresholds[t]['max_normal']})
+print(loaded - start, time.perf_counter() - start)
+"""
+
+
+# Premier démarrage: aucun fichier de modèle ni table dans le dossier courant
+COLD_START_SNIPPET = """
+import time, warnings, contextlib, io
+warnings.simplefilter('ignore')
+from machine_learning import IsolationForestModel
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    detector = IsolationForestModel()
+    loaded = time.perf_counter()
+    if %(parallel)r:
+        detector.preload()
+    else:
+        for t in %(types)r:
+            detector.get_score_table(t)
+print(loaded - start, time.perf_counter() - start)
+"""
+
+
+def run_snippet(snippet, cwd=None, **params):
+    """Exécute un extrait dans un nouveau processus et retourne (construction, premier scoring) en secondes."""
+    base = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', snippet % dict(params, types=SENSOR_TYPES)],
+        cwd=cwd or base, env=dict(os.environ, PYTHONPATH=base),
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def cold_start_ms(parallel, repeat):
+    """Durée minimale (ms) d'un premier démarrage, chaque essai dans un dossier vide"""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            runs.append(run_snippet(COLD_START_SNIPPET, cwd=directory, parallel=parallel)[1])
+    return round(min(runs) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # S'assurer que les tables existent (conversion automatique depuis les fichiers joblib)
+    run_snippet(TABLE_SNIPPET)
+
+    results = {}
+    for name, snippet in [('joblib', JOBLIB_SNIPPET), ('lookup_table', TABLE_SNIPPET)]:
+        runs = [run_snippet(snippet) for _ in range(args.repeat)]
+        results[name] = {
+            'construct_ms_min': round(min(r[0] for r in runs) * 1000, 3),
+            'ready_to_score_ms_min': round(min(r[1] for r in runs) * 1000, 3),
+            'ready_to_score_ms_median': round(sorted(r[1] for r in runs)[len(runs) // 2] * 1000, 3)
+        }
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    results['artifact_bytes'] = {
+        'joblib': sum(os.path.getsize(os.path.join(base, f'model_{t}.joblib')) for t in SENSOR_TYPES),
+        'lookup_table': sum(os.path.getsize(os.path.join(base, f'model_{t}.lut.npy')) for t in SENSOR_TYPES)
+    }
+    results['speedup'] = round(results['joblib']['ready_to_score_ms_min'] /
+                               results['lookup_table']['ready_to_score_ms_min'], 1)
+
+    results['cold_start'] = {
+        'cpus': os.cpu_count(),
+        'sequential_ms_min': cold_start_ms(False, args.repeat),
+        'parallel_preload_ms_min': cold_start_ms(True, args.repeat)
+    }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark de concurrence SQLite: débit d'écriture et de lecture avec des threads écrivains
+(lots de lectures de capteurs insérés puis validés, comme le tampon d'écriture ou le
+planificateur) et des threads lecteurs (état du parc et dernières lectures d'un capteur, comme
+les routes de l'API), pour la configuration d'origine (journal rollback, pragmas par défaut,
+connexion par requête) puis le profil de production (voir database.configure_database).
+
+Usage: python bench_sqlite_concurrency.py [--seconds S] [--writers W] [--readers R] [--batch B]
+Chaque profil utilise une base neuve dans un dossier temporaire; le résultat est affiché en JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from database import configure_database, get_latest_sensor_states, insert_sensor_readings, migrate_schema
+from models import Machine, Sensor, SensorData, db
+
+SENSOR_TYPES = ['temperature', 'pressure', 'vibration']
+
+
+def create_app(path, tuned):
+    """Application Flask sur la base path, avec ou sans le profil SQLite"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    configure_database(app, sqlite_tuning=tuned)
+    return app
+
+
+def seed(app, machines, history, rng):
+    """Parc de machines (trois capteurs chacune) et history lectures passées par capteur"""
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        migrate_schema()
+        sensor_ids = []
+        for index in range(machines):
+            machine = Machine(machine_id=f"machine-{index:04d}", name=f"Machine {index}", type='presse',
+                              location='A')
+            db.session.add(machine)
+            db.session.flush()
+            for sensor_type in SENSOR_TYPES:
+                sensor = Sensor(machine_id=machine.id, type=sensor_type)
+                db.session.add(sensor)
+                db.session.flush()
+                sensor_ids.append(sensor.id)
+        start = datetime(2024, 1, 1)
+        insert_sensor_readings([{'sensor_id': sensor_id, 'value': float(rng.random()),
+                                 'timestamp': start + timedelta(minutes=minute)}
+                                for minute in range(history) for sensor_id in sensor_ids])
+        db.session.commit()
+    return sensor_ids
+
+
+def run_profile(tuned, args):
+    """Débits et latences d'un profil sur une base neuve"""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'), tuned)
+        sensor_ids = seed(app, args.machines, args.history, rng)
+        stop = threading.Event()
+        results = {'write': [], 'read': [], 'errors': []}
+        lock = threading.Lock()
+
+        def record(kind, started):
+            with lock:
+                results[kind].append(time.perf_counter() - started)
+
+        def writer(index):
+            local = random.Random(args.seed + index)
+            clock = datetime(2025, 1, 1) + timedelta(days=index)
+            while not stop.is_set():
+                clock += timedelta(seconds=1)
+                rows = [{'sensor_id': local.choice(sensor_ids), 'value': local.random(), 'timestamp': clock}
+                        for _ in range(args.batch)]
+                started = time.perf_counter()
+                with app.app_context():
+                    try:
+                        insert_sensor_readings(rows)
+                        db.session.commit()
+                        record('write', started)
+                    except OperationalError as e:
+                        db.session.rollback()
+                        with lock:
+                            results['errors'].append(str(e.orig))
+
+        def reader(index):
+            local = random.Random(args.seed + 1000 + index)
+            while not stop.is_set():
+                started = time.perf_counter()
+                with app.app_context():
+                    try:
+                        if local.random() < 0.5:
+                            get_latest_sensor_states()
+                        else:
+                            SensorData.query.filter_by(sensor_id=local.choice(sensor_ids)) \
+                                .order_by(SensorData.timestamp.desc()).limit(20).all()
+                        db.session.commit()
+                        record('read', started)
+                    except OperationalError as e:
+                        db.session.rollback()
+                        with lock:
+                            results['errors'].append(str(e.orig))
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(args.writers)] + \
+                  [threading.Thread(target=reader, args=(index,)) for index in range(args.readers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def summary(latencies, rows_per_operation):
+        return {
+            'operations': len(latencies),
+            'rows_per_sec' if rows_per_operation > 1 else 'per_sec':
+                round(len(latencies) * rows_per_operation / elapsed, 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3) if latencies else None
+        }
+
+    return {
+        'writes': summary(results['write'], args.batch),
+        'reads': summary(results['read'], 1),
+        'locked_errors': sum('locked' in error for error in results['errors']),
+        'other_errors': sum('locked' not in error for error in results['errors'])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--machines', type=int, default=100)
+    parser.add_argument('--history', type=int, default=200, help='Lectures initiales par capteur')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = {'settings': vars(args), 'cpus': os.cpu_count()}
+    for name, tuned in [('default', False), ('tuned', True)]:
+        results[name] = run_profile(tuned, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark des statistiques glissantes du détecteur: coût d'une mise à jour (moyenne, variance et
+pente exponentielles) selon la fenêtre, comparé au recalcul sur une fenêtre de même longueur
+(np.var et pente sur les N dernières valeurs), puis débit de predict_batch selon la fenêtre.
+
+Usage: python bench_streaming_stats.py [--spans 10,100,1000] [--sensors S] [--readings N]
+Le résultat est affiché en JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import warnings
+
+import numpy as np
+
+from machine_learning import IsolationForestModel
+from sensor_state import SensorStateStore
+
+
+def time_updates(span, sensors, steps, seed=42):
+    """Microsecondes par lecture: mise à jour incrémentale vs recalcul sur la fenêtre"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(50, 5, (steps, sensors))
+    store = SensorStateStore(window=10, span=span)
+    slots = [store.slot(f"machine-{index}_temperature") for index in range(sensors)]
+
+    start = time.perf_counter()
+    for row in values:
+        store.push_values(slots, row, np.zeros(sensors))
+    incremental = (time.perf_counter() - start) / values.size * 1e6
+
+    # Recalcul: variance et pente moyenne sur les span dernières valeurs de chaque capteur
+    history = np.zeros((sensors, span))
+    start = time.perf_counter()
+    for position, row in enumerate(values):
+        history[:, position % span] = row
+        window = history[:, :min(position + 1, span)]
+        np.var(window, axis=1)
+        np.mean(np.diff(window, axis=1), axis=1) if window.shape[1] > 1 else None
+    recompute = (time.perf_counter() - start) / values.size * 1e6
+
+    return round(incremental, 3), round(recompute, 3)
+
+
+def predict_throughput(span, sensors, readings, seed=42):
+    """Lectures par seconde de predict_batch (lots de sensors lectures) avec cette fenêtre"""
+    rng = np.random.default_rng(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector = IsolationForestModel(stats_span=span)
+        detector.preload()
+    batch_count = max(1, readings // sensors)
+    batches = [[{'machine_id': f"machine-{index}", 'sensor_type': 'temperature', 'value': float(value)}
+                for index, value in enumerate(rng.normal(50, 5, sensors))] for _ in range(batch_count)]
+    detector.predict_batch(batches[0])
+    start = time.perf_counter()
+    for batch in batches:
+        detector.predict_batch(batch)
+    return round(batch_count * sensors / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spans', default='10,100,1000')
+    parser.add_argument('--sensors', type=int, default=300)
+    parser.add_argument('--readings', type=int, default=60000)
+    args = parser.parse_args()
+
+    results = {'sensors': args.sensors, 'readings': args.readings, 'spans': {}}
+    for span in (int(span) for span in args.spans.split(',')):
+        incremental, recompute = time_updates(span, args.sensors, max(1, args.readings // args.sensors))
+        results['spans'][span] = {
+            'incremental_us_per_reading': incremental,
+            'window_recompute_us_per_reading': recompute,
+            'predict_batch_readings_per_sec': predict_throughput(span, args.sensors, args.readings)
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
@@ -1,16 +1,17 @@
 import os
 import time
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import BigInteger, Integer, and_, case, cast, func, inspect, or_, select, text, union_all
 import pandas as pd
 import numpy as np
 
 # Load environment variables
 load_dotenv()
 
-# SQLAlchemy instance will be initialized in the app.py file
-db = SQLAlchemy()
+# SQLAlchemy instance shared with models.py (initialized in the app.py file)
+from models import db
+from sqlite_engine import READER_BIND, engine_options, install_pragmas, sqlite_pragmas
 
 def get_database_uri():
     """
@@ -32,20 +33,166 @@ def get_database_uri():
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
+def configure_database(app, sqlite_tuning=None):
+    """
+    Configure SQLAlchemy for the app (URI, engine options) and initialize the extension.
+
+    With SQLite and SQLITE_TUNING (default), every connection gets the production pragmas
+    (WAL, synchronous=NORMAL, mmap_size, cache_size, busy_timeout), writes go through a single
+    writer connection and reads through a pool of read-only connections (see sqlite_engine).
+
+    Args:
+        app: Flask application
+        sqlite_tuning: Force the SQLite profile on or off (SQLITE_TUNING environment variable if None)
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or get_database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    if sqlite_tuning is None:
+        sqlite_tuning = os.environ.get('SQLITE_TUNING', 'true').lower() == 'true'
+    tuned = sqlite_tuning and uri.startswith('sqlite') and ':memory:' not in uri and uri != 'sqlite://'
+    if tuned:
+        busy_timeout_ms = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+        writer, reader = engine_options(busy_timeout_ms=busy_timeout_ms,
+                                        reader_pool_size=int(os.environ.get('SQLITE_READER_POOL_SIZE', 4)))
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = writer
+        app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {},
+                                              **{READER_BIND: dict(reader, url=uri)})
+
+    db.init_app(app)
+
+    if tuned:
+        # Le bind de lecture n'a pas de tables propres: sans métadonnées, create_all l'ignore
+        # (y compris pour les autres applications partageant l'extension)
+        db.metadatas.pop(READER_BIND, None)
+        pragmas = sqlite_pragmas(busy_timeout_ms=busy_timeout_ms,
+                                 cache_size_kb=int(os.environ.get('SQLITE_CACHE_SIZE_KB', 32768)),
+                                 mmap_size=int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)))
+        with app.app_context():
+            install_pragmas(db.engines[None], pragmas)
+            install_pragmas(db.engines[READER_BIND], pragmas, read_only=True)
+
+def _add_alert_model_version():
+    """Colonne alerts.model_version (version du modèle ayant scoré la lecture)"""
+    columns = {column['name'] for column in inspect(db.session.connection()).get_columns('alerts')}
+    if 'model_version' not in columns:
+        db.session.execute(text("ALTER TABLE alerts ADD COLUMN model_version VARCHAR(100)"))
+
+
+def _create_time_series_indexes():
+    """
+    Index composites des requêtes fréquentes: dernières lectures d'un capteur
+    (sensor_id, timestamp), alerte active similaire (machine_id, sensor_type, status) et
+    alertes par statut triées par date (status, timestamp). Les index déjà présents (tables
+    créées par create_all) sont conservés; sur TimescaleDB, ils s'appliquent à tous les chunks.
+    """
+    from models import Alert, SensorData
+
+    connection = db.session.connection()
+    for table in (SensorData.__table__, Alert.__table__):
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _create_sensor_latest():
+    """Table sensor_latest, remplie à partir des lectures déjà enregistrées (une requête fenêtrée)"""
+    from models import SensorLatest
+
+    connection = db.session.connection()
+    SensorLatest.__table__.create(connection, checkfirst=True)
+    db.session.execute(text("DELETE FROM sensor_latest"))
+    db.session.execute(text("""
+        INSERT INTO sensor_latest (sensor_id, value, timestamp, reading_count)
+        SELECT sensor_id, value, timestamp, reading_count FROM (
+            SELECT sensor_id, value, timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY timestamp DESC, id DESC) AS position,
+                   COUNT(*) OVER (PARTITION BY sensor_id) AS reading_count
+            FROM sensor_data
+        ) ranked
+        WHERE position = 1
+    """))
+
+
+def _create_sensor_rollups(chunk_size=50000):
+    """
+    Table sensor_rollups, remplie à partir des lectures déjà enregistrées par blocs de
+    chunk_size lignes (pagination sur la clé primaire), avec le même calcul qu'à l'écriture
+    """
+    from models import SensorData, SensorRollup
+
+    connection = db.session.connection()
+    SensorRollup.__table__.create(connection, checkfirst=True)
+    db.session.execute(text("DELETE FROM sensor_rollups"))
+    last_id = 0
+    while True:
+        rows = db.session.query(SensorData.id, SensorData.sensor_id, SensorData.value, SensorData.timestamp) \
+            .filter(SensorData.id > last_id) \
+            .order_by(SensorData.id) \
+            .limit(chunk_size) \
+            .all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        update_sensor_rollups([{'sensor_id': sensor_id, 'value': value, 'timestamp': timestamp}
+                               for _, sensor_id, value, timestamp in rows])
+
+
+# Migrations du schéma, appliquées une seule fois et dans l'ordre (version, description, étape).
+# Chaque étape tolère un schéma déjà à jour: create_all crée directement les tables récentes.
+MIGRATIONS = [
+    (1, "colonne alerts.model_version", _add_alert_model_version),
+    (2, "index composites sensor_data et alerts", _create_time_series_indexes),
+    (3, "table sensor_latest (dernière lecture de chaque capteur)", _create_sensor_latest),
+    (4, "table sensor_rollups (agrégats par minute, heure et jour)", _create_sensor_rollups),
+]
+
+
+def migrate_schema():
+    """
+    Applique les migrations absentes de la table schema_migrations (create_all ne modifie pas
+    les tables existantes). Chaque migration est validée avec son numéro de version.
+
+    Returns:
+        Liste des versions appliquées
+    """
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations "
+        "(version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP)"))
+    db.session.commit()
+    applied = {row[0] for row in db.session.execute(text("SELECT version FROM schema_migrations"))}
+
+    done = []
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            step()
+            db.session.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        done.append(version)
+        print(f"Migration {version}: {description}")
+    return done
+
+
 def init_db(app):
     """
     Initialize the database with the Flask application
     """
-    # Configure the SQLAlchemy part of the app instance
+    # Configure the SQLAlchemy part of the app instance and initialize SQLAlchemy with the app
     app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    # Initialize SQLAlchemy with the app
-    db.init_app(app)
+    configure_database(app)
     
     # Create tables if they don't exist
     with app.app_context():
         db.create_all()
+        migrate_schema()
         
         # Setup TimescaleDB if PostgreSQL is used
         db_type = os.environ.get('DB_TYPE', 'sqlite')
@@ -152,13 +299,391 @@ def init_db(app):
             print("Database initialized with sample data.")
 
 
+# Fonctions utilitaires pour l'ingestion
+
+def insert_sensor_readings(rows):
+    """
+    Insère un lot de lectures de capteurs en une seule instruction INSERT
+    (executemany), sans créer d'objets ORM, et met à jour sensor_latest et sensor_rollups dans
+    la même transaction. Le commit reste à la charge de l'appelant.
+
+    Args:
+        rows: Liste de dictionnaires avec les clés sensor_id, value et timestamp
+
+    Returns:
+        Nombre de lignes insérées
+    """
+    from models import SensorData
+
+    if not rows:
+        return 0
+
+    db.session.execute(SensorData.__table__.insert(), rows)
+    update_sensor_latest(rows)
+    update_sensor_rollups(rows)
+    return len(rows)
+
+
+def _upsert(table):
+    """INSERT ... ON CONFLICT du dialecte de la connexion d'écriture (SQLite ou PostgreSQL)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def update_sensor_latest(rows):
+    """
+    Reporte un lot de lectures dans sensor_latest par un seul upsert (INSERT ... ON CONFLICT,
+    SQLite et PostgreSQL): une ligne par capteur, avec sa lecture la plus récente et le nombre
+    de lectures du lot. Une lecture plus ancienne que celle enregistrée (arrivée en retard) ne
+    remplace pas la dernière valeur mais est comptée.
+    """
+    from models import SensorLatest
+
+    latest = {}
+    for row in rows:
+        timestamp = row.get('timestamp') or datetime.utcnow()
+        entry = latest.get(row['sensor_id'])
+        if entry is None:
+            latest[row['sensor_id']] = {'sensor_id': row['sensor_id'], 'value': row['value'],
+                                        'timestamp': timestamp, 'reading_count': 1}
+            continue
+        entry['reading_count'] += 1
+        if timestamp >= entry['timestamp']:
+            entry.update(value=row['value'], timestamp=timestamp)
+
+    table = SensorLatest.__table__
+    statement = _upsert(table)
+    newer = statement.excluded.timestamp >= table.c.timestamp
+    statement = statement.on_conflict_do_update(index_elements=[table.c.sensor_id], set_={
+        'value': case((newer, statement.excluded.value), else_=table.c.value),
+        'timestamp': case((newer, statement.excluded.timestamp), else_=table.c.timestamp),
+        'reading_count': table.c.reading_count + statement.excluded.reading_count
+    })
+    db.session.execute(statement, list(latest.values()))
+
+
+# Résolutions des agrégats de sensor_rollups, en secondes (minute, heure, jour)
+ROLLUP_RESOLUTIONS = (60, 3600, 86400)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _floor_timestamp(timestamp, resolution):
+    """Début de l'intervalle de resolution secondes (aligné sur l'epoch UTC) contenant timestamp"""
+    return timestamp - (timestamp - EPOCH) % timedelta(seconds=resolution)
+
+
+def update_sensor_rollups(rows):
+    """
+    Reporte un lot de lectures dans sensor_rollups par un seul upsert: pour chaque capteur et
+    chaque résolution de ROLLUP_RESOLUTIONS, nombre, somme, minimum et maximum des lectures de
+    chaque intervalle, ajoutés à ceux déjà enregistrés. Une lecture arrivée en retard met à
+    jour l'intervalle auquel elle appartient.
+    """
+    from models import SensorRollup
+
+    rollups = {}
+    for row in rows:
+        timestamp = row.get('timestamp') or datetime.utcnow()
+        value = float(row['value'])
+        for resolution in ROLLUP_RESOLUTIONS:
+            bucket_start = _floor_timestamp(timestamp, resolution)
+            entry = rollups.get((row['sensor_id'], resolution, bucket_start))
+            if entry is None:
+                rollups[(row['sensor_id'], resolution, bucket_start)] = {
+                    'sensor_id': row['sensor_id'], 'resolution': resolution, 'bucket_start': bucket_start,
+                    'count': 1, 'sum_value': value, 'min_value': value, 'max_value': value}
+                continue
+            entry['count'] += 1
+            entry['sum_value'] += value
+            entry['min_value'] = min(entry['min_value'], value)
+            entry['max_value'] = max(entry['max_value'], value)
+
+    table = SensorRollup.__table__
+    statement = _upsert(table)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.sensor_id, table.c.resolution, table.c.bucket_start], set_={
+            'count': table.c.count + excluded.count,
+            'sum_value': table.c.sum_value + excluded.sum_value,
+            'min_value': case((excluded.min_value < table.c.min_value, excluded.min_value), else_=table.c.min_value),
+            'max_value': case((excluded.max_value > table.c.max_value, excluded.max_value), else_=table.c.max_value)
+        })
+    db.session.execute(statement, list(rollups.values()))
+
+
+def _covered_range(resolution, start=None, end=None):
+    """
+    Bornes [lower, upper) des débuts d'intervalles de resolution secondes entièrement compris
+    dans [start, end] (None pour une borne absente)
+    """
+    lower = start + (EPOCH - start) % timedelta(seconds=resolution) if start else None
+    upper = _floor_timestamp(end + timedelta(microseconds=1), resolution) if end else None
+    return lower, upper
+
+
+def rollup_resolution(step, start_time=None, end_time=None):
+    """
+    Résolution la plus grossière de sensor_rollups dont les intervalles composent exactement
+    des intervalles de step secondes (step multiple de la résolution) et dont au moins un
+    intervalle est entièrement compris entre start_time et end_time; None sinon
+    """
+    start = _as_datetime(start_time) if start_time else None
+    end = _as_datetime(end_time) if end_time else None
+    for resolution in sorted(ROLLUP_RESOLUTIONS, reverse=True):
+        if step % resolution == 0:
+            lower, upper = _covered_range(resolution, start, end)
+            if lower is None or upper is None or lower < upper:
+                return resolution
+    return None
+
+
+def get_latest_sensor_states(machine_id=None, sensor_types=None):
+    """
+    État courant du parc en une seule requête: chaque capteur avec sa machine et sa dernière
+    lecture (table sensor_latest), sans requête par capteur.
+
+    Args:
+        machine_id: Identifiant public d'une machine (tout le parc si None)
+        sensor_types: Types de capteurs retenus (tous si None)
+
+    Returns:
+        Liste de tuples (Machine, Sensor, SensorLatest ou None si le capteur n'a aucune lecture),
+        triés par machine puis par capteur
+    """
+    from models import Machine, Sensor, SensorLatest
+
+    query = db.session.query(Machine, Sensor, SensorLatest) \
+        .join(Sensor, Sensor.machine_id == Machine.id) \
+        .outerjoin(SensorLatest, SensorLatest.sensor_id == Sensor.id)
+    if machine_id is not None:
+        query = query.filter(Machine.machine_id == machine_id)
+    if sensor_types is not None:
+        query = query.filter(Sensor.type.in_(sensor_types))
+    return query.order_by(Machine.id, Sensor.id).all()
+
+
+def get_recent_sensor_readings(limit_per_sensor=10):
+    """
+    Récupère les dernières lectures de chaque capteur en une seule requête
+    (ROW_NUMBER() partitionné par capteur), pour initialiser l'historique du détecteur.
+
+    Args:
+        limit_per_sensor: Nombre maximal de lectures par capteur
+
+    Returns:
+        Liste de tuples (machine_id, sensor_type, value, timestamp), triés par capteur
+        puis de la plus ancienne à la plus récente lecture
+    """
+    from models import Machine, Sensor, SensorData
+
+    ranked = db.session.query(
+        SensorData.sensor_id,
+        SensorData.value,
+        SensorData.timestamp,
+        func.row_number().over(
+            partition_by=SensorData.sensor_id,
+            order_by=(SensorData.timestamp.desc(), SensorData.id.desc())
+        ).label('position')
+    ).subquery()
+
+    return db.session.query(Machine.machine_id, Sensor.type, ranked.c.value, ranked.c.timestamp) \
+        .join(Sensor, Sensor.id == ranked.c.sensor_id) \
+        .join(Machine, Machine.id == Sensor.machine_id) \
+        .filter(ranked.c.position <= limit_per_sensor) \
+        .order_by(ranked.c.sensor_id, ranked.c.position.desc()) \
+        .all()
+
+
+def load_sensor_thresholds(machine_id=None):
+    """
+    Seuils propres à chaque capteur d'après la table sensors, en une seule requête.
+
+    La plage normale (normal_range_min/max) remplace celle du type lorsqu'elle est renseignée
+    et cohérente; min_value/max_value deviennent alors les seuils critiques s'ils l'encadrent.
+    Les capteurs sans plage normale gardent les seuils de leur type (valeurs None).
+
+    Args:
+        machine_id: Identifiant d'une machine pour ne compiler que ses capteurs (toutes si None)
+
+    Returns:
+        Dictionnaire {(machine_id, sensor_type): {min_normal, max_normal, critical_low,
+        critical_high}} (voir AdvancedAnomalyDetector.set_sensor_thresholds)
+    """
+    from models import Machine, Sensor
+
+    query = db.session.query(Machine.machine_id, Sensor.type, Sensor.min_value, Sensor.max_value,
+                             Sensor.normal_range_min, Sensor.normal_range_max) \
+        .join(Machine, Machine.id == Sensor.machine_id)
+    if machine_id is not None:
+        query = query.filter(Machine.machine_id == machine_id)
+
+    thresholds = {}
+    for machine, sensor_type, min_value, max_value, normal_min, normal_max in query.all():
+        limits = dict.fromkeys(('min_normal', 'max_normal', 'critical_low', 'critical_high'))
+        if normal_min is not None and normal_max is not None and normal_min < normal_max:
+            limits.update(min_normal=normal_min, max_normal=normal_max)
+            if min_value is not None and min_value < normal_min:
+                limits['critical_low'] = min_value
+            if max_value is not None and max_value > normal_max:
+                limits['critical_high'] = max_value
+        thresholds[(machine, sensor_type)] = limits
+    return thresholds
+
+
+def iter_sensor_values(sensor_type, chunk_size=10000):
+    """
+    Parcourt toutes les valeurs enregistrées d'un type de capteur par blocs de chunk_size lignes
+    (pagination sur la clé primaire), sans charger l'historique complet en mémoire.
+
+    Args:
+        sensor_type: Type de capteur
+        chunk_size: Nombre de lignes par requête
+
+    Yields:
+        Tableaux NumPy (float64) des valeurs de chaque bloc, dans l'ordre d'insertion
+    """
+    from models import Sensor, SensorData
+
+    last_id = 0
+    while True:
+        rows = db.session.query(SensorData.id, SensorData.value) \
+            .join(Sensor, Sensor.id == SensorData.sensor_id) \
+            .filter(Sensor.type == sensor_type, SensorData.id > last_id) \
+            .order_by(SensorData.id) \
+            .limit(chunk_size) \
+            .all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield np.fromiter((value for _, value in rows), dtype=np.float64, count=len(rows))
+        if len(rows) < chunk_size:
+            return
+
+
 # Fonctions utilitaires pour les requêtes temporelles
 
+def parse_interval(interval):
+    """
+    Durée d'un intervalle d'agrégation en secondes entières. Accepte les écritures PostgreSQL
+    ('1 minute', '5 minutes', '1 hour') et pandas ('10s', '5min', '1h', '1D').
+    """
+    try:
+        seconds = pd.Timedelta(interval).total_seconds()
+    except (TypeError, ValueError):
+        raise ValueError(f"Intervalle d'agrégation invalide: {interval}")
+    if seconds < 1 or seconds != int(seconds):
+        raise ValueError(f"L'intervalle d'agrégation doit être un nombre entier de secondes: {interval}")
+    return int(seconds)
+
+
+def _as_datetime(value):
+    """Borne temporelle (datetime ou chaîne ISO) en datetime naïf UTC, comme les horodatages stockés"""
+    if value is None or isinstance(value, datetime):
+        return value
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return timestamp.to_pydatetime()
+
+
+def _time_filters(column, start_time, end_time):
+    """Filtres start_time <= column <= end_time (bornes absentes ignorées)"""
+    filters = []
+    if start_time:
+        filters.append(column >= _as_datetime(start_time))
+    if end_time:
+        filters.append(column <= _as_datetime(end_time))
+    return filters
+
+
+def _bucket_origin(first_timestamp):
+    """Origine des intervalles en secondes epoch: minuit du jour de la première ligne (origin='start_day' de pandas)"""
+    return int(pd.Timestamp(first_timestamp).normalize().timestamp())
+
+
+def _epoch_seconds(column):
+    """Secondes epoch entières d'un horodatage naïf UTC, dans le dialecte de la base"""
+    if db.engine.dialect.name == 'sqlite':
+        return cast(func.strftime('%s', column), Integer)
+    return cast(func.floor(func.extract('epoch', column)), BigInteger)
+
+
+def _epoch_bucket(column, origin, step):
+    """Numéro d'intervalle d'un horodatage: (secondes epoch - origin) // step, en entiers"""
+    return ((_epoch_seconds(column) - origin) / step).label('bucket')
+
+
+def _bucket_timestamps(origin, step, buckets):
+    """Début de chaque intervalle, en datetime64 comme les horodatages chargés par pandas"""
+    return pd.to_datetime([datetime.fromtimestamp(origin + int(bucket) * step, tz=timezone.utc).replace(tzinfo=None)
+                           for bucket in buckets])
+
+
+def _rollup_timeseries(sensor_id, step, resolution, start_time=None, end_time=None):
+    """
+    Intervalles de step secondes d'un capteur composés dans la base à partir des agrégats de
+    sensor_rollups à la résolution resolution (voir rollup_resolution). Seuls les intervalles
+    partiellement couverts par les bornes start_time/end_time sont lus dans sensor_data (agrégés
+    à la même résolution et ajoutés aux agrégats par UNION ALL).
+    """
+    from models import SensorData, SensorRollup
+
+    start = _as_datetime(start_time) if start_time else None
+    end = _as_datetime(end_time) if end_time else None
+    # Agrégats entièrement compris dans [start, end]: début >= lower et début < upper
+    lower, upper = _covered_range(resolution, start, end)
+
+    filters = [SensorRollup.sensor_id == sensor_id, SensorRollup.resolution == resolution]
+    if lower is not None:
+        filters.append(SensorRollup.bucket_start >= lower)
+    if upper is not None:
+        filters.append(SensorRollup.bucket_start < upper)
+    parts = [select(_epoch_seconds(SensorRollup.bucket_start).label('epoch'), SensorRollup.count,
+                    SensorRollup.sum_value, SensorRollup.min_value, SensorRollup.max_value).where(*filters)]
+
+    edges = []
+    if start:
+        edges.append(and_(SensorData.timestamp >= start, SensorData.timestamp < lower))
+    if end:
+        edges.append(and_(SensorData.timestamp >= upper, SensorData.timestamp <= end))
+    if edges:
+        bucket = _epoch_bucket(SensorData.timestamp, 0, resolution)
+        parts.append(select((bucket * resolution).label('epoch'), func.count(SensorData.id).label('count'),
+                            func.sum(SensorData.value), func.min(SensorData.value), func.max(SensorData.value))
+                     .where(SensorData.sensor_id == sensor_id, or_(*edges)).group_by(bucket))
+    pieces = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+
+    first = db.session.execute(select(func.min(pieces.c.epoch))).scalar()
+    if first is None:
+        return pd.DataFrame(columns=['timestamp', 'avg_value', 'min_value', 'max_value'])
+
+    origin = _bucket_origin(pd.Timestamp(int(first), unit='s'))
+    bucket = ((pieces.c.epoch - origin) / step).label('bucket')
+    rows = db.session.execute(
+        select(bucket, (func.sum(pieces.c.sum_value) / func.sum(pieces.c.count)).label('avg_value'),
+               func.min(pieces.c.min_value), func.max(pieces.c.max_value))
+        .group_by(bucket).order_by(bucket)).all()
+
+    # Intervalles vides entre le premier et le dernier agrégat: NaN, comme resample
+    frame = pd.DataFrame(rows, columns=['bucket', 'avg_value', 'min_value', 'max_value']) \
+        .set_index('bucket').reindex(range(rows[0][0], rows[-1][0] + 1))
+    frame.insert(0, 'timestamp', _bucket_timestamps(origin, step, frame.index))
+    return frame.reset_index(drop=True)
+
+
 def get_sensor_data_timeseries(machine_id, sensor_type, start_time=None, end_time=None, interval='1 minute'):
     """
     Récupère les données de capteur pour une machine et un type de capteur donné,
     agrégées sur un intervalle de temps.
     
+    Lorsque l'intervalle est un multiple d'une résolution de sensor_rollups (minute, heure,
+    jour), le résultat est composé à partir de la plus grossière de ces résolutions, sans
+    parcourir les lectures brutes hors des bords de la période (voir _rollup_timeseries).
+    
     Args:
         machine_id: ID de la machine
         sensor_type: Type de capteur (temperature, pressure, etc.)
@@ -181,48 +706,32 @@ def get_sensor_data_timeseries(machine_id, sensor_type, start_time=None, end_tim
     if not sensor:
         return pd.DataFrame()
     
-    # Construire la requête de base
-    query = db.session.query(SensorData).filter(SensorData.sensor_id == sensor.id)
-    
-    # Ajouter les filtres de temps si nécessaire
-    if start_time:
-        query = query.filter(SensorData.timestamp >= start_time)
-    if end_time:
-        query = query.filter(SensorData.timestamp <= end_time)
-    
-    # Exécuter la requête
-    results = query.order_by(SensorData.timestamp).all()
-    
-    # Convertir en DataFrame pandas
-    data = {
-        'timestamp': [r.timestamp for r in results],
-        'value': [r.value for r in results]
-    }
+    step = parse_interval(interval)
+    resolution = rollup_resolution(step, start_time, end_time)
+    if resolution is not None:
+        return _rollup_timeseries(sensor.id, step, resolution, start_time, end_time)
     
-    df = pd.DataFrame(data)
-    
-    # Si pas de données, retourner un DataFrame vide
-    if df.empty:
-        return df
+    # SQLite: agrégation dans la base, par division entière des secondes epoch
+    if db.engine.dialect.name == 'sqlite':
+        filters = [SensorData.sensor_id == sensor.id] + _time_filters(SensorData.timestamp, start_time, end_time)
+        first = db.session.query(func.min(SensorData.timestamp)).filter(*filters).scalar()
+        if first is None:
+            return pd.DataFrame(columns=['timestamp', 'avg_value', 'min_value', 'max_value'])
         
-    # Définir timestamp comme index
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df.set_index('timestamp', inplace=True)
-    
-    # Agréger par intervalle si SQLite
-    if os.environ.get('DB_TYPE') == 'sqlite':
-        # Pour SQLite, nous faisons l'agrégation en pandas
-        resampled = df.resample(interval).agg({
-            'value': ['mean', 'min', 'max']
-        })
+        origin = _bucket_origin(first)
+        bucket = _epoch_bucket(SensorData.timestamp, origin, step)
+        rows = db.session.query(bucket, func.avg(SensorData.value), func.min(SensorData.value),
+                                func.max(SensorData.value)) \
+            .filter(*filters).group_by(bucket).order_by(bucket).all()
         
-        # Aplatir les colonnes multi-index
-        resampled.columns = ['avg_value', 'min_value', 'max_value']
-        resampled.reset_index(inplace=True)
-        return resampled
+        # Intervalles vides entre la première et la dernière lecture: NaN, comme resample
+        frame = pd.DataFrame(rows, columns=['bucket', 'avg_value', 'min_value', 'max_value']) \
+            .set_index('bucket').reindex(range(rows[0][0], rows[-1][0] + 1))
+        frame.insert(0, 'timestamp', _bucket_timestamps(origin, step, frame.index))
+        return frame.reset_index(drop=True)
     else:
         # Pour PostgreSQL/TimescaleDB, nous utilisons une requête SQL directe
-        # qui sera beaucoup plus efficace
+        # (time_bucket)
         sql = f"""
         SELECT 
             time_bucket('{interval}', sd.timestamp) as bucket,
@@ -284,39 +793,21 @@ def get_anomaly_count_by_machine(start_time=None, end_time=None, interval='1 hou
     """
     from models import Machine, Alert
     
-    # Requête SQLite
-    if os.environ.get('DB_TYPE') == 'sqlite':
-        # Construire la requête de base
-        query = db.session.query(Alert).join(Machine)
-        
-        # Ajouter les filtres de temps si nécessaire
-        if start_time:
-            query = query.filter(Alert.timestamp >= start_time)
-        if end_time:
-            query = query.filter(Alert.timestamp <= end_time)
-        
-        # Exécuter la requête
-        results = query.order_by(Alert.timestamp).all()
-        
-        # Convertir en DataFrame pandas
-        data = {
-            'timestamp': [r.timestamp for r in results],
-            'machine_id': [r.machine.machine_id for r in results]
-        }
-        
-        df = pd.DataFrame(data)
-        
-        # Si pas de données, retourner un DataFrame vide
-        if df.empty:
-            return df
-            
-        # Définir timestamp comme index
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
+    # SQLite: comptage dans la base, par division entière des secondes epoch
+    if db.engine.dialect.name == 'sqlite':
+        step = parse_interval(interval)
+        filters = _time_filters(Alert.timestamp, start_time, end_time)
+        first = db.session.query(func.min(Alert.timestamp)).join(Machine).filter(*filters).scalar()
+        if first is None:
+            return pd.DataFrame(columns=['timestamp', 'machine_id', 'anomaly_count'])
         
-        # Compter les anomalies par machine et par intervalle de temps
-        counts = df.groupby([pd.Grouper(freq=interval), 'machine_id']).size().reset_index(name='anomaly_count')
+        origin = _bucket_origin(first)
+        bucket = _epoch_bucket(Alert.timestamp, origin, step)
+        rows = db.session.query(bucket, Machine.machine_id, func.count(Alert.id)).join(Machine) \
+            .filter(*filters).group_by(bucket, Machine.machine_id).order_by(bucket, Machine.machine_id).all()
         
+        counts = pd.DataFrame(rows, columns=['bucket', 'machine_id', 'anomaly_count'])
+        counts.insert(0, 'timestamp', _bucket_timestamps(origin, step, counts.pop('bucket')))
         return counts
     else:
         # Pour PostgreSQL/TimescaleDB
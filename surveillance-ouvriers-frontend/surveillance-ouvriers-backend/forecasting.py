@@ -0,0 +1,100 @@
+import numpy as np
+
+# Constante de Huber (en écarts-types robustes) et facteur de l'écart absolu médian
+HUBER_K = 1.345
+MAD_SCALE = 1.4826
+
+
+def fit_trends(timestamps, values, counts, robust=False, iterations=3):
+    """
+    Ajuste une droite valeur = niveau + pente * t sur la fenêtre de chaque capteur, pour tous les
+    capteurs à la fois: les équations normales (2 x 2) de chaque ligne sont résolues en un seul
+    appel à np.linalg.solve. Le temps est compté en minutes depuis la dernière lecture, si bien
+    que le niveau est la valeur ajustée à l'instant de la dernière lecture.
+
+    Args:
+        timestamps: Tableau (capteurs, fenêtre) d'horodatages en secondes epoch
+        values: Tableau (capteurs, fenêtre) de valeurs
+        counts: Nombre de points valides par capteur (les derniers de chaque ligne)
+        robust: Régression de Huber (moindres carrés repondérés) au lieu des moindres carrés
+        iterations: Nombre de repondérations en mode robuste
+
+    Returns:
+        (niveau, pente par minute, erreur-type de la pente, validité) pour chaque capteur; une
+        ligne est invalide avec moins de 3 points ou des horodatages tous identiques
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts)
+    window = values.shape[1]
+    mask = np.arange(window) >= window - counts[:, None]
+
+    minutes = np.where(mask, (timestamps - timestamps[:, -1:]) / 60.0, 0.0)
+    spread = np.where(mask, minutes, -np.inf).max(axis=1) - np.where(mask, minutes, np.inf).min(axis=1)
+    valid = (counts >= 3) & (spread > 0)
+    weights = (mask & valid[:, None]).astype(float)
+
+    for iteration in range(iterations + 1 if robust else 1):
+        # Équations normales pondérées [[Σw, Σwt], [Σwt, Σwt²]] [niveau, pente] = [Σwy, Σwty]
+        sw, swt, swtt = weights.sum(axis=1), (weights * minutes).sum(axis=1), (weights * minutes ** 2).sum(axis=1)
+        matrices = np.stack([np.stack([sw, swt], axis=-1), np.stack([swt, swtt], axis=-1)], axis=1)
+        matrices[~valid] = np.eye(2)
+        rhs = np.stack([(weights * values).sum(axis=1), (weights * minutes * values).sum(axis=1)], axis=-1)
+        rhs[~valid] = 0.0
+        level, slope = np.linalg.solve(matrices, rhs[..., None])[..., 0].T
+
+        residuals = np.where(mask, values - (level[:, None] + slope[:, None] * minutes), np.nan)
+        if iteration == iterations or not robust:
+            break
+        # Poids de Huber: 1 près de la droite, k * s / |r| au-delà (points aberrants atténués)
+        scale = MAD_SCALE * np.nanmedian(np.abs(residuals[valid]), axis=1) if valid.any() else np.empty(0)
+        scales = np.ones(len(values))
+        scales[valid] = np.where(scale > 0, scale, 1.0)
+        ratio = np.abs(np.nan_to_num(residuals)) / (HUBER_K * scales[:, None])
+        weights = np.where(mask & valid[:, None], np.minimum(1.0, 1.0 / np.maximum(ratio, 1e-12)), 0.0)
+
+    # Erreur-type de la pente: variance résiduelle / Σw(t - t̄)²
+    sw = np.maximum(weights.sum(axis=1), 1.0)
+    mean_minutes = (weights * minutes).sum(axis=1) / sw
+    sxx = (weights * (minutes - mean_minutes[:, None]) ** 2).sum(axis=1)
+    rss = (weights * np.nan_to_num(residuals) ** 2).sum(axis=1)
+    dof = np.maximum(counts - 2, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope_error = np.where(valid, np.sqrt(rss / dof / sxx), np.inf)
+    return level, slope, slope_error, valid
+
+
+def forecast(timestamps, values, counts, low, high, horizon=30, robust=False, significance=2.0):
+    """
+    Prévision linéaire de chaque capteur: valeur projetée à horizon minutes et délai avant le
+    franchissement de chaque seuil critique. Une pente inférieure à significance erreurs-types
+    est considérée comme nulle (bruit), afin de ne pas extrapoler les fluctuations.
+
+    Args:
+        timestamps, values, counts: Fenêtres des capteurs (voir fit_trends)
+        low, high: Seuils critiques bas et haut de chaque capteur
+        horizon: Horizon de projection en minutes
+        robust: Régression de Huber
+        significance: Nombre d'erreurs-types au-delà duquel la pente est retenue
+
+    Returns:
+        Dictionnaire de tableaux: level, slope (par minute), projected, minutes_to_high,
+        minutes_to_low (inf si le seuil n'est pas approché, 0 s'il est déjà franchi) et valid
+    """
+    low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    level, slope, slope_error, valid = fit_trends(timestamps, values, counts, robust=robust)
+    # Une série constante s'ajuste sans résidu: la pente résiduelle d'arrondi est aussi ignorée
+    significant = (np.abs(slope) > significance * slope_error) & (np.abs(slope) > 1e-9 * (1 + np.abs(level)))
+    slope = np.where(valid & significant, slope, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minutes_to_high = np.where(level >= high, 0.0, np.where(slope > 0, (high - level) / slope, np.inf))
+        minutes_to_low = np.where(level <= low, 0.0, np.where(slope < 0, (low - level) / slope, np.inf))
+    return {
+        'level': level,
+        'slope': slope,
+        'projected': level + slope * horizon,
+        'minutes_to_high': minutes_to_high,
+        'minutes_to_low': minutes_to_low,
+        'valid': valid
+    }
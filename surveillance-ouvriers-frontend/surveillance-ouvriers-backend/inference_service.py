@@ -0,0 +1,436 @@
+import logging
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from machine_learning import IsolationForestModel
+
+logger = logging.getLogger('industrial_monitoring')
+
+# Lignes des tampons partagés (une colonne par lecture du micro-lot)
+INPUT_ROWS = 3   # valeur, horodatage (secondes epoch), identifiant du capteur dans le processus
+OUTPUT_ROWS = 4  # risque non arrondi, valeur future, minutes avant seuil critique, index de la version du modèle
+
+
+def _inference_worker(connection, input_name, output_name, capacity, registry_dir, stats_span, robust_forecast):
+    """
+    Boucle d'un processus d'inférence. Le processus possède son propre détecteur et donc
+    l'historique des capteurs qui lui sont routés. Le pipe ne transporte que des commandes
+    courtes; les lectures et les résultats passent par les tampons partagés.
+    """
+    detector = IsolationForestModel(registry_dir=registry_dir, stats_span=stats_span,
+                                    robust_forecast=robust_forecast)
+    detector.preload()
+    for future in detector.registry.load_latest():
+        future.result()
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray((INPUT_ROWS, capacity), dtype=np.float64, buffer=input_memory.buf)
+    outputs = np.ndarray((OUTPUT_ROWS, capacity), dtype=np.float64, buffer=output_memory.buf)
+    sensors = {}  # identifiant -> (machine_id, sensor_type)
+    connection.send(('ready', None))
+
+    try:
+        while True:
+            message = connection.recv()
+            command = message[0]
+            if command == 'stop':
+                break
+            try:
+                if command in ('predict', 'evaluate'):
+                    _, count, new_sensors = message
+                    sensors.update(new_sensors)
+                    readings = [
+                        {'machine_id': sensors[sensor_id][0], 'sensor_type': sensors[sensor_id][1],
+                         'value': value, 'timestamp': timestamp}
+                        for value, timestamp, sensor_id in zip(
+                            inputs[0, :count].tolist(), inputs[1, :count].tolist(),
+                            inputs[2, :count].astype(np.int64).tolist())
+                    ]
+                    if command == 'predict':
+                        results = detector.predict_batch_values(readings)
+                    else:
+                        results = [detector.evaluate_values(data) for data in readings]
+                    # Les versions (chaînes) sont renvoyées par le pipe, une seule fois par lot
+                    labels = sorted({result[3] for result in results})
+                    label_index = {label: index for index, label in enumerate(labels)}
+                    outputs[:3, :count] = np.array([result[:3] for result in results], dtype=np.float64).T
+                    outputs[3, :count] = [label_index[result[3]] for result in results]
+                    connection.send(('ok', labels))
+                elif command == 'forecast':
+                    connection.send(('ok', detector.forecast_sensors(message[1])))
+                elif command == 'score_machines':
+                    connection.send(('ok', detector.score_machines(message[1])))
+                elif command == 'warm_start':
+                    connection.send(('ok', detector.warm_start(message[1], workers=1)))
+                elif command == 'stats':
+                    connection.send(('ok', detector.stats()))
+                elif command == 'load_model':
+                    # Chargement en arrière-plan: le processus continue de servir les micro-lots
+                    _, scope, sensor_type, version = message
+                    version = detector.registry.resolve_version(scope, sensor_type, version)
+                    detector.load_model(scope, sensor_type, version)
+                    connection.send(('ok', f"{scope}/{sensor_type}@{version}"))
+                elif command == 'model_state':
+                    _, scope, sensor_type = message
+                    connection.send(('ok', (detector.registry.active_label(scope, sensor_type),
+                                            detector.registry.failed_loads)))
+                elif command == 'set_machine_types':
+                    detector.set_machine_types(message[1])
+                    connection.send(('ok', None))
+                elif command == 'set_sensor_thresholds':
+                    detector.set_sensor_thresholds(message[1])
+                    connection.send(('ok', None))
+                elif command == 'model_versions':
+                    connection.send(('ok', detector.model_versions()))
+                else:
+                    connection.send(('error', f"Commande inconnue: {command}"))
+            except Exception as e:
+                connection.send(('error', str(e)))
+    finally:
+        # Libérer les vues avant de fermer les segments partagés
+        del inputs, outputs
+        input_memory.close()
+        output_memory.close()
+
+
+class _InferenceWorker:
+    """Côté parent d'un processus d'inférence: pipe, tampons partagés et identifiants des capteurs."""
+
+    def __init__(self, context, index, capacity, registry_dir, stats_span, robust_forecast):
+        self.capacity = capacity
+        self.input_memory = shared_memory.SharedMemory(create=True, size=INPUT_ROWS * capacity * 8)
+        self.output_memory = shared_memory.SharedMemory(create=True, size=OUTPUT_ROWS * capacity * 8)
+        self.inputs = np.ndarray((INPUT_ROWS, capacity), dtype=np.float64, buffer=self.input_memory.buf)
+        self.outputs = np.ndarray((OUTPUT_ROWS, capacity), dtype=np.float64, buffer=self.output_memory.buf)
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_inference_worker,
+            args=(child_connection, self.input_memory.name, self.output_memory.name, capacity, registry_dir,
+                  stats_span, robust_forecast),
+            name=f'inference-worker-{index}',
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.lock = threading.Lock()  # Un micro-lot à la fois par processus (ordre par capteur)
+        self.sensor_ids = {}          # clé de capteur -> identifiant transmis au processus
+        self.readings = 0
+        self.batches = 0
+
+    def call(self, *message):
+        """Envoie une commande et attend la réponse (à appeler sous self.lock)."""
+        self.connection.send(message)
+        return self.receive()
+
+    def receive(self):
+        """Attend la réponse du processus; lève RuntimeError en cas d'erreur côté processus."""
+        status, payload = self.connection.recv()
+        if status == 'error':
+            raise RuntimeError(f"Erreur du processus d'inférence {self.process.name}: {payload}")
+        return payload
+
+    def send_batch(self, command, readings, items, timestamps):
+        """Copie un micro-lot dans le tampon d'entrée et notifie le processus (à appeler sous self.lock)."""
+        count = len(items)
+        new_sensors = {}
+        sensor_ids = np.empty(count)
+        for position, (index, key) in enumerate(items):
+            sensor_id = self.sensor_ids.get(key)
+            if sensor_id is None:
+                sensor_id = len(self.sensor_ids)
+                self.sensor_ids[key] = sensor_id
+                new_sensors[sensor_id] = (str(readings[index]['machine_id']), readings[index]['sensor_type'])
+            sensor_ids[position] = sensor_id
+
+        self.inputs[0, :count] = [readings[index]['value'] for index, _ in items]
+        self.inputs[1, :count] = [timestamps[index] for index, _ in items]
+        self.inputs[2, :count] = sensor_ids
+        self.connection.send((command, count, new_sensors))
+        self.readings += count
+        self.batches += 1
+
+    def receive_batch(self, count):
+        """Attend la fin du micro-lot; retourne ses résultats et les versions de modèle utilisées."""
+        labels = self.receive()
+        return self.outputs[:, :count].copy(), labels
+
+    def stop(self):
+        """Arrête le processus et libère les tampons partagés."""
+        try:
+            with self.lock:
+                if self.process.is_alive():
+                    self.connection.send(('stop',))
+            self.process.join(timeout=5)
+        except (OSError, EOFError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+        del self.inputs, self.outputs
+        for memory in (self.input_memory, self.output_memory):
+            memory.close()
+            memory.unlink()
+
+
+class InferenceService:
+    """
+    Service d'inférence multi-processus. Le détecteur tourne dans un pool de processus, hors du
+    GIL des threads Flask/Socket.IO: une rafale de scoring ne bloque plus l'envoi des événements.
+
+    Chaque lecture est routée vers un processus selon sa clé de capteur (crc32), si bien que
+    chaque processus possède l'historique de ses capteurs. Les lectures sont envoyées par
+    micro-lots (batch_capacity lectures au plus) dans des tampons de mémoire partagée, à tous
+    les processus concernés à la fois.
+
+    Le service expose les méthodes du détecteur utilisées par l'application (predict,
+    predict_batch, evaluate, forecast_sensors, score_machines, warm_start, is_critical, stats)
+    et peut le remplacer tel quel.
+    """
+
+    def __init__(self, processes=2, batch_capacity=1024, start_method=None, registry_dir='model_registry',
+                 stats_span=10, robust_forecast=False):
+        """
+        Args:
+            processes: Nombre de processus d'inférence
+            batch_capacity: Nombre maximal de lectures par micro-lot (taille des tampons partagés)
+            registry_dir: Dossier du registre de modèles (chaque processus a son propre registre)
+            stats_span: Fenêtre des statistiques glissantes du détecteur
+            robust_forecast: Prévisions de tendance par régression de Huber
+            start_method: Méthode de démarrage multiprocessing ('fork' par défaut si disponible:
+                          créer le service avant de démarrer des threads)
+        """
+        # Détecteur local sans modèle chargé: seuils, suggestions et construction des résultats
+        self.detector = IsolationForestModel(registry_dir=registry_dir, stats_span=stats_span,
+                                             robust_forecast=robust_forecast)
+        self.thresholds = self.detector.thresholds
+        self.suggestions = self.detector.suggestions
+        self.is_trained = True
+        self.batch_capacity = batch_capacity
+
+        # Les chargements de modèles attendent les processus depuis un thread dédié
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference-model-loader')
+
+        # Premier démarrage sans modèles enregistrés: les entraîner une fois (en parallèle) avant de
+        # démarrer les processus, qui les chargent au lieu de les entraîner chacun
+        if self.detector.missing_models():
+            self.detector.preload()
+
+        if start_method is None:
+            start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        self._workers = [_InferenceWorker(context, index, batch_capacity, registry_dir, stats_span, robust_forecast)
+                         for index in range(max(1, processes))]
+        for worker in self._workers:
+            worker.receive()  # Attendre que chaque processus ait chargé ses tables de score
+        logger.info(f"Service d'inférence démarré: {len(self._workers)} processus ({start_method})")
+
+    def _route(self, sensor_key):
+        """Index du processus propriétaire d'un capteur (stable d'un démarrage à l'autre)."""
+        return zlib.crc32(sensor_key.encode('utf-8')) % len(self._workers)
+
+    def predict(self, data):
+        """Prédire une lecture (voir AdvancedAnomalyDetector.predict)"""
+        return self.predict_batch([data])[0]
+
+    def predict_batch(self, readings):
+        """Prédire un lot de lectures (voir AdvancedAnomalyDetector.predict_batch)"""
+        return self._run('predict', readings)
+
+    def evaluate(self, data):
+        """Évaluer une lecture sans modifier l'historique (voir AdvancedAnomalyDetector.evaluate)"""
+        return self._run('evaluate', [data])[0]
+
+    def is_critical(self, sensor_type, value, machine_id=None):
+        """Indique si la valeur franchit un seuil critique (sans passer par le modèle)"""
+        return self.detector.is_critical(sensor_type, value, machine_id)
+
+    def sensor_thresholds(self, machine_id, sensor_type):
+        """Seuils d'un capteur (voir AdvancedAnomalyDetector.sensor_thresholds)"""
+        return self.detector.sensor_thresholds(machine_id, sensor_type)
+
+    def forecast_sensors(self, sensors):
+        """
+        Prévision de tendance de plusieurs capteurs (voir AdvancedAnomalyDetector.forecast_sensors):
+        chaque processus concerné calcule celle de ses capteurs en un appel, en parallèle.
+        """
+        results = [None] * len(sensors)
+        parts = {}
+        for index, (machine_id, sensor_type) in enumerate(sensors):
+            if sensor_type in self.thresholds:
+                key = self.detector._sensor_key(machine_id, sensor_type)
+                parts.setdefault(self._route(key), []).append(index)
+
+        workers = [(self._workers[route], indices) for route, indices in sorted(parts.items())]
+        for worker, _ in workers:
+            worker.lock.acquire()
+        try:
+            for worker, indices in workers:
+                worker.connection.send(('forecast', [(str(sensors[index][0]), sensors[index][1]) for index in indices]))
+            for worker, indices in workers:
+                for index, result in zip(indices, worker.receive()):
+                    results[index] = result
+        finally:
+            for worker, _ in workers:
+                worker.lock.release()
+        return results
+
+    def score_machines(self, latest):
+        """
+        Évaluer toutes les machines avec le modèle multivarié (voir
+        AdvancedAnomalyDetector.score_machines). Le modèle ne dépend d'aucun historique: un seul
+        processus l'exécute, en un appel pour tout le parc.
+        """
+        worker = self._workers[0]
+        with worker.lock:
+            return worker.call('score_machines', latest)
+
+    def _run(self, command, readings):
+        """Répartit les lectures par processus, exécute les micro-lots et reconstruit les prédictions."""
+        results = [None] * len(readings)
+        pending = {}
+        timestamps = [None] * len(readings)
+        for index, data in enumerate(readings):
+            if data['sensor_type'] not in self.thresholds:
+                results[index] = self.detector._unsupported_prediction(data)
+                continue
+            key = self.detector._sensor_key(data['machine_id'], data['sensor_type'])
+            pending.setdefault(self._route(key), []).append((index, key))
+            # Horodatage fixé à la réception (et non au passage dans le processus); evaluate s'en
+            # sert pour la prévision d'une lecture hypothétique
+            timestamps[index] = self.detector._reading_timestamp(data)
+
+        while pending:
+            chunks = {index: items[:self.batch_capacity] for index, items in pending.items()}
+            pending = {index: items[self.batch_capacity:] for index, items in pending.items()
+                       if len(items) > self.batch_capacity}
+
+            # Verrouiller les processus concernés dans un ordre fixe, envoyer à tous puis attendre
+            workers = [(self._workers[index], chunks[index]) for index in sorted(chunks)]
+            for worker, _ in workers:
+                worker.lock.acquire()
+            try:
+                for worker, items in workers:
+                    worker.send_batch(command, readings, items, timestamps)
+                for worker, items in workers:
+                    outputs, labels = worker.receive_batch(len(items))
+                    states = self.detector.prediction_states([readings[index] for index, _ in items], outputs[0])
+                    for (index, _), risk, future_value, time_to_threshold, label, state in zip(items, *outputs, states):
+                        results[index] = self.detector.build_prediction(
+                            readings[index], risk, future_value, int(time_to_threshold), labels[int(label)], state)
+            finally:
+                for worker, _ in workers:
+                    worker.lock.release()
+
+        return results
+
+    def warm_start(self, history, workers=None):
+        """
+        Initialise l'historique de chaque processus avec les lectures de ses capteurs
+        (voir AdvancedAnomalyDetector.warm_start). Les processus sont initialisés en parallèle.
+        """
+        parts = {}
+        for (machine_id, sensor_type), readings in history.items():
+            index = self._route(self.detector._sensor_key(machine_id, sensor_type))
+            parts.setdefault(index, {})[(machine_id, sensor_type)] = readings
+
+        workers = [(self._workers[index], part) for index, part in sorted(parts.items())]
+        for worker, _ in workers:
+            worker.lock.acquire()
+        try:
+            for worker, part in workers:
+                worker.connection.send(('warm_start', part))
+            return sum(worker.receive() for worker, _ in workers)
+        finally:
+            for worker, _ in workers:
+                worker.lock.release()
+
+    def _broadcast(self, *message):
+        """Envoie une commande à tous les processus (en parallèle) et retourne leurs réponses."""
+        for worker in self._workers:
+            worker.lock.acquire()
+        try:
+            for worker in self._workers:
+                worker.connection.send(message)
+            return [worker.receive() for worker in self._workers]
+        finally:
+            for worker in self._workers:
+                worker.lock.release()
+
+    def set_machine_types(self, machine_types):
+        """Transmet le type de chaque machine aux processus (modèles par type de machine)"""
+        self._broadcast('set_machine_types', dict(machine_types))
+
+    def set_sensor_thresholds(self, sensors):
+        """
+        Compile les seuils propres à des capteurs (voir AdvancedAnomalyDetector.set_sensor_thresholds)
+        dans chaque processus et dans le détecteur local (états et seuils critiques des réponses)
+        """
+        self.detector.set_sensor_thresholds(sensors)
+        self._broadcast('set_sensor_thresholds', dict(sensors))
+
+    def load_model(self, scope, sensor_type, version=None, timeout=120):
+        """
+        Charge une version du registre dans chaque processus, en arrière-plan (les processus
+        continuent de servir les micro-lots pendant le chargement).
+        Retourne un Future dont le résultat est l'étiquette de la version chargée.
+        """
+        return self._loader.submit(self._load_model, scope, sensor_type, version, timeout)
+
+    def _load_model(self, scope, sensor_type, version, timeout):
+        failed_before = [failed for _, failed in self._broadcast('model_state', scope, sensor_type)]
+        label = self._broadcast('load_model', scope, sensor_type, version)[0]
+        deadline = time.monotonic() + timeout
+        # Attendre que chaque processus ait rendu la version active
+        while True:
+            states = self._broadcast('model_state', scope, sensor_type)
+            if all(active == label for active, _ in states):
+                return label
+            if any(failed > before for (_, failed), before in zip(states, failed_before)):
+                raise RuntimeError(f"Échec du chargement de {label} dans un processus d'inférence")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Chargement de {label} non terminé après {timeout} s")
+            time.sleep(0.05)
+
+    def publish_model(self, scope, sensor_type, model):
+        """
+        Enregistre un modèle entraîné comme nouvelle version du registre (fichiers écrits par ce
+        processus) puis la charge dans chaque processus. Retourne l'étiquette de la version.
+        """
+        label = self.detector.registry.publish(scope, sensor_type, model)
+        return self.load_model(scope, sensor_type, label.rsplit('@', 1)[1]).result()
+
+    def model_versions(self):
+        """Versions de modèles actives (celles du premier processus) et disponibles"""
+        return self._broadcast('model_versions')[0]
+
+    def stats(self):
+        """Retourne l'état de chaque processus (capteurs suivis, lectures traitées, cache de evaluate)."""
+        processes = []
+        for worker in self._workers:
+            with worker.lock:
+                detector_stats = worker.call('stats') if worker.process.is_alive() else None
+                processes.append({
+                    'pid': worker.process.pid,
+                    'alive': worker.process.is_alive(),
+                    'sensors': len(worker.sensor_ids),
+                    'readings': worker.readings,
+                    'batches': worker.batches,
+                    'detector': detector_stats
+                })
+        return {
+            'processes': len(self._workers),
+            'batch_capacity': self.batch_capacity,
+            'workers': processes
+        }
+
+    def stop(self):
+        """Arrête les processus d'inférence et libère la mémoire partagée."""
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
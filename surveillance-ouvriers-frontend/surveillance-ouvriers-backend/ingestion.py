@@ -0,0 +1,344 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+logger = logging.getLogger('industrial_monitoring')
+
+
+class SensorDataBuffer:
+    """
+    Tampon d'écriture différée (write-behind) pour les lectures de capteurs.
+    Les lectures sont ajoutées en mémoire et un thread d'arrière-plan les écrit
+    par lots (une insertion multi-lignes et un seul commit) dès que le tampon
+    atteint max_rows lignes ou que la plus ancienne lecture attend depuis max_delay_ms.
+
+    Un lot en échec pour une erreur passagère (base verrouillée, serveur redémarré...) reste
+    dans le tampon et n'est retenté qu'après un délai qui double à chaque échec consécutif
+    (retry_backoff_ms, au plus max_backoff_ms). Seules les erreurs de données (ROW_ERRORS),
+    dues à une ligne invalide, font écrire le lot ligne par ligne: les lignes refusées sont
+    écartées dans dead_letter pour ne pas bloquer toute l'ingestion. Le tampon contient au plus
+    max_buffered_rows lignes: au-delà, extend attend jusqu'à max_wait_ms qu'une écriture
+    libère de la place (contre-pression), puis abandonne les lignes excédentaires (comptées).
+    """
+
+    # Erreurs imputables aux lignes écrites (contrainte, type ou valeur invalide), et non à la base
+    ROW_ERRORS = (IntegrityError, DataError, TypeError, ValueError)
+
+    def __init__(self, flush_callback, max_rows=500, max_delay_ms=200, max_buffered_rows=50000,
+                 retry_backoff_ms=100, max_backoff_ms=30000, max_wait_ms=1000, dead_letter_size=1000):
+        """
+        Args:
+            flush_callback: Fonction appelée avec la liste des lignes à écrire
+                            (dictionnaires sensor_id/value/timestamp)
+            max_rows: Nombre de lignes déclenchant une écriture immédiate
+            max_delay_ms: Délai maximal (ms) avant l'écriture d'une lecture en attente
+            max_buffered_rows: Nombre maximal de lignes en attente dans le tampon
+            retry_backoff_ms: Délai (ms) avant de retenter un lot après un premier échec passager
+            max_backoff_ms: Délai maximal (ms) entre deux tentatives
+            max_wait_ms: Attente maximale (ms) de extend lorsque le tampon est plein
+            dead_letter_size: Nombre de lignes écartées conservées pour inspection
+        """
+        self.flush_callback = flush_callback
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_buffered_rows = max(max_rows, max_buffered_rows)
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self.max_backoff = max(retry_backoff_ms, max_backoff_ms) / 1000.0
+        self.max_wait = max_wait_ms / 1000.0
+        self.dead_letter = collections.deque(maxlen=dead_letter_size)
+        self._consecutive_failures = 0
+        self._retry_at = None
+
+        self._rows = []
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # Une seule écriture à la fois, pour conserver l'ordre
+        self._running = False
+        self._thread = None
+
+        # Statistiques
+        self.max_queue_depth = 0
+        self.flush_count = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+        self.dead_letter_rows = 0
+        self.last_flush_latency_ms = 0.0
+        self.max_flush_latency_ms = 0.0
+        self._total_flush_latency_ms = 0.0
+
+    def start(self):
+        """Démarre le thread d'écriture en arrière-plan."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='sensor-data-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread d'écriture puis écrit les lectures restantes."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def append(self, row):
+        """Ajoute une lecture au tampon. Retourne 1 si elle est acceptée, 0 si le tampon est plein."""
+        return self.extend([row])
+
+    def extend(self, rows):
+        """
+        Ajoute plusieurs lectures au tampon, dans l'ordre. Si le tampon est plein, attend au plus
+        max_wait_ms que le thread d'écriture libère de la place, puis abandonne les lignes en trop.
+        Retourne le nombre de lignes acceptées.
+        """
+        if not rows:
+            return 0
+        with self._condition:
+            deadline = time.monotonic() + self.max_wait
+            while self._running and len(self._rows) + len(rows) > self.max_buffered_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.notify_all()
+                self._condition.wait(remaining)
+            space = max(0, self.max_buffered_rows - len(self._rows))
+            if len(rows) > space:
+                self.dropped_rows += len(rows) - space
+                logger.warning(f"Tampon de données plein: {len(rows) - space} lignes abandonnées")
+                rows = rows[:space]
+                if not rows:
+                    return 0
+            first_rows = self._oldest is None
+            if first_rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._rows))
+            # Réveiller le thread pour armer l'échéance ou écrire un lot complet
+            if first_rows or len(self._rows) >= self.max_rows:
+                self._condition.notify_all()
+            return len(rows)
+
+    def flush(self):
+        """Écrit immédiatement toutes les lectures en attente. Retourne le nombre de lignes écrites."""
+        with self._flush_lock:
+            with self._condition:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+                # De la place est libérée pour les appels de extend en attente
+                self._condition.notify_all()
+            if not rows:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self.flush_callback(rows)
+            except self.ROW_ERRORS as e:
+                # Ligne invalide dans le lot: écrire les lignes une par une pour l'isoler
+                logger.error(f"Erreur de données dans le tampon ({len(rows)} lignes), écriture ligne par ligne: {str(e)}")
+                with self._condition:
+                    self.failed_flushes += 1
+                rows = self._flush_rows_individually(rows)
+                if not rows:
+                    return 0
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture du tampon de données ({len(rows)} lignes): {str(e)}")
+                self._requeue(rows)
+                return 0
+            else:
+                with self._condition:
+                    self._consecutive_failures = 0
+                    self._retry_at = None
+
+            latency_ms = (time.perf_counter() - start) * 1000
+            with self._condition:
+                self.flush_count += 1
+                self.flushed_rows += len(rows)
+                self.last_flush_latency_ms = latency_ms
+                self.max_flush_latency_ms = max(self.max_flush_latency_ms, latency_ms)
+                self._total_flush_latency_ms += latency_ms
+            return len(rows)
+
+    def _requeue(self, rows):
+        """Erreur passagère: remettre les lignes en tête du tampon et différer la prochaine tentative"""
+        with self._condition:
+            self._rows[:0] = rows
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self.failed_flushes += 1
+            self._consecutive_failures += 1
+            delay = min(self.max_backoff, self.retry_backoff * 2 ** (self._consecutive_failures - 1))
+            self._retry_at = time.monotonic() + delay
+
+    def _flush_rows_individually(self, rows):
+        """
+        Écrit les lignes une par une; celles qui provoquent une erreur de données vont dans
+        dead_letter. Une erreur passagère interrompt l'écriture: les lignes restantes sont remises
+        dans le tampon. Retourne les lignes écrites.
+        """
+        written = []
+        rejected = []
+        for position, row in enumerate(rows):
+            try:
+                self.flush_callback([row])
+                written.append(row)
+            except self.ROW_ERRORS as e:
+                rejected.append(row)
+                logger.error(f"Lecture écartée du tampon de données ({row!r}): {str(e)}")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture du tampon de données ({len(rows) - position} lignes): {str(e)}")
+                self._requeue(rows[position:])
+                break
+        else:
+            with self._condition:
+                self._consecutive_failures = 0
+                self._retry_at = None
+        with self._condition:
+            self.dead_letter.extend(rejected)
+            self.dead_letter_rows += len(rejected)
+        return written
+
+    def _run(self):
+        """
+        Boucle du thread d'écriture: attendre max_rows lignes ou l'échéance max_delay_ms, et
+        après un échec passager, la fin du délai avant nouvelle tentative.
+        """
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._retry_at is not None and time.monotonic() < self._retry_at:
+                        self._condition.wait(self._retry_at - time.monotonic())
+                        continue
+                    if len(self._rows) >= self.max_rows:
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if not self._running:
+                    return
+            self.flush()
+
+    def stats(self):
+        """Retourne la profondeur de file et les latences d'écriture."""
+        with self._condition:
+            return {
+                'queue_depth': len(self._rows),
+                'max_queue_depth': self.max_queue_depth,
+                'flush_count': self.flush_count,
+                'flushed_rows': self.flushed_rows,
+                'failed_flushes': self.failed_flushes,
+                'dropped_rows': self.dropped_rows,
+                'dead_letter_rows': self.dead_letter_rows,
+                'consecutive_failures': self._consecutive_failures,
+                'max_buffered_rows': self.max_buffered_rows,
+                'last_flush_latency_ms': round(self.last_flush_latency_ms, 3),
+                'avg_flush_latency_ms': round(self._total_flush_latency_ms / self.flush_count, 3) if self.flush_count else 0.0,
+                'max_flush_latency_ms': round(self.max_flush_latency_ms, 3),
+                'max_rows': self.max_rows,
+                'max_delay_ms': int(self.max_delay * 1000)
+            }
+
+
+class ScoringWorkerPool:
+    """
+    Pool de threads de scoring qui analysent les lectures en arrière-plan, hors de la requête HTTP.
+    Chaque lecture est routée vers un worker selon sa clé de capteur, ce qui préserve l'ordre
+    d'arrivée par capteur (l'historique du détecteur reste cohérent). Chaque worker vide sa file
+    par micro-lots de batch_size éléments au plus.
+    """
+
+    def __init__(self, handler, workers=2, batch_size=100):
+        """
+        Args:
+            handler: Fonction appelée avec une liste de lectures à analyser
+            workers: Nombre de threads de scoring
+            batch_size: Taille maximale d'un micro-lot
+        """
+        self.handler = handler
+        self.batch_size = batch_size
+        self._queues = [queue.Queue() for _ in range(max(1, workers))]
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Statistiques
+        self.scored = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_batch = 0
+
+    def start(self):
+        """Démarre les threads de scoring."""
+        for index, work_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._run, args=(work_queue,),
+                                      name=f'scoring-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Arrête les workers après avoir analysé toutes les lectures en attente."""
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, key, item):
+        """Met une lecture en file, sur le worker associé à sa clé de capteur."""
+        self._queues[hash(key) % len(self._queues)].put(item)
+
+    def _run(self, work_queue):
+        """Boucle d'un worker: attendre une lecture puis vider la file jusqu'à batch_size éléments."""
+        while True:
+            item = work_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self.handler(batch)
+                with self._lock:
+                    self.scored += len(batch)
+                    self.batches += 1
+                    self.max_batch = max(self.max_batch, len(batch))
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Erreur lors du scoring asynchrone ({len(batch)} lectures): {str(e)}")
+
+            if stopping:
+                return
+
+    def stats(self):
+        """Retourne la profondeur des files et les compteurs de scoring."""
+        with self._lock:
+            return {
+                'queue_depth': sum(work_queue.qsize() for work_queue in self._queues),
+                'workers': len(self._queues),
+                'scored': self.scored,
+                'batches': self.batches,
+                'avg_batch_size': round(self.scored / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch,
+                'errors': self.errors
+            }
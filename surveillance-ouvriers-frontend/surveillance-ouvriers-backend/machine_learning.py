@@ -1,12 +1,100 @@
 import math
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import joblib
 import os
 import time
 from sklearn.ensemble import IsolationForest
 import pandas as pd
-from collections import deque
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from forecasting import forecast
+from sensor_state import SensorStateStore
+
+class ScoreLookupTable:
+    """
+    Table de correspondance du score de décision d'une IsolationForest entraînée sur une seule variable.
+    
+    Sur une variable, le score de la forêt est une fonction en escalier dont les marches sont
+    exactement les seuils de séparation des arbres. La table échantillonne la forêt une fois par
+    marche sur la plage [low, high]; l'évaluation devient une recherche dichotomique vectorisée
+    (np.searchsorted) au lieu d'un parcours de 100 arbres, avec le même résultat que la forêt.
+    """
+    
+    def __init__(self, breakpoints, scores):
+        """
+        Args:
+            breakpoints: Bornes croissantes [low, s_1, ..., s_k, high]
+            scores: scores[i] s'applique aux valeurs de ]breakpoints[i-1], breakpoints[i]]
+                    (scores[0] à la valeur low elle-même)
+        """
+        self.breakpoints = np.asarray(breakpoints, dtype=np.float64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.low = float(self.breakpoints[0])
+        self.high = float(self.breakpoints[-1])
+    
+    @classmethod
+    def from_forest(cls, model, low, high):
+        """Construit la table d'une IsolationForest à une variable sur la plage [low, high]"""
+        # Seuils de tous les nœuds internes de la forêt (une seule variable, index 0)
+        thresholds = np.concatenate([
+            estimator.tree_.threshold[estimator.tree_.children_left != -1]
+            for estimator in model.estimators_
+        ])
+        inside = np.unique(thresholds[(thresholds > low) & (thresholds < high)])
+        breakpoints = np.concatenate([[low], inside, [high]])
+        
+        # Les arbres comparent des valeurs float32 (x <= seuil): choisir pour chaque marche
+        # le plus grand float32 qui ne dépasse pas sa borne supérieure
+        points = breakpoints.astype(np.float32)
+        above = points.astype(np.float64) > breakpoints
+        points[above] = np.nextafter(points[above], np.float32(-np.inf))
+        
+        scores = model.score_samples(points.reshape(-1, 1)) - model.offset_
+        return cls(breakpoints, scores)
+    
+    def lookup(self, values):
+        """
+        Retourne (scores, inside): les scores des valeurs situées dans la plage de la table
+        (NaN ailleurs) et le masque de ces valeurs.
+        """
+        x = np.asarray(values, dtype=np.float32).astype(np.float64)
+        inside = (x >= self.low) & (x <= self.high)
+        scores = np.full(x.shape, np.nan)
+        scores[inside] = self.scores[np.searchsorted(self.breakpoints, x[inside], side='left')]
+        return scores, inside
+    
+    def save(self, path):
+        """Enregistre la table au format .npy (2 lignes: bornes puis scores), projetable en mémoire"""
+        # Écriture dans un fichier temporaire puis remplacement atomique (lecteurs concurrents)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.vstack([self.breakpoints, self.scores]))
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path):
+        """Charge une table enregistrée par save(), en mémoire projetée (mmap)"""
+        data = np.load(path, mmap_mode='r')
+        return cls(data[0], data[1])
+
+def table_decision_scores(table, values, get_model):
+    """
+    Score de décision (équivalent à decision_function) d'un tableau de valeurs: table de score
+    dans sa plage, forêt (obtenue par get_model(), chargée au besoin) ailleurs ou sans table.
+    Négatif = anomalie selon le modèle.
+    """
+    if table is None:
+        model = get_model()
+        return model.score_samples(values.reshape(-1, 1)) - model.offset_
+    
+    # Table précalculée dans la plage, forêt pour les valeurs hors plage
+    scores, inside = table.lookup(values)
+    if not inside.all():
+        model = get_model()
+        scores[~inside] = model.score_samples(values[~inside].reshape(-1, 1)) - model.offset_
+    return scores
 
 class AdvancedAnomalyDetector:
     """
@@ -14,8 +102,26 @@ class AdvancedAnomalyDetector:
     utilisant un modèle pré-entraîné pour des prédictions cohérentes.
     """
     
-    def __init__(self):
-        """Initialise le détecteur d'anomalies avec un modèle pré-entraîné."""
+    # Caractéristiques du modèle multivarié par machine (ordre des colonnes)
+    MACHINE_FEATURES = ('temperature', 'pressure', 'vibration')
+    
+    # Horizon des prévisions de tendance (minutes): valeur future et délai maximal avant seuil
+    FORECAST_HORIZON = 30
+    
+    # Colonnes des seuils compilés par capteur (voir sensor_limits)
+    THRESHOLD_FIELDS = ('min_normal', 'max_normal', 'critical_low', 'critical_high')
+    
+    def __init__(self, registry_dir='model_registry', stats_span=10, robust_forecast=False):
+        """
+        Initialise le détecteur d'anomalies avec un modèle pré-entraîné.
+        
+        Args:
+            registry_dir: Dossier du registre de modèles versionnés (voir ModelRegistry)
+            stats_span: Fenêtre (en lectures) des statistiques glissantes utilisées pour affiner
+                        le risque et estimer la tendance
+            robust_forecast: Prévisions de tendance par régression de Huber (moins sensible aux
+                             lectures aberrantes) au lieu des moindres carrés
+        """
         self.is_trained = True
         self.model_path = "anomaly_model.joblib"
         
@@ -66,37 +172,161 @@ class AdvancedAnomalyDetector:
             }
         }
         
-        # Historique des valeurs pour chaque capteur (pour analyse de tendance déterministe)
-        self.sensor_history = {}
+        # Historique des 10 dernières valeurs et des 10 derniers risques de chaque capteur
+        # (tampons circulaires NumPy, un slot par clé "{machine_id}_{sensor_type}") et statistiques
+        # glissantes sur stats_span lectures. Le détecteur est partagé par les requêtes Flask, le
+        # planificateur et les workers de scoring: chaque mise à jour d'un capteur se fait sous le
+        # verrou de sa bande (voir SensorStateStore.locked)
+        self.state = SensorStateStore(window=10, span=stats_span)
+        self.robust_forecast = robust_forecast
         
-        # Historique de risque pour une évolution cohérente
-        self.risk_history = {}
+        # Seuils par défaut de chaque type, dans l'ordre de THRESHOLD_FIELDS; les seuils propres
+        # à un capteur (table sensors) sont compilés au slot du capteur (voir set_sensor_thresholds)
+        self._type_limits = {sensor_type: np.array([thresholds[field] for field in self.THRESHOLD_FIELDS], dtype=float)
+                             for sensor_type, thresholds in self.thresholds.items()}
         
-        # Modèles pré-entraînés par type de capteur
-        self.models = self._load_or_create_models()
+        # Dernière prédiction de chaque slot, servie par evaluate() tant qu'aucune lecture n'arrive:
+        # slot -> (version de l'historique, valeur, prédiction)
+        self._evaluations = {}
+        self.evaluation_hits = 0
+        self.evaluation_misses = 0
         
-    def _load_or_create_models(self):
-        """Charge les modèles existants ou en crée de nouveaux si nécessaires."""
-        models = {}
+        # Modèles pré-entraînés et tables de score par type de capteur, chargés au premier scoring
+        # (la forêt n'est chargée que si la table est absente ou pour les valeurs hors de sa plage)
+        self.models = {}
+        self.score_tables = {}
+        self.machine_model = None  # Modèle multivarié (température, pression, vibration) par machine
+        self._load_lock = threading.RLock()
+        # Un verrou par type: les modèles de types différents se chargent (ou s'entraînent) en parallèle
+        self._type_locks = {sensor_type: threading.RLock() for sensor_type in self.thresholds}
         
-        # Vérifier si les modèles existent déjà, sinon les créer
-        for sensor_type in self.thresholds.keys():
-            model_file = f"model_{sensor_type}.joblib"
-            
-            if os.path.exists(model_file):
-                try:
-                    # Charger le modèle existant
-                    models[sensor_type] = joblib.load(model_file)
-                    print(f"Modèle {sensor_type} chargé depuis {model_file}")
-                except Exception as e:
-                    print(f"Erreur lors du chargement du modèle {model_file}: {e}")
-                    # Créer un nouveau modèle en cas d'erreur
-                    models[sensor_type] = self._create_new_model(sensor_type)
-            else:
-                # Créer un nouveau modèle
-                models[sensor_type] = self._create_new_model(sensor_type)
-                
-        return models
+        # Versions publiées par type de machine, par capteur ou par défaut, prioritaires sur les
+        # modèles ci-dessus; remplaçables à chaud (import local: model_registry importe ce module)
+        from model_registry import ModelRegistry
+        self.registry = ModelRegistry(registry_dir, self.thresholds)
+        
+    def preload(self):
+        """
+        Charge immédiatement les tables de score (et les modèles si nécessaire) de tous les types,
+        un thread par type: au premier démarrage, sans fichiers joblib, les forêts des différents
+        types sont entraînées en même temps (la construction des arbres libère le GIL).
+        """
+        sensor_types = list(self.thresholds.keys())
+        with ThreadPoolExecutor(max_workers=len(sensor_types), thread_name_prefix='model-preload') as executor:
+            list(executor.map(self.get_score_table, sensor_types))
+    
+    def missing_models(self):
+        """Types de capteurs dont le modèle n'est pas encore enregistré (premier démarrage)"""
+        return [sensor_type for sensor_type in self.thresholds
+                if sensor_type not in self.models and not os.path.exists(f"model_{sensor_type}.joblib")]
+    
+    def get_model(self, sensor_type):
+        """Retourne la forêt d'un type de capteur, chargée (ou créée) au premier appel."""
+        model = self.models.get(sensor_type)
+        if model is None:
+            with self._type_locks[sensor_type]:
+                model = self.models.get(sensor_type)
+                if model is None:
+                    model = self._load_or_create_model(sensor_type)
+                    self.models[sensor_type] = model
+        return model
+    
+    def get_score_table(self, sensor_type):
+        """Retourne la table de score d'un type de capteur (None si indisponible), chargée au premier appel."""
+        if sensor_type not in self.score_tables:
+            with self._type_locks[sensor_type]:
+                if sensor_type not in self.score_tables:
+                    self.score_tables[sensor_type] = self._load_score_table(sensor_type)
+        return self.score_tables[sensor_type]
+    
+    def get_machine_model(self):
+        """Retourne le modèle multivarié par machine, chargé (ou créé) au premier appel."""
+        model = self.machine_model
+        if model is None:
+            with self._load_lock:
+                model = self.machine_model
+                if model is None:
+                    model = self._load_or_create_machine_model()
+                    self.machine_model = model
+        return model
+    
+    def _load_or_create_machine_model(self):
+        """Charge le modèle multivarié (model_machine.joblib) ou en crée un nouveau si nécessaire."""
+        model_file = "model_machine.joblib"
+        
+        if os.path.exists(model_file):
+            try:
+                model = joblib.load(model_file)
+                print(f"Modèle multivarié chargé depuis {model_file}")
+                return model
+            except Exception as e:
+                print(f"Erreur lors du chargement du modèle {model_file}: {e}")
+        
+        print("Création d'un nouveau modèle multivarié par machine")
+        X = self._generate_machine_training_data(n_samples=5000)
+        model = IsolationForest(
+            n_estimators=100,
+            max_samples='auto',
+            contamination=0.05,
+            random_state=42
+        )
+        model.fit(X)
+        
+        # Écriture atomique: plusieurs processus d'inférence peuvent créer le modèle en même temps
+        tmp_file = f"{model_file}.{os.getpid()}.tmp"
+        joblib.dump(model, tmp_file)
+        os.replace(tmp_file, model_file)
+        print(f"Modèle multivarié enregistré dans {model_file}")
+        return model
+    
+    def _load_or_create_model(self, sensor_type):
+        """Charge le modèle existant d'un type de capteur ou en crée un nouveau si nécessaire."""
+        model_file = f"model_{sensor_type}.joblib"
+        
+        if os.path.exists(model_file):
+            try:
+                # Charger le modèle existant
+                model = joblib.load(model_file)
+                print(f"Modèle {sensor_type} chargé depuis {model_file}")
+                return model
+            except Exception as e:
+                print(f"Erreur lors du chargement du modèle {model_file}: {e}")
+        
+        # Créer un nouveau modèle (absent ou illisible)
+        return self._create_new_model(sensor_type)
+    
+    def _load_score_table(self, sensor_type):
+        """
+        Charge la table de score compacte (model_<type>.lut.npy) d'un type de capteur.
+        Si elle est absente, plus ancienne que le fichier joblib ou construite pour une autre plage,
+        elle est reconstruite à partir de la forêt (conversion automatique) puis enregistrée.
+        """
+        thresholds = self.thresholds[sensor_type]
+        low, high = thresholds['critical_low'] * 0.5, thresholds['critical_high'] * 1.5
+        table_file = f"model_{sensor_type}.lut.npy"
+        model_file = f"model_{sensor_type}.joblib"
+        
+        if os.path.exists(table_file) and (
+                not os.path.exists(model_file) or os.path.getmtime(table_file) >= os.path.getmtime(model_file)):
+            try:
+                table = ScoreLookupTable.load(table_file)
+                if np.isclose(table.low, low) and np.isclose(table.high, high):
+                    print(f"Table de score {sensor_type} chargée depuis {table_file}")
+                    return table
+            except Exception as e:
+                print(f"Erreur lors du chargement de la table {table_file}: {e}")
+        
+        model = self.get_model(sensor_type)
+        if getattr(model, 'n_features_in_', 1) != 1:
+            return None
+        try:
+            table = ScoreLookupTable.from_forest(model, low, high)
+            table.save(table_file)
+            print(f"Table de score {sensor_type} enregistrée dans {table_file}")
+            return table
+        except Exception as e:
+            print(f"Table de score indisponible pour {sensor_type}, utilisation de la forêt: {e}")
+            return None
     
     def _create_new_model(self, sensor_type):
         """Crée et entraîne un nouveau modèle pour un type de capteur spécifique."""
@@ -114,12 +344,14 @@ class AdvancedAnomalyDetector:
         )
         
         # Extraire les caractéristiques pertinentes et entraîner
-        X = np.array(train_data['values']).reshape(-1, 1)
+        X = train_data['values'].to_numpy().reshape(-1, 1)
         model.fit(X)
         
-        # Sauvegarder le modèle
+        # Sauvegarder le modèle (écriture atomique, comme pour le modèle multivarié)
         model_file = f"model_{sensor_type}.joblib"
-        joblib.dump(model, model_file)
+        tmp_file = f"{model_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        joblib.dump(model, tmp_file)
+        os.replace(tmp_file, model_file)
         print(f"Modèle {sensor_type} enregistré dans {model_file}")
         
         return model
@@ -179,18 +411,32 @@ class AdvancedAnomalyDetector:
         # Mélanger les valeurs
         np.random.shuffle(all_values)
         
-        # Créer un DataFrame avec les valeurs
+        # Créer un DataFrame avec les valeurs, une par minute en remontant depuis maintenant
         df = pd.DataFrame({
             'values': all_values,
-            'timestamp': [datetime.now() - timedelta(minutes=i) for i in range(len(all_values))]
+            'timestamp': np.datetime64(datetime.now(), 'us') - np.arange(len(all_values)) * np.timedelta64(1, 'm')
         })
         
         return df
         
+    def _generate_machine_training_data(self, n_samples=5000):
+        """
+        Génère des vecteurs (température, pression, vibration) de fonctionnement normal pour le
+        modèle multivarié: les trois grandeurs évoluent ensemble (une machine plus chargée chauffe,
+        monte en pression et vibre davantage). Les combinaisons qui s'écartent de cette relation,
+        même avec chaque valeur dans sa plage normale, sont isolées par la forêt (contamination).
+        """
+        thresholds = [self.thresholds[sensor_type] for sensor_type in self.MACHINE_FEATURES]
+        centers = np.array([(t['min_normal'] + t['max_normal']) / 2 for t in thresholds])
+        scales = np.array([(t['max_normal'] - t['min_normal']) / 6 for t in thresholds])
+        
+        # Charge commune + bruit propre à chaque capteur (corrélation ~0.6 entre capteurs)
+        load = np.random.normal(size=(n_samples, 1))
+        noise = np.random.normal(size=(n_samples, len(thresholds)))
+        return centers + scales * (0.77 * load + 0.63 * noise)
+    
     def generate_sample_training_data(self, n_samples=1000):
         """Génère des données d'entraînement pour tous les types de capteurs"""
-        data = []
-        
         # Types de capteurs
         sensor_types = list(self.thresholds.keys())
         
@@ -198,90 +444,512 @@ class AdvancedAnomalyDetector:
         machine_ids = ['machine-001', 'machine-002']
         
         # Générer des données pour chaque combinaison machine/capteur
+        per_sensor = n_samples // (len(machine_ids) * len(sensor_types))
+        frames = []
         for machine_id in machine_ids:
             for sensor_type in sensor_types:
-                # Générer des valeurs pour ce type de capteur
-                sensor_df = self._generate_training_data(sensor_type, n_samples=n_samples // (len(machine_ids) * len(sensor_types)))
-                
-                # Convertir en liste de dictionnaires
-                for _, row in sensor_df.iterrows():
-                    data.append({
-                        'machine_id': machine_id,
-                        'sensor_type': sensor_type,
-                        'value': float(row['values']),
-                        'timestamp': row['timestamp'].isoformat()
-                    })
+                frame = self._generate_training_data(sensor_type, n_samples=per_sensor)
+                frame['machine_id'] = machine_id
+                frame['sensor_type'] = sensor_type
+                frames.append(frame)
+        df = pd.concat(frames, ignore_index=True)
+        timestamps = np.datetime_as_string(df['timestamp'].to_numpy().astype('datetime64[us]'), unit='us')
         
-        return data
+        # Convertir en liste de dictionnaires, colonne par colonne
+        return [{'machine_id': machine_id, 'sensor_type': sensor_type, 'value': value, 'timestamp': timestamp}
+                for machine_id, sensor_type, value, timestamp in zip(
+                    df['machine_id'].tolist(), df['sensor_type'].tolist(), df['values'].tolist(), timestamps.tolist())]
     
     def predict(self, data):
         """Prédire les anomalies et risques associés avec une évolution logique et cohérente"""
+        return self.predict_batch([data])[0]
+    
+    def predict_batch(self, readings):
+        """
+        Prédire les anomalies pour un lot de lectures (plusieurs machines et types de capteurs).
+        
+        Les lectures sont regroupées par type de capteur et chaque groupe est évalué par un seul
+        appel à score_samples; l'étiquette (anomalie/normal) et le risque sont dérivés de ce même
+        score. L'historique est ensuite mis à jour par vagues: la k-ième lecture de chaque capteur
+        appartient à la vague k, si bien qu'une vague touche des slots distincts et s'écrit en une
+        seule opération tout en respectant l'ordre d'arrivée par capteur.
+        
+        Args:
+            readings: Liste de dictionnaires avec les clés machine_id, sensor_type et value
+                      (timestamp optionnel)
+            
+        Returns:
+            Liste de prédictions (mêmes dictionnaires que predict), dans l'ordre des lectures
+        """
+        results = self.predict_batch_values(readings)
+        supported = [index for index, values in enumerate(results) if values is not None]
+        predictions = [self._unsupported_prediction(data) for data in readings]
+        if supported:
+            # États (normal, bas, alerte...) de tout le lot en une évaluation vectorisée des seuils
+            states = self.prediction_states(
+                [readings[index] for index in supported], [results[index][0] for index in supported])
+            for index, state in zip(supported, states):
+                predictions[index] = self.build_prediction(readings[index], *results[index], state=state)
+        return predictions
+    
+    def predict_batch_values(self, readings):
+        """
+        Variante de predict_batch qui retourne, pour chaque lecture, le tuple
+        (risque non arrondi, valeur future, minutes avant seuil critique, version du modèle),
+        ou None si le type de capteur n'est pas pris en charge. build_prediction en construit
+        le dictionnaire.
+        """
+        results = [None] * len(readings)
+        
+        # Regrouper les lectures par modèle (version du registre ou modèle d'origine du type de
+        # capteur) et les répartir en vagues. Les versions actives sont lues une fois pour le lot:
+        # un remplacement de modèle pendant le lot ne s'applique qu'aux lots suivants
+        active_models = self.registry.snapshot()
+        groups = {}
+        labels = [None] * len(readings)
+        waves = []
+        occurrences = {}
+        for index, data in enumerate(readings):
+            sensor_type = data['sensor_type']
+            if sensor_type not in self.thresholds:
+                continue
+            model = self.registry.resolve(data['machine_id'], sensor_type, active_models)
+            groups.setdefault((sensor_type, model), []).append(index)
+            labels[index] = self._model_label(sensor_type, model)
+            
+            slot = self.state.slot(self._sensor_key(data['machine_id'], sensor_type))
+            wave = occurrences.get(slot, 0)
+            occurrences[slot] = wave + 1
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append((index, slot))
+        
+        # Un seul passage dans la forêt par modèle
+        scores = [None] * len(readings)
+        for (sensor_type, model), indices in groups.items():
+            try:
+                values = np.array([readings[i]['value'] for i in indices], dtype=float)
+                decision = self._decision_scores(sensor_type, values, model)
+                for i, score in zip(indices, decision):
+                    scores[i] = float(score)
+            except Exception as e:
+                print(f"Erreur lors de la prédiction pour {sensor_type}: {e}")
+        
+        # Mise à jour de l'état vague par vague, puis construction des résultats, sous les verrous
+        # des capteurs du lot (les autres capteurs restent disponibles pour les autres threads)
+        with self.state.locked(occurrences):
+            for wave in waves:
+                slots = [slot for _, slot in wave]
+                self.state.push_values(
+                    slots,
+                    [readings[index]['value'] for index, _ in wave],
+                    [self._reading_timestamp(readings[index]) for index, _ in wave]
+                )
+                stats = [self.state.sensor_stats(slot) for slot in slots]
+                limits = self.sensor_limits(slots, [readings[index]['sensor_type'] for index, _ in wave])
+                risks = [self._risk_from_score(sensor_stats, readings[index], scores[index], sensor_limits)
+                         for (index, _), sensor_stats, sensor_limits in zip(wave, stats, limits)]
+                self.state.push_risks(slots, risks)
+                # Une seule régression vectorisée pour tous les capteurs de la vague
+                trends = self._forecast(limits, *self.state.windows(slots))
+                for row, ((index, slot), sensor_stats, risk_probability) in enumerate(zip(wave, stats, risks)):
+                    data = readings[index]
+                    future_value, time_to_threshold = self._trend_values(
+                        trends, row, sensor_stats, limits[row], data['value'], risk_probability)
+                    results[index] = (risk_probability, future_value, time_to_threshold, labels[index])
+                    # La prédiction reste la réponse de evaluate() jusqu'à la prochaine lecture
+                    self._evaluations[slot] = (self.state.versions[slot], data['value'], results[index])
+        
+        return results
+    
+    def evaluate(self, data):
+        """
+        Évaluer une lecture sans modifier l'historique (chemin de lecture des tableaux de bord
+        et des tâches planifiées).
+        
+        Si la valeur est la dernière lecture enregistrée du capteur, le résultat est celui que
+        predict a produit pour elle; sinon il est calculé comme si la valeur était ajoutée à
+        l'historique, sans l'y ajouter. Le résultat est mis en cache par capteur jusqu'à la
+        prochaine lecture.
+        
+        Args:
+            data: Dictionnaire avec les clés machine_id, sensor_type et value
+            
+        Returns:
+            Dictionnaire de prédiction (même structure que predict)
+        """
+        values = self.evaluate_values(data)
+        if values is None:
+            return self._unsupported_prediction(data)
+        return self.build_prediction(data, *values)
+    
+    def evaluate_values(self, data):
+        """Variante de evaluate qui retourne le tuple de predict_batch_values (None si non pris en charge)"""
         sensor_type = data['sensor_type']
         value = data['value']
-        machine_id = data['machine_id']
+        if sensor_type not in self.thresholds:
+            return None
         
-        # Convertir machine_id en string si ce n'est pas déjà le cas
-        if isinstance(machine_id, int):
-            machine_id = str(machine_id)
+        slot = self.state.slots.get(self._sensor_key(data['machine_id'], sensor_type))
+        if slot is None:
+            # Capteur sans historique: même résultat qu'une première lecture
+            return self._evaluate_from_stats(self.state.sensor_stats(None, value), None, self._type_limits[sensor_type],
+                                             data, current_risk=None)
         
-        # Vérifier si le type de capteur est pris en charge
-        if sensor_type not in self.thresholds:
-            return {
-                'risk_probability': 0,
-                'prediction': f"Type de capteur '{sensor_type}' non pris en charge",
-                'suggestions': ["Consulter la documentation pour les types de capteurs pris en charge"],
-                'anomaly': False,
-                'time_to_threshold': 30,
-                'future_value': value
+        with self.state.locked([slot]):
+            version = self.state.versions[slot]
+            cached = self._evaluations.get(slot)
+            if cached is not None and cached[0] == version and cached[1] == value:
+                self.evaluation_hits += 1
+                return cached[2]
+            self.evaluation_misses += 1
+            
+            stats = self.state.sensor_stats(slot)
+            window = self.state.windows([slot])
+            limits = self.sensor_limits([slot], [sensor_type])[0]
+            if stats.count and stats.last == value and stats.risk_count:
+                # Dernière lecture enregistrée: son risque est déjà dans l'historique
+                prediction = self._evaluate_from_stats(stats, window, limits, data, current_risk=stats.last_risk)
+            else:
+                # Lecture hypothétique: statistiques et fenêtre calculées comme si la valeur était ajoutée
+                timestamps, values, counts = window
+                timestamps[0, :-1], values[0, :-1] = timestamps[0, 1:], values[0, 1:]
+                timestamps[0, -1], values[0, -1] = self._reading_timestamp(data), value
+                window = timestamps, values, np.minimum(counts + 1, self.state.window)
+                prediction = self._evaluate_from_stats(self.state.sensor_stats(slot, value), window, limits, data,
+                                                       current_risk=None)
+            self._evaluations[slot] = (version, value, prediction)
+            return prediction
+    
+    def _evaluate_from_stats(self, stats, window, limits, data, current_risk):
+        """
+        Tuple (risque, valeur future, minutes, version du modèle) à partir des statistiques et de la
+        fenêtre (voir SensorStateStore.windows, None si aucune) d'un capteur incluant la lecture et
+        de ses seuils (current_risk=None: le calculer avec le modèle actif)
+        """
+        sensor_type = data['sensor_type']
+        model = self.registry.resolve(data['machine_id'], sensor_type)
+        if current_risk is None:
+            try:
+                score = float(self._decision_scores(sensor_type, np.array([data['value']], dtype=float), model)[0])
+            except Exception as e:
+                print(f"Erreur lors de la prédiction pour {data['sensor_type']}: {e}")
+                score = None
+            current_risk = self._risk_from_score(stats, data, score, limits)
+        current_risk = float(current_risk)
+        trends = self._forecast(limits[None], *window) if window is not None else None
+        future_value, time_to_threshold = self._trend_values(
+            trends, 0, stats, limits, data['value'], current_risk)
+        return current_risk, future_value, time_to_threshold, self._model_label(sensor_type, model)
+    
+    def forecast_sensors(self, sensors):
+        """
+        Prévision de tendance de plusieurs capteurs, par exemple tout le parc, en une seule
+        régression vectorisée sur les horodatages réels de leurs dernières lectures (voir
+        forecasting.forecast). Ne modifie pas l'historique.
+        
+        Args:
+            sensors: Liste de couples (machine_id, sensor_type)
+            
+        Returns:
+            Liste alignée sur sensors de dictionnaires (None pour un capteur sans historique ou non
+            pris en charge): current_value, future_value, time_to_threshold (comme predict),
+            slope_per_minute, minutes_to_critical_high et minutes_to_critical_low (None si le seuil
+            n'est pas approché, 0 s'il est déjà franchi) et points (lectures de la fenêtre)
+        """
+        results = [None] * len(sensors)
+        known = []
+        for index, (machine_id, sensor_type) in enumerate(sensors):
+            slot = self.state.slots.get(self._sensor_key(machine_id, sensor_type))
+            if sensor_type in self.thresholds and slot is not None:
+                known.append((index, slot, sensor_type))
+        if not known:
+            return results
+        
+        slots = [slot for _, slot, _ in known]
+        with self.state.locked(slots):
+            window = self.state.windows(slots)
+            stats = [self.state.sensor_stats(slot) for slot in slots]
+            limits = self.sensor_limits(slots, [sensor_type for _, _, sensor_type in known])
+        timestamps, values, counts = window
+        trends = self._forecast(limits, *window)
+        
+        for row, ((index, _, sensor_type), sensor_stats) in enumerate(zip(known, stats)):
+            if not counts[row]:
+                continue
+            current_value = float(values[row, -1])
+            future_value, time_to_threshold = self._trend_values(
+                trends, row, sensor_stats, limits[row], current_value, sensor_stats.last_risk)
+            valid = bool(trends['valid'][row])
+            minutes = {
+                name: float(trends[name][row]) if valid and np.isfinite(trends[name][row]) else None
+                for name in ('minutes_to_high', 'minutes_to_low')
+            }
+            results[index] = {
+                'current_value': current_value,
+                'future_value': future_value,
+                'time_to_threshold': time_to_threshold,
+                'slope_per_minute': float(trends['slope'][row]) if valid else None,
+                'minutes_to_critical_high': minutes['minutes_to_high'],
+                'minutes_to_critical_low': minutes['minutes_to_low'],
+                'points': int(counts[row])
+            }
+        return results
+    
+    def machine_features(self, latest):
+        """
+        Aligne les dernières lectures de chaque machine en une ligne de caractéristiques
+        (MACHINE_FEATURES). Une valeur manquante est remplacée par le milieu de sa plage normale.
+        
+        Args:
+            latest: Dictionnaire {machine_id: {sensor_type: valeur}}
+            
+        Returns:
+            (machine_ids, matrice (machines, caractéristiques), masque des valeurs présentes)
+        """
+        machine_ids = list(latest)
+        centers = [(self.thresholds[t]['min_normal'] + self.thresholds[t]['max_normal']) / 2
+                   for t in self.MACHINE_FEATURES]
+        X = np.empty((len(machine_ids), len(self.MACHINE_FEATURES)))
+        present = np.ones(X.shape, dtype=bool)
+        for row, machine_id in enumerate(machine_ids):
+            readings = latest[machine_id]
+            for column, sensor_type in enumerate(self.MACHINE_FEATURES):
+                value = readings.get(sensor_type)
+                if value is None:
+                    X[row, column] = centers[column]
+                    present[row, column] = False
+                else:
+                    X[row, column] = value
+        return machine_ids, X, present
+    
+    def score_machines(self, latest):
+        """
+        Évalue toutes les machines avec le modèle multivarié, en un seul appel au modèle pour
+        l'ensemble du parc. Détecte les combinaisons anormales (ex. vibration élevée à faible
+        charge) que les modèles par capteur, pris séparément, jugent normales.
+        
+        Args:
+            latest: Dictionnaire {machine_id: {sensor_type: valeur}} (dernières lectures)
+            
+        Returns:
+            Dictionnaire {machine_id: résultat} avec risk_probability, anomaly, le capteur le plus
+            éloigné de sa plage normale (main_sensor) et les capteurs manquants
+        """
+        machine_ids, X, present = self.machine_features(latest)
+        if not machine_ids:
+            return {}
+        
+        model = self.get_machine_model()
+        scores = model.score_samples(X) - model.offset_
+        # Seuil du modèle (score 0, contamination de 5%) = risque 65, seuil d'anomalie des capteurs
+        risks = np.clip(65 - scores * 100, 0, 100)
+        
+        # Écart de chaque capteur au milieu de sa plage normale, en demi-plages
+        thresholds = [self.thresholds[t] for t in self.MACHINE_FEATURES]
+        centers = np.array([(t['min_normal'] + t['max_normal']) / 2 for t in thresholds])
+        half_ranges = np.array([(t['max_normal'] - t['min_normal']) / 2 for t in thresholds])
+        deviations = np.abs(X - centers) / half_ranges * present
+        main = deviations.argmax(axis=1)
+        
+        return {
+            machine_id: {
+                'risk_probability': round(float(risk), 1),
+                'anomaly': bool(score < 0),
+                'main_sensor': self.MACHINE_FEATURES[column],
+                'missing': [t for t, ok in zip(self.MACHINE_FEATURES, row_present) if not ok]
             }
+            for machine_id, score, risk, column, row_present in zip(machine_ids, scores, risks, main, present)
+        }
+    
+    def stats(self):
+        """Retourne l'occupation de l'historique et les compteurs du cache de evaluate()"""
+        return {
+            'sensor_state': self.state.stats(),
+            'evaluation_cache': {'hits': self.evaluation_hits, 'misses': self.evaluation_misses}
+        }
+    
+    def warm_start(self, history, workers=4):
+        """
+        Initialise l'historique des capteurs à partir de lectures passées, sans rejouer predict.
         
-        # Clé unique pour ce capteur
-        sensor_key = f"{machine_id}_{sensor_type}"
+        Les valeurs (et horodatages) sont copiées directement dans les slots; les risques
+        sont ceux du modèle pour chaque valeur. Les capteurs sont traités en parallèle.
         
-        # Initialiser l'historique du capteur si nécessaire
-        if sensor_key not in self.sensor_history:
-            self.sensor_history[sensor_key] = deque(maxlen=10)  # Garder les 10 dernières valeurs
-            self.risk_history[sensor_key] = deque(maxlen=10)    # Garder les 10 derniers risques
+        Args:
+            history: Dictionnaire {(machine_id, sensor_type): (valeurs, horodatages)},
+                     lectures triées de la plus ancienne à la plus récente
+            workers: Nombre de threads d'initialisation
+            
+        Returns:
+            Nombre de capteurs initialisés
+        """
+        # Attribuer les slots avant de paralléliser (l'agrandissement des tableaux n'est pas concurrent)
+        items = [(self.state.slot(self._sensor_key(machine_id, sensor_type)), machine_id, sensor_type, values, timestamps)
+                 for (machine_id, sensor_type), (values, timestamps) in history.items()
+                 if sensor_type in self.thresholds and len(values)]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(self._seed_sensor, items))
+        return len(items)
+    
+    def _seed_sensor(self, item):
+        """Copie les lectures d'un capteur et leurs risques dans son slot (statistiques glissantes incluses)"""
+        slot, machine_id, sensor_type, values, timestamps = item
+        window = self.state.window
+        values = np.asarray(values, dtype=float)
+        timestamps = np.array([self._epoch_seconds(timestamp) for timestamp in timestamps[-window:]])
+        model = self.registry.resolve(machine_id, sensor_type)
+        risks = np.clip(50 - self._decision_scores(sensor_type, values, model) * 20, 0, 100)
+        with self.state.locked([slot]):
+            self.state.seed(slot, values, timestamps, risks)
+    
+    @staticmethod
+    def _sensor_key(machine_id, sensor_type):
+        """Clé unique d'un capteur: "{machine_id}_{sensor_type}" (machine_id converti en string)"""
+        return f"{machine_id}_{sensor_type}"
+    
+    @classmethod
+    def _reading_timestamp(cls, data):
+        """Horodatage d'une lecture en secondes epoch (UTC), l'instant présent si absent"""
+        return cls._epoch_seconds(data.get('timestamp'))
+    
+    @staticmethod
+    def _epoch_seconds(timestamp):
+        """Convertit un horodatage (ISO, datetime ou nombre) en secondes epoch, datetime naïf = UTC"""
+        if timestamp is None:
+            return time.time()
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if isinstance(timestamp, datetime):
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            return timestamp.timestamp()
+        return float(timestamp)
+    
+    def _decision_scores(self, sensor_type, values, model=None):
+        """
+        Score de décision (équivalent à decision_function) pour un tableau de valeurs, avec la
+        version du registre model ou, si None, le modèle d'origine du type de capteur.
+        Négatif = anomalie selon le modèle.
+        """
+        if model is not None:
+            return model.decision_scores(values)
+        return table_decision_scores(self.get_score_table(sensor_type), values,
+                                     lambda: self.get_model(sensor_type))
+    
+    @staticmethod
+    def _model_label(sensor_type, model):
+        """Version enregistrée dans les alertes: celle du registre ou le modèle d'origine"""
+        return model.label if model is not None else f"default/{sensor_type}@legacy"
+    
+    def set_sensor_thresholds(self, sensors):
+        """
+        Compile les seuils propres à des capteurs dans les tableaux du détecteur, au slot de chaque
+        capteur (voir database.load_sensor_thresholds). Un seuil absent ou None, ou un capteur
+        associé à None, reprend les seuils de son type.
         
-        # Ajouter la valeur actuelle à l'historique
-        self.sensor_history[sensor_key].append(value)
+        Args:
+            sensors: Dictionnaire {(machine_id, sensor_type): {champ de THRESHOLD_FIELDS: valeur}}
+        """
+        for (machine_id, sensor_type), thresholds in sensors.items():
+            if sensor_type not in self.thresholds:
+                continue
+            thresholds = thresholds or {}
+            row = [np.nan if thresholds.get(field) is None else float(thresholds[field])
+                   for field in self.THRESHOLD_FIELDS]
+            slot = self.state.slot(self._sensor_key(machine_id, sensor_type))
+            with self.state.locked([slot]):
+                self.state.limits[slot] = row
+    
+    def sensor_limits(self, slots, sensor_types):
+        """Seuils (n, 4) de plusieurs capteurs par slot (THRESHOLD_FIELDS), ceux du type à défaut"""
+        rows = self.state.limits[np.asarray(slots, dtype=np.intp)]
+        defaults = np.array([self._type_limits[sensor_type] for sensor_type in sensor_types]).reshape(rows.shape)
+        return np.where(np.isnan(rows), defaults, rows)
+    
+    def sensor_thresholds(self, machine_id, sensor_type):
+        """Seuils d'un capteur (même structure que thresholds[sensor_type]), None si type non pris en charge"""
+        if sensor_type not in self.thresholds:
+            return None
+        slot = self.state.slots.get(self._sensor_key(machine_id, sensor_type))
+        limits = self._type_limits[sensor_type] if slot is None else self.sensor_limits([slot], [sensor_type])[0]
+        return dict(zip(self.THRESHOLD_FIELDS, limits.tolist()))
+    
+    def set_machine_types(self, machine_types):
+        """Indique le type de chaque machine ({machine_id: type}) pour les modèles par type de machine"""
+        self.registry.set_machine_types(machine_types)
+    
+    def load_model(self, scope, sensor_type, version=None):
+        """Charge une version du registre en arrière-plan et la rend active (Future de son étiquette)"""
+        return self.registry.load(scope, sensor_type, version)
+    
+    def publish_model(self, scope, sensor_type, model):
+        """Enregistre un modèle entraîné comme nouvelle version du registre et le rend actif (étiquette)"""
+        return self.registry.publish(scope, sensor_type, model)
+    
+    def model_versions(self):
+        """Versions de modèles actives et disponibles dans le registre"""
+        return self.registry.describe()
+    
+    def _unsupported_prediction(self, data):
+        """Prédiction retournée pour un type de capteur non pris en charge"""
+        return {
+            'risk_probability': 0,
+            'prediction': f"Type de capteur '{data['sensor_type']}' non pris en charge",
+            'suggestions': ["Consulter la documentation pour les types de capteurs pris en charge"],
+            'anomaly': False,
+            'time_to_threshold': 30,
+            'future_value': data['value'],
+            'model_version': None
+        }
+    
+    def _risk_from_score(self, stats, data, anomaly_score, limits):
+        """
+        Probabilité de risque d'une lecture à partir de son score de décision (None si indisponible).
+        Les statistiques des valeurs incluent la lecture; celles du risque la précèdent. limits:
+        seuils du capteur (THRESHOLD_FIELDS), utilisés si le score est indisponible.
+        """
+        sensor_type = data['sensor_type']
+        value = data['value']
         
-        # Utiliser le modèle pré-entraîné pour détecter des anomalies
+        # Utiliser le score du modèle pré-entraîné pour détecter des anomalies
         prediction_result = -1
         try:
-            # Utiliser le modèle pour ce type de capteur
-            model = self.models[sensor_type]
-            
-            # Prédire si la valeur est une anomalie (-1) ou normale (1)
-            prediction_array = model.predict(np.array([[value]]))
-            prediction_result = prediction_array[0]
+            if anomaly_score is None:
+                raise ValueError("score du modèle indisponible")
             
-            # Score d'anomalie (plus négatif = plus anormal)
-            anomaly_score = model.decision_function(np.array([[value]]))[0]
+            # Anomalie (-1) si le score de décision est négatif, normale (1) sinon
+            prediction_result = -1 if anomaly_score < 0 else 1
             
             # Convertir le score en probabilité de risque (0-100%)
             # Plus le score est négatif, plus la probabilité de risque est élevée
             risk_probability = min(100, max(0, 50 - (anomaly_score * 20)))
             
             # Si nous avons un historique, affiner la probabilité de risque
-            if len(self.sensor_history[sensor_key]) > 1:
-                risk_probability = self._calculate_refined_risk(sensor_key, value, risk_probability, prediction_result)
+            if stats.count > 1:
+                risk_probability = self._calculate_refined_risk(stats, value, risk_probability, prediction_result)
         except Exception as e:
             print(f"Erreur lors de la prédiction pour {sensor_type}: {e}")
             # Fallback : utiliser une méthode de détection basée sur les seuils
-            prediction_result, risk_probability = self._threshold_based_detection(sensor_type, value)
+            prediction_result, risk_probability = self._threshold_based_detection(sensor_type, value, limits)
         
-        # Ajouter le risque calculé à l'historique
-        self.risk_history[sensor_key].append(risk_probability)
+        return risk_probability
+    
+    def build_prediction(self, data, risk_probability, future_value, time_to_threshold, model_version=None,
+                         state=None):
+        """
+        Construit le dictionnaire de prédiction d'une lecture à partir de son tuple numérique
+        (state: état déjà calculé par prediction_states, sinon évalué pour cette lecture)
+        """
+        sensor_type = data['sensor_type']
         
         # Déterminer l'état et les suggestions en fonction du niveau de risque
-        state, prediction_message, suggestions = self._get_state_and_suggestions(sensor_type, value, risk_probability)
-        
-        # Estimer la valeur future et le temps avant d'atteindre un seuil critique
-        future_value, time_to_threshold = self._estimate_future_trends(sensor_key, sensor_type, value, risk_probability)
+        if state is None:
+            state = self.prediction_states([data], [risk_probability])[0]
+        prediction_message, suggestions = self._state_message(sensor_type, state)
         
         # Vérifier si c'est une anomalie
-        is_anomaly = risk_probability >= 65  # Considérer comme anomalie si risque >= 65%
+        is_anomaly = bool(risk_probability >= 65)  # Considérer comme anomalie si risque >= 65%
                 
         # Créer et retourner la prédiction avec une structure compatible avec app.py
         prediction = {
@@ -290,37 +958,29 @@ class AdvancedAnomalyDetector:
             'suggestions': suggestions,
             'anomaly': is_anomaly,
             'time_to_threshold': time_to_threshold,
-            'future_value': future_value
+            'future_value': future_value,
+            'model_version': model_version
         }
         
         return prediction
     
-    def _calculate_refined_risk(self, sensor_key, value, initial_risk, prediction_result):
+    def _calculate_refined_risk(self, stats, value, initial_risk, prediction_result):
         """Affine le calcul du risque en tenant compte de l'historique et de la tendance"""
-        history = list(self.sensor_history[sensor_key])
-        risk_history = list(self.risk_history[sensor_key]) if sensor_key in self.risk_history else []
         
         # Si nous n'avons pas assez d'historique, utiliser simplement le risque initial
-        if len(history) < 3 or len(risk_history) == 0:
+        if stats.count < 3 or stats.risk_count == 0:
             return initial_risk
         
-        # Calculer la tendance des valeurs (augmentation, diminution, stable)
-        recent_values = history[-3:]
-        if all(recent_values[i] < recent_values[i+1] for i in range(len(recent_values)-1)):
-            trend = "augmentation"
-        elif all(recent_values[i] > recent_values[i+1] for i in range(len(recent_values)-1)):
-            trend = "diminution"
-        else:
-            trend = "stable"
+        # Tendance des valeurs (augmentation, diminution, stable) d'après la pente glissante
+        trend = self._value_trend(stats)
         
-        # Calculer la variance pour détecter l'instabilité
-        variance = np.var(recent_values)
+        # Variance glissante pour détecter l'instabilité
+        variance = stats.variance
         
-        # Calculer la pente moyenne du risque récent
+        # Pente moyenne du risque récent (moyenne glissante des écarts successifs)
         mean_risk_slope = 0
-        if len(risk_history) >= 3:
-            risk_diffs = [risk_history[i+1] - risk_history[i] for i in range(len(risk_history)-1)]
-            mean_risk_slope = sum(risk_diffs) / len(risk_diffs)
+        if stats.risk_count >= 3:
+            mean_risk_slope = stats.risk_slope
         
         # Ajuster le risque en fonction de la tendance et de la variance
         adjusted_risk = initial_risk
@@ -347,80 +1007,130 @@ class AdvancedAnomalyDetector:
         # Assurer que le risque reste entre 0 et 100
         return min(100, max(0, adjusted_risk))
     
-    def _threshold_based_detection(self, sensor_type, value):
+    def _value_trend(self, stats):
+        """
+        Tendance des valeurs d'un capteur: la pente glissante n'est significative que si elle
+        dépasse son erreur-type (écart-type des écarts successifs réduit par la pondération).
+        """
+        alpha = self.state.alpha
+        standard_error = math.sqrt(stats.slope_variance * alpha / (2 - alpha))
+        if stats.slope > standard_error:
+            return "augmentation"
+        if stats.slope < -standard_error:
+            return "diminution"
+        return "stable"
+    
+    def _threshold_based_detection(self, sensor_type, value, limits=None):
         """Détection d'anomalie basée sur les seuils en cas de problème avec le modèle"""
-        thresholds = self.thresholds[sensor_type]
+        limits = self._type_limits[sensor_type] if limits is None else limits
+        predictions, risks = self.threshold_risks(np.asarray(limits, dtype=float)[None], [value])
+        return int(predictions[0]), float(risks[0])
+    
+    @staticmethod
+    def threshold_risks(limits, values):
+        """
+        Détection basée sur les seuils, vectorisée sur un lot de lectures.
         
-        # Vérifier si la valeur est en dehors des limites normales
-        if value < thresholds['min_normal'] or value > thresholds['max_normal']:
-            # En dehors des limites normales - anomalie
-            prediction = -1
-            
-            # Calculer le niveau de risque
-            if value <= thresholds['critical_low'] or value >= thresholds['critical_high']:
-                # Risque critique
-                risk = 90 + min(10, (abs(value - thresholds['critical_high']) / 10) if value > thresholds['max_normal'] 
-                               else (abs(value - thresholds['critical_low']) / 10))
-            else:
-                # Risque élevé mais non critique
-                distance_from_normal = min(
-                    abs(value - thresholds['min_normal']) if value < thresholds['min_normal'] else 0,
-                    abs(value - thresholds['max_normal']) if value > thresholds['max_normal'] else 0
-                )
-                
-                normal_range = thresholds['max_normal'] - thresholds['min_normal']
-                risk = 65 + min(25, (distance_from_normal / normal_range) * 25)
-        else:
-            # Dans les limites normales
-            prediction = 1
-            
-            # Calculer le risque en fonction de la proximité avec les limites
-            distance_to_limit = min(
-                abs(value - thresholds['min_normal']),
-                abs(value - thresholds['max_normal'])
-            )
-            
-            normal_range = thresholds['max_normal'] - thresholds['min_normal']
-            risk_factor = 1 - (distance_to_limit / (normal_range / 2))
+        Args:
+            limits: Seuils (n, 4) des capteurs des lectures (THRESHOLD_FIELDS, voir sensor_limits)
+            values: Valeurs des n lectures
             
-            risk = 10 + risk_factor * 30  # Risque entre 10% et 40%
+        Returns:
+            (prédictions, risques): -1 (anomalie) ou 1 et probabilité de risque de chaque lecture
+        """
+        values = np.asarray(values, dtype=float)
+        min_normal, max_normal, critical_low, critical_high = np.asarray(limits, dtype=float).T
+        normal_range = max_normal - min_normal
         
-        return prediction, risk
-
-    def _get_state_and_suggestions(self, sensor_type, value, risk_probability):
-        """Déterminer l'état du capteur et les suggestions associées"""
-        thresholds = self.thresholds[sensor_type]
+        # En dehors des limites normales: risque critique au-delà d'un seuil critique (90-100%),
+        # élevé sinon (65-90% selon l'écart à la plage normale)
+        outside = (values < min_normal) | (values > max_normal)
+        critical = (values <= critical_low) | (values >= critical_high)
+        critical_risk = 90 + np.minimum(10, np.where(values > max_normal, np.abs(values - critical_high),
+                                                     np.abs(values - critical_low)) / 10)
+        distance_from_normal = np.maximum(np.maximum(min_normal - values, values - max_normal), 0)
+        high_risk = 65 + np.minimum(25, distance_from_normal / normal_range * 25)
         
-        if risk_probability >= 90:
-            state = 'critical'
-            prediction = f"{sensor_type.capitalize()} critique - Arrêt immédiat nécessaire"
-            suggestions = self.suggestions[sensor_type]['high']
-        elif risk_probability >= 75:
-            state = 'high'
-            prediction = f"{sensor_type.capitalize()} élevé - Action requise"
-            suggestions = self.suggestions[sensor_type]['high']
-        elif risk_probability >= 60:
-            state = 'warning'
-            prediction = f"{sensor_type.capitalize()} anormal - Surveillance recommandée"
-            suggestions = self.suggestions[sensor_type]['high']
-        elif value < thresholds['min_normal'] and risk_probability >= 40:
-            state = 'low'
-            prediction = f"{sensor_type.capitalize()} trop bas - Vérification nécessaire"
-            suggestions = self.suggestions[sensor_type]['low']
-        else:
-            state = 'normal'
-            prediction = f"{sensor_type.capitalize()} normal"
-            suggestions = ["Aucune action nécessaire"]
+        # Dans les limites normales: risque selon la proximité des limites (10-40%)
+        distance_to_limit = np.minimum(np.abs(values - min_normal), np.abs(values - max_normal))
+        normal_risk = 10 + (1 - distance_to_limit / (normal_range / 2)) * 30
         
-        return state, prediction, suggestions
+        risks = np.where(outside, np.where(critical, critical_risk, high_risk), normal_risk)
+        return np.where(outside, -1, 1), risks
+
+    def is_critical(self, sensor_type, value, machine_id=None):
+        """
+        Indique si la valeur franchit un seuil critique (sans passer par le modèle), avec les
+        seuils propres au capteur si machine_id est donné
+        """
+        thresholds = self.sensor_thresholds(machine_id, sensor_type)
+        if not thresholds:
+            return False
+        return value <= thresholds['critical_low'] or value >= thresholds['critical_high']
+
+    def prediction_states(self, readings, risks):
+        """
+        États (critical, high, warning, low ou normal) d'un lot de lectures d'après leur risque et
+        les seuils de leur capteur, évalués en une fois sur des tableaux
+        """
+        sensor_types = [data['sensor_type'] for data in readings]
+        slots = [self.state.slots.get(self._sensor_key(data['machine_id'], data['sensor_type'])) for data in readings]
+        min_normal = np.array([self._type_limits[sensor_type][0] for sensor_type in sensor_types])
+        known = [index for index, slot in enumerate(slots) if slot is not None]
+        if known:
+            min_normal[known] = self.sensor_limits([slots[index] for index in known],
+                                                   [sensor_types[index] for index in known])[:, 0]
+        values = np.array([data['value'] for data in readings], dtype=float)
+        risks = np.asarray(risks, dtype=float)
+        return np.select(
+            [risks >= 90, risks >= 75, risks >= 60, (values < min_normal) & (risks >= 40)],
+            ['critical', 'high', 'warning', 'low'],
+            'normal'
+        ).tolist()
+
+    def _state_message(self, sensor_type, state):
+        """Message de prédiction et suggestions associés à l'état d'un capteur"""
+        name = sensor_type.capitalize()
+        if state == 'critical':
+            return f"{name} critique - Arrêt immédiat nécessaire", self.suggestions[sensor_type]['high']
+        if state == 'high':
+            return f"{name} élevé - Action requise", self.suggestions[sensor_type]['high']
+        if state == 'warning':
+            return f"{name} anormal - Surveillance recommandée", self.suggestions[sensor_type]['high']
+        if state == 'low':
+            return f"{name} trop bas - Vérification nécessaire", self.suggestions[sensor_type]['low']
+        return f"{name} normal", ["Aucune action nécessaire"]
+
+    def _forecast(self, limits, timestamps, values, counts):
+        """Prévision (forecasting.forecast) de fenêtres de capteurs, avec leurs seuils critiques (limits)"""
+        return forecast(timestamps, values, counts, limits[:, 2], limits[:, 3], horizon=self.FORECAST_HORIZON,
+                        robust=self.robust_forecast)
+    
+    def _trend_values(self, trends, row, stats, limits, current_value, risk_probability):
+        """
+        Valeur future (à FORECAST_HORIZON minutes) et minutes avant le premier seuil critique
+        (plafonnées à FORECAST_HORIZON) d'après la ligne row d'une prévision; estimation par les
+        statistiques glissantes si la régression n'est pas possible (moins de 3 lectures
+        horodatées distinctes)
+        """
+        if trends is None or not trends['valid'][row]:
+            return self._estimate_future_trends(stats, limits, current_value, risk_probability)
+        minutes = min(trends['minutes_to_high'][row], trends['minutes_to_low'][row], self.FORECAST_HORIZON)
+        return self._clip_future_value(limits, float(trends['projected'][row])), int(minutes)
+    
+    def _clip_future_value(self, limits, future_value):
+        """Assurer que la valeur future reste dans une plage réaliste (limits: seuils du capteur)"""
+        thresholds = dict(zip(self.THRESHOLD_FIELDS, limits))
+        max_possible = thresholds['critical_high'] * 1.2
+        min_possible = 0 if thresholds['critical_low'] <= 0 else thresholds['critical_low'] * 0.8
+        return float(min(max_possible, max(min_possible, future_value)))
     
-    def _estimate_future_trends(self, sensor_key, sensor_type, current_value, risk_probability):
+    def _estimate_future_trends(self, stats, limits, current_value, risk_probability):
         """Estimer la tendance future, y compris la valeur future et le temps avant seuil critique"""
-        history = list(self.sensor_history[sensor_key]) if sensor_key in self.sensor_history else [current_value]
-        thresholds = self.thresholds[sensor_type]
+        thresholds = dict(zip(self.THRESHOLD_FIELDS, limits))
         
         # Si nous n'avons pas assez d'historique
-        if len(history) < 3:
+        if stats.count < 3:
             # Estimation simple basée sur le risque actuel
             if risk_probability >= 75:
                 time_to_threshold = int(5 + (100 - risk_probability) / 5)  # 5-10 minutes
@@ -434,44 +1144,29 @@ class AdvancedAnomalyDetector:
                 time_to_threshold = 30
                 future_value = current_value
         else:
-            # Calculer la tendance basée sur l'historique
-            recent = history[-3:]
+            # Pente moyenne glissante des changements récents (par lecture)
+            avg_change = stats.slope
             
-            if len(recent) >= 2:
-                # Calculer la pente moyenne des changements récents
-                changes = [recent[i] - recent[i-1] for i in range(1, len(recent))]
-                avg_change = sum(changes) / len(changes)
-                
-                # Estimer la valeur future en fonction de la tendance récente
-                future_value = current_value + (avg_change * 3)  # Projeter 3 étapes dans le futur
-                
-                # Si la tendance est à la détérioration, estimer le temps avant seuil critique
-                critical_threshold = thresholds['critical_high'] if avg_change > 0 else thresholds['critical_low']
-                distance_to_threshold = abs(critical_threshold - current_value)
+            # Estimer la valeur future en fonction de la tendance récente
+            future_value = current_value + (avg_change * 3)  # Projeter 3 étapes dans le futur
+            
+            # Si la tendance est à la détérioration, estimer le temps avant seuil critique
+            critical_threshold = thresholds['critical_high'] if avg_change > 0 else thresholds['critical_low']
+            distance_to_threshold = abs(critical_threshold - current_value)
+            
+            # Si la tendance est significative
+            if abs(avg_change) > 0.01:
+                # Estimer le temps en minutes avant d'atteindre le seuil critique
+                time_to_reach = distance_to_threshold / abs(avg_change)
+                # Convertir en minutes (supposons que chaque point de données représente environ 5 minutes)
+                time_to_threshold = max(0, int(time_to_reach * 5))
                 
-                # Si la tendance est significative
-                if abs(avg_change) > 0.01:
-                    # Estimer le temps en minutes avant d'atteindre le seuil critique
-                    time_to_reach = distance_to_threshold / abs(avg_change)
-                    # Convertir en minutes (supposons que chaque point de données représente environ 5 minutes)
-                    time_to_threshold = max(0, int(time_to_reach * 5))
-                    
-                    # Limiter à 30 minutes maximum pour la prévision
-                    time_to_threshold = min(30, time_to_threshold)
-                else:
-                    time_to_threshold = 30  # Stable, ne devrait pas atteindre le seuil dans les 30 prochaines minutes
+                # Limiter à 30 minutes maximum pour la prévision
+                time_to_threshold = min(30, time_to_threshold)
             else:
-                # Pas assez de données historiques pour la tendance
-                time_to_threshold = 30
-                future_value = current_value
-        
-        # Assurer que la valeur future reste dans une plage réaliste
-        max_possible = thresholds['critical_high'] * 1.2
-        min_possible = 0 if thresholds['critical_low'] <= 0 else thresholds['critical_low'] * 0.8
-        
-        future_value = min(max_possible, max(min_possible, future_value))
+                time_to_threshold = 30  # Stable, ne devrait pas atteindre le seuil dans les 30 prochaines minutes
         
-        return future_value, time_to_threshold
+        return self._clip_future_value(limits, future_value), time_to_threshold
 
 # Version plus simple pour éviter les erreurs
 class IsolationForestModel(AdvancedAnomalyDetector):
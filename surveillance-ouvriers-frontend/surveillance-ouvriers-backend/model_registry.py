@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+from machine_learning import ScoreLookupTable, table_decision_scores
+
+# Portées d'un modèle, de la plus spécifique à la plus générale:
+#   sensor/<machine_id>        un capteur précis (machine_id + type de capteur)
+#   machine_type/<type>        tous les capteurs d'un type de machine
+#   default                    tous les capteurs (remplace le modèle model_<type>.joblib)
+DEFAULT_SCOPE = 'default'
+
+
+def sensor_scope(machine_id):
+    """Portée d'un modèle propre à un capteur (combinée au type de capteur)"""
+    return f"sensor/{machine_id}"
+
+
+def machine_type_scope(machine_type):
+    """Portée d'un modèle partagé par un type de machine"""
+    return f"machine_type/{machine_type}"
+
+
+def _version_key(version):
+    # Tri naturel: v2 < v10
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+class ModelVersion:
+    """Version chargée d'un modèle: forêt, table de score et étiquette enregistrée dans les alertes."""
+
+    def __init__(self, scope, sensor_type, version, model, table):
+        self.scope = scope
+        self.sensor_type = sensor_type
+        self.version = version
+        self.model = model
+        self.table = table
+        self.label = f"{scope}/{sensor_type}@{version}"
+        self.loaded_at = time.time()
+
+    def decision_scores(self, values):
+        """Score de décision (équivalent à decision_function) pour un tableau de valeurs"""
+        return table_decision_scores(self.table, values, lambda: self.model)
+
+
+class ModelRegistry:
+    """
+    Registre de modèles versionnés par (portée, type de capteur), stockés sous
+    <root>/<portée>/<type de capteur>/<version>.joblib (table de score à côté, .lut.npy).
+
+    Les versions sont chargées en arrière-plan puis publiées par remplacement atomique du
+    dictionnaire des modèles actifs: les lectures (resolve) ne prennent aucun verrou et un
+    predict en cours termine son lot avec les versions qu'il a obtenues au départ.
+    """
+
+    def __init__(self, root, thresholds):
+        """
+        Args:
+            root: Dossier racine du registre
+            thresholds: Seuils par type de capteur (plage des tables de score)
+        """
+        self.root = root
+        self.thresholds = thresholds
+        self._active = {}          # (portée, type de capteur) -> ModelVersion, remplacé en bloc
+        self._machine_types = {}   # machine_id -> type de machine, remplacé en bloc
+        self._swap_lock = threading.Lock()  # Sérialise les écrivains uniquement
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-loader')
+        self.swaps = 0
+        self.failed_loads = 0
+
+    def _directory(self, scope, sensor_type):
+        return os.path.join(self.root, *scope.split('/'), sensor_type)
+
+    def available(self):
+        """Versions présentes sur disque: {(portée, type de capteur): [versions triées]}"""
+        found = {}
+        if not os.path.isdir(self.root):
+            return found
+        for directory, _, files in os.walk(self.root):
+            versions = sorted((name[:-len('.joblib')] for name in files if name.endswith('.joblib')), key=_version_key)
+            if versions:
+                parts = os.path.relpath(directory, self.root).split(os.sep)
+                found[('/'.join(parts[:-1]), parts[-1])] = versions
+        return found
+
+    def snapshot(self):
+        """Modèles actifs à un instant donné (à passer à resolve pour tout un lot)"""
+        return self._active
+
+    def resolve(self, machine_id, sensor_type, active=None):
+        """
+        Version à utiliser pour un capteur: modèle du capteur, sinon de son type de machine,
+        sinon modèle par défaut du registre. None si aucun ne s'applique (modèle d'origine).
+        """
+        active = self._active if active is None else active
+        if not active:
+            return None
+        model = active.get((sensor_scope(machine_id), sensor_type))
+        if model is None:
+            machine_type = self._machine_types.get(str(machine_id))
+            if machine_type is not None:
+                model = active.get((machine_type_scope(machine_type), sensor_type))
+            if model is None:
+                model = active.get((DEFAULT_SCOPE, sensor_type))
+        return model
+
+    def set_machine_types(self, machine_types):
+        """Enregistre le type de machine de chaque machine_id (fusionné avec les types connus)"""
+        with self._swap_lock:
+            merged = dict(self._machine_types)
+            merged.update({str(machine_id): machine_type for machine_id, machine_type in machine_types.items()})
+            self._machine_types = merged
+
+    def resolve_version(self, scope, sensor_type, version=None):
+        """Version à charger: celle demandée ou la plus récente présente sur disque"""
+        if version is not None:
+            return version
+        versions = self.available().get((scope, sensor_type))
+        if not versions:
+            raise FileNotFoundError(f"Aucune version pour {scope}/{sensor_type}")
+        return versions[-1]
+
+    def active_label(self, scope, sensor_type):
+        """Étiquette de la version active pour (portée, type de capteur), None si aucune"""
+        model = self._active.get((scope, sensor_type))
+        return model.label if model is not None else None
+
+    def load(self, scope, sensor_type, version=None):
+        """
+        Charge une version (la plus récente si None) en arrière-plan puis la rend active.
+        Retourne un Future dont le résultat est l'étiquette de la version.
+        """
+        return self._executor.submit(self._load, scope, sensor_type, version)
+
+    def load_latest(self):
+        """Charge en arrière-plan la version la plus récente de chaque modèle présent sur disque"""
+        return [self.load(scope, sensor_type) for scope, sensor_type in self.available()]
+
+    def _load(self, scope, sensor_type, version):
+        try:
+            version = self.resolve_version(scope, sensor_type, version)
+            path = os.path.join(self._directory(scope, sensor_type), f"{version}.joblib")
+            model = joblib.load(path)
+            table = self._score_table(model, sensor_type, path)
+            return self._swap(ModelVersion(scope, sensor_type, version, model, table))
+        except Exception as e:
+            self.failed_loads += 1
+            print(f"Erreur lors du chargement du modèle {scope}/{sensor_type}@{version}: {e}")
+            raise
+
+    def _score_table(self, model, sensor_type, model_path):
+        """Table de score de la version (relue si à jour, sinon construite et enregistrée)"""
+        thresholds = self.thresholds.get(sensor_type)
+        if thresholds is None or getattr(model, 'n_features_in_', 1) != 1:
+            return None
+        low, high = thresholds['critical_low'] * 0.5, thresholds['critical_high'] * 1.5
+        table_path = model_path[:-len('.joblib')] + '.lut.npy'
+        if os.path.exists(table_path) and os.path.getmtime(table_path) >= os.path.getmtime(model_path):
+            table = ScoreLookupTable.load(table_path)
+            if np.isclose(table.low, low) and np.isclose(table.high, high):
+                return table
+        table = ScoreLookupTable.from_forest(model, low, high)
+        table.save(table_path)
+        return table
+
+    def _swap(self, model_version):
+        """Rend une version active par remplacement atomique du dictionnaire des modèles actifs"""
+        with self._swap_lock:
+            active = dict(self._active)
+            active[(model_version.scope, model_version.sensor_type)] = model_version
+            self._active = active
+            self.swaps += 1
+        print(f"Modèle actif: {model_version.label}")
+        return model_version.label
+
+    def publish(self, scope, sensor_type, model, version=None):
+        """
+        Enregistre un modèle entraîné comme nouvelle version (v<N+1> par défaut) et le rend actif.
+        Retourne l'étiquette de la version.
+        """
+        directory = self._directory(scope, sensor_type)
+        os.makedirs(directory, exist_ok=True)
+        if version is None:
+            numbers = [int(name[1:]) for name in self.available().get((scope, sensor_type), [])
+                       if re.fullmatch(r'v\d+', name)]
+            version = f"v{max(numbers, default=0) + 1}"
+        path = os.path.join(directory, f"{version}.joblib")
+        # Écriture dans un fichier temporaire puis remplacement atomique (lecteurs concurrents)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+        table = self._score_table(model, sensor_type, path)
+        return self._swap(ModelVersion(scope, sensor_type, version, model, table))
+
+    def describe(self):
+        """Versions actives et versions disponibles sur disque"""
+        active = self._active
+        return {
+            'active': {f"{scope}/{sensor_type}": {'version': model.version, 'label': model.label,
+                                                  'loaded_at': model.loaded_at}
+                       for (scope, sensor_type), model in active.items()},
+            'available': {f"{scope}/{sensor_type}": versions
+                          for (scope, sensor_type), versions in self.available().items()},
+            'swaps': self.swaps,
+            'failed_loads': self.failed_loads
+        }
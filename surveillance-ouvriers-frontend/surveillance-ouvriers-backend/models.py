@@ -1,8 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import bcrypt
+from sqlalchemy import event
+from sqlite_engine import RoutingSession
 
-db = SQLAlchemy()
+# Les lectures peuvent être servies par un pool de connexions dédié (profil SQLite, voir database.configure_database)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -70,6 +73,7 @@ class Sensor(db.Model):
     
     # Relations
     sensor_data = db.relationship('SensorData', backref='sensor', lazy='dynamic')
+    latest = db.relationship('SensorLatest', uselist=False, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -85,6 +89,10 @@ class Sensor(db.Model):
 
 class SensorData(db.Model):
     __tablename__ = 'sensor_data'
+    # Dernières lectures d'un capteur: filter_by(sensor_id).order_by(timestamp.desc())
+    __table_args__ = (
+        db.Index('ix_sensor_data_sensor_timestamp', 'sensor_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), nullable=False)
@@ -101,8 +109,53 @@ class SensorData(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
+class SensorLatest(db.Model):
+    """Dernière lecture et nombre de lectures de chaque capteur, tenus à jour à chaque écriture"""
+    __tablename__ = 'sensor_latest'
+    
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    reading_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'sensor_id': self.sensor_id,
+            'value': self.value,
+            'timestamp': self.timestamp.isoformat(),
+            'reading_count': self.reading_count
+        }
+
+class SensorRollup(db.Model):
+    """
+    Agrégats d'un capteur par intervalle fixe (resolution en secondes: minute, heure, jour),
+    alignés sur l'epoch UTC et tenus à jour à chaque écriture de lectures
+    """
+    __tablename__ = 'sensor_rollups'
+    
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), primary_key=True)
+    resolution = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    sum_value = db.Column(db.Float, nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+
+@event.listens_for(Sensor, 'before_delete')
+def delete_sensor_rollups(mapper, connection, sensor):
+    """
+    Supprime les agrégats d'un capteur supprimé par une seule requête, avant le capteur (clé
+    étrangère), plutôt qu'une relationship en cascade qui chargerait chaque agrégat
+    """
+    connection.execute(SensorRollup.__table__.delete().where(SensorRollup.sensor_id == sensor.id))
+
 class Alert(db.Model):
     __tablename__ = 'alerts'
+    # Recherche d'une alerte active similaire, et alertes par statut triées par date
+    __table_args__ = (
+        db.Index('ix_alerts_machine_sensor_status', 'machine_id', 'sensor_type', 'status'),
+        db.Index('ix_alerts_status_timestamp', 'status', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     machine_id = db.Column(db.Integer, db.ForeignKey('machines.id'), nullable=False)
@@ -116,6 +169,7 @@ class Alert(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     resolved_at = db.Column(db.DateTime, nullable=True)
+    model_version = db.Column(db.String(100), nullable=True)  # Version du modèle ayant scoré la lecture
     
     # Relations
     machine = db.relationship('Machine')
@@ -134,5 +188,6 @@ class Alert(db.Model):
             'status': self.status,
             'timestamp': self.timestamp.isoformat(),
             'resolved_by': self.resolver.username if self.resolver else None,
-            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'model_version': self.model_version
         }
@@ -0,0 +1,174 @@
+import logging
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+logger = logging.getLogger('industrial_monitoring')
+
+# Paramètres des forêts réentraînées (identiques à ceux des modèles d'origine)
+FOREST_PARAMS = {
+    'n_estimators': 100,
+    'max_samples': 'auto',
+    'contamination': 0.05,
+    'random_state': 42
+}
+
+
+class ReservoirSampler:
+    """
+    Échantillon uniforme de taille fixe d'un flux de valeurs de longueur inconnue
+    (algorithme R, appliqué bloc par bloc avec NumPy).
+    """
+
+    def __init__(self, size, seed=None):
+        """
+        Args:
+            size: Taille maximale de l'échantillon
+            seed: Graine du générateur aléatoire (reproductibilité)
+        """
+        self.size = size
+        self.seen = 0
+        self._sample = np.empty(size, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, chunk):
+        """Ajoute un bloc de valeurs au flux"""
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        fill = min(max(self.size - self.seen, 0), len(chunk))
+        self._sample[self.seen:self.seen + fill] = chunk[:fill]
+
+        rest = chunk[fill:]
+        if len(rest):
+            # La valeur d'indice i du flux remplace une case tirée dans [0, i]; elle n'est gardée que
+            # si la case existe (probabilité size / (i + 1)). Pour une même case, la dernière gagne:
+            # l'affectation indexée ne garantit pas l'ordre des doublons, on ne garde donc que la
+            # dernière occurrence de chaque case (première du tableau inversé)
+            indices = np.arange(self.seen + fill, self.seen + len(chunk))
+            positions = self._rng.integers(0, indices + 1)
+            kept = positions < self.size
+            positions, values = positions[kept][::-1], rest[kept][::-1]
+            positions, last = np.unique(positions, return_index=True)
+            self._sample[positions] = values[last]
+        self.seen += len(chunk)
+
+    def values(self):
+        """Échantillon courant (copie)"""
+        return self._sample[:min(self.seen, self.size)].copy()
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _fit_forest(values, n_jobs):
+    """Entraîne une forêt (dans le processus d'entraînement); retourne (modèle, durée, pic mémoire)"""
+    start = time.perf_counter()
+    model = IsolationForest(n_jobs=n_jobs, **FOREST_PARAMS)
+    model.fit(values.reshape(-1, 1))
+    # Scoring séquentiel dans l'application (le parallélisme ne sert qu'à l'entraînement)
+    model.set_params(n_jobs=None)
+    return model, time.perf_counter() - start, _peak_rss_mb()
+
+
+def fit_forest_in_subprocess(values, n_jobs):
+    """
+    Entraîne une forêt dans un interpréteur séparé (ce module exécuté comme script), hors du GIL
+    et de la mémoire de l'application. Un interpréteur neuf plutôt que multiprocessing: 'spawn'
+    réimporterait le script principal (app.py et ses effets de bord), 'fork' copierait ses threads.
+    """
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), str(n_jobs)],
+                             input=pickle.dumps(values), capture_output=True)
+    if process.returncode != 0:
+        errors = process.stderr.decode(errors='replace').strip().splitlines()
+        raise RuntimeError(errors[-1] if errors else f"code de sortie {process.returncode}")
+    return pickle.loads(process.stdout)
+
+
+def retrain_models(detector, iter_values, sensor_types=None, scope='default', sample_size=50000,
+                   chunk_size=10000, min_samples=1000, n_jobs=-1, seed=None):
+    """
+    Réentraîne les modèles sur les lectures enregistrées et publie les nouvelles versions dans le
+    registre du détecteur (remplacement à chaud, sans interruption du scoring).
+
+    Les lectures de chaque type de capteur sont parcourues par blocs et sous-échantillonnées
+    (échantillonnage par réservoir); les forêts sont entraînées dans un processus séparé
+    (n_jobs cœurs), pendant que le type suivant est lu depuis la base.
+
+    Args:
+        detector: Détecteur ou service d'inférence (publish_model)
+        iter_values: Fonction (sensor_type, chunk_size) -> itérateur de blocs de valeurs
+                     (database.iter_sensor_values, dans un contexte d'application)
+        sensor_types: Types à réentraîner (par défaut tous les types du détecteur)
+        scope: Portée des versions publiées (voir model_registry)
+        sample_size: Taille de l'échantillon d'entraînement par type
+        chunk_size: Nombre de lignes lues par requête
+        min_samples: Nombre minimal de lectures pour publier un modèle
+        n_jobs: Cœurs utilisés pour l'entraînement de chaque forêt (-1 = tous)
+        seed: Graine de l'échantillonnage
+
+    Returns:
+        Rapport: durée totale, pic mémoire et détail par type de capteur
+    """
+    start = time.perf_counter()
+    peak_before = _peak_rss_mb()
+    sensor_types = list(sensor_types or detector.thresholds.keys())
+    results = {}
+    futures = {}
+
+    # Un entraînement à la fois, attendu depuis un thread pendant la lecture du type suivant
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='retrain-fit') as pool:
+        for sensor_type in sensor_types:
+            stream_start = time.perf_counter()
+            sampler = ReservoirSampler(sample_size, seed)
+            for chunk in iter_values(sensor_type, chunk_size):
+                sampler.add(chunk)
+            values = sampler.values()
+            results[sensor_type] = {
+                'rows': sampler.seen,
+                'samples': len(values),
+                'stream_s': round(time.perf_counter() - stream_start, 3)
+            }
+            if len(values) < min_samples:
+                results[sensor_type]['status'] = 'skipped'
+                logger.info(f"Réentraînement {sensor_type} ignoré: {len(values)} lectures (minimum {min_samples})")
+                continue
+            futures[sensor_type] = pool.submit(fit_forest_in_subprocess, values, n_jobs)
+
+        for sensor_type, future in futures.items():
+            result = results[sensor_type]
+            try:
+                model, fit_seconds, fit_peak = future.result()
+                result['fit_s'] = round(fit_seconds, 3)
+                result['fit_peak_rss_mb'] = fit_peak
+                result['model_version'] = detector.publish_model(scope, sensor_type, model)
+                result['status'] = 'published'
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+                logger.error(f"Erreur lors du réentraînement du modèle {sensor_type}: {str(e)}")
+
+    report = {
+        'wall_time_s': round(time.perf_counter() - start, 3),
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_increase_mb': round(_peak_rss_mb() - peak_before, 1),
+        'training_peak_rss_mb': max((result.get('fit_peak_rss_mb', 0) for result in results.values()), default=0),
+        'sensor_types': results
+    }
+    logger.info(f"Réentraînement terminé en {report['wall_time_s']} s "
+                f"(pic mémoire {report['peak_rss_mb']} Mo, entraînement {report['training_peak_rss_mb']} Mo)")
+    return report
+
+
+if __name__ == '__main__':
+    # Processus d'entraînement: échantillon (pickle) sur l'entrée standard, résultat sur la sortie
+    sample = pickle.load(sys.stdin.buffer)
+    pickle.dump(_fit_forest(sample, int(sys.argv[1])), sys.stdout.buffer)
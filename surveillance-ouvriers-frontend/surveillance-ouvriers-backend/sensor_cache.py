@@ -0,0 +1,85 @@
+import threading
+from collections import namedtuple
+
+# Résolution d'un capteur pour le chemin d'ingestion
+SensorResolution = namedtuple('SensorResolution', [
+    'machine_pk',        # machines.id
+    'sensor_pk',         # sensors.id
+    'machine_status',    # machines.status au moment de la mise en cache
+    'min_value',
+    'max_value',
+    'normal_range_min',
+    'normal_range_max'
+])
+
+
+class SensorResolutionCache:
+    """
+    Cache en mémoire qui associe (machine_id, sensor_type) à l'identifiant de la machine,
+    l'identifiant du capteur, le statut de la machine et les limites du capteur.
+    Évite les deux requêtes Machine/Sensor sur chaque lecture ingérée.
+    """
+
+    def __init__(self):
+        """Initialise un cache vide et ses compteurs."""
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def build_entry(machine, sensor):
+        """Construit une entrée de cache à partir des objets Machine et Sensor."""
+        return SensorResolution(
+            machine_pk=machine.id,
+            sensor_pk=sensor.id,
+            machine_status=machine.status,
+            min_value=sensor.min_value,
+            max_value=sensor.max_value,
+            normal_range_min=sensor.normal_range_min,
+            normal_range_max=sensor.normal_range_max
+        )
+
+    def get(self, machine_id, sensor_type):
+        """Retourne l'entrée en cache ou None, en comptant les succès et les échecs."""
+        key = (str(machine_id), sensor_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, machine_id, sensor_type, entry):
+        """Enregistre une entrée pour (machine_id, sensor_type)."""
+        with self._lock:
+            self._entries[(str(machine_id), sensor_type)] = entry
+
+    def invalidate_machine(self, machine_id):
+        """Supprime toutes les entrées d'une machine (identifiant public, ex. 'machine-001')."""
+        machine_id = str(machine_id)
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == machine_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        """Vide entièrement le cache."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Retourne les compteurs du cache (succès, échecs, taux de succès, taille)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self._entries)
+            }
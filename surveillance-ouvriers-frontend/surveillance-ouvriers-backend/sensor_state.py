@@ -0,0 +1,256 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+# Colonnes des statistiques glissantes par slot (tableaux value_stats et risk_stats)
+COUNT, MEAN, VARIANCE, LAST, SLOPE, SLOPE_VARIANCE = range(6)
+RISK_COUNT, RISK_LAST, RISK_SLOPE = range(3)
+
+# Statistiques d'un capteur: moyenne, variance et pente (écart moyen entre lectures successives)
+# pondérées exponentiellement, et pente du risque
+SensorStats = namedtuple('SensorStats', [
+    'count', 'mean', 'variance', 'last', 'slope', 'slope_variance', 'risk_count', 'last_risk', 'risk_slope'])
+
+
+def update_value_stats(rows, values, alpha):
+    """
+    Ajoute une valeur à chaque ligne de statistiques (tableau (n, 6), modifié en place), en O(1):
+    moyenne mobile exponentielle, variance par la récurrence de Welford pondérée
+    (var = (1 - alpha) * (var + delta * alpha * delta)) et même récurrence pour les écarts
+    entre valeurs successives (pente par lecture et sa variance).
+    """
+    values = np.asarray(values, dtype=float)
+    count = rows[:, COUNT]
+    first, second = count == 0, count == 1
+
+    delta = values - rows[:, MEAN]
+    increment = alpha * delta
+    rows[:, VARIANCE] = np.where(first, 0.0, (1 - alpha) * (rows[:, VARIANCE] + delta * increment))
+    rows[:, MEAN] = np.where(first, values, rows[:, MEAN] + increment)
+
+    step = values - rows[:, LAST]
+    slope_delta = step - rows[:, SLOPE]
+    slope_increment = alpha * slope_delta
+    rows[:, SLOPE_VARIANCE] = np.where(count < 2, 0.0,
+                                       (1 - alpha) * (rows[:, SLOPE_VARIANCE] + slope_delta * slope_increment))
+    rows[:, SLOPE] = np.where(first, 0.0, np.where(second, step, rows[:, SLOPE] + slope_increment))
+
+    rows[:, LAST] = values
+    rows[:, COUNT] = count + 1
+
+
+def update_risk_stats(rows, risks, alpha):
+    """Ajoute un risque à chaque ligne (tableau (n, 3), modifié en place): pente moyenne exponentielle"""
+    risks = np.asarray(risks, dtype=float)
+    count = rows[:, RISK_COUNT]
+    step = risks - rows[:, RISK_LAST]
+    rows[:, RISK_SLOPE] = np.where(count == 0, 0.0, np.where(
+        count == 1, step, rows[:, RISK_SLOPE] + alpha * (step - rows[:, RISK_SLOPE])))
+    rows[:, RISK_LAST] = risks
+    rows[:, RISK_COUNT] = count + 1
+
+
+class SensorStateStore:
+    """
+    État glissant par capteur (valeurs, risques et horodatages) dans des tampons circulaires
+    NumPy préalloués.
+
+    Chaque capteur reçoit un slot entier, c'est-à-dire une ligne des tableaux. Les tampons ont
+    une largeur de 2 * window et chaque écriture est faite deux fois (positions p et p + window):
+    les window dernières entrées forment ainsi toujours une tranche contiguë, lue comme une vue
+    NumPy sans copie. Les écritures acceptent plusieurs slots à la fois pour le scoring par lot.
+
+    Chaque slot porte aussi des statistiques glissantes mises à jour en O(1) à chaque écriture
+    (voir update_value_stats), pondérées sur span lectures environ: leur coût ne dépend pas de la
+    longueur de la fenêtre, qui peut dépasser largement window.
+
+    Accès concurrents: les slots sont répartis sur un nombre fixe de verrous (lock striping,
+    slot % stripes). Une séquence lecture/écriture sur un slot se fait sous locked([slot]);
+    deux capteurs de bandes différentes sont donc traités en parallèle. L'agrandissement des
+    tableaux prend toutes les bandes et ne doit pas être demandé (slot()) sous locked().
+    """
+
+    def __init__(self, window=10, capacity=64, stripes=64, span=10):
+        """
+        Args:
+            window: Nombre d'entrées conservées par capteur
+            span: Fenêtre des statistiques glissantes (alpha = 2 / (span + 1))
+            capacity: Nombre de slots préalloués (doublé automatiquement si nécessaire)
+            stripes: Nombre de verrous entre lesquels les slots sont répartis
+        """
+        self.window = window
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.slots = {}   # clé de capteur -> slot
+        self.keys = []    # slot -> clé de capteur
+        self._lock = threading.Lock()  # Attribution des slots
+        self._stripes = [threading.Lock() for _ in range(max(1, stripes))]
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """(Ré)alloue les tableaux pour capacity slots en conservant les slots existants."""
+        width = 2 * self.window
+        arrays = {
+            'values': np.zeros((capacity, width)),
+            'timestamps': np.zeros((capacity, width)),
+            'risks': np.zeros((capacity, width)),
+            'value_pos': np.zeros(capacity, dtype=np.intp),
+            'value_count': np.zeros(capacity, dtype=np.intp),
+            'risk_pos': np.zeros(capacity, dtype=np.intp),
+            'risk_count': np.zeros(capacity, dtype=np.intp),
+            'versions': np.zeros(capacity, dtype=np.int64),  # Incrémenté à chaque nouvelle valeur
+            'value_stats': np.zeros((capacity, 6)),
+            'risk_stats': np.zeros((capacity, 3)),
+            # Seuils propres au capteur (min_normal, max_normal, critical_low, critical_high);
+            # NaN = seuil de son type
+            'limits': np.full((capacity, 4), np.nan)
+        }
+        used = len(self.keys)
+        for name, array in arrays.items():
+            if used:
+                array[:used] = getattr(self, name)[:used]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.keys)
+
+    def slot(self, sensor_key):
+        """Retourne le slot du capteur, en l'attribuant au premier appel."""
+        slot = self.slots.get(sensor_key)
+        if slot is not None:
+            return slot
+        with self._lock:
+            slot = self.slots.get(sensor_key)
+            if slot is None:
+                slot = len(self.keys)
+                if slot == self.capacity:
+                    # Aucun slot ne doit être lu ou écrit pendant la copie des tableaux
+                    with self.locked(range(len(self._stripes))):
+                        self._allocate(self.capacity * 2)
+                self.keys.append(sensor_key)
+                self.slots[sensor_key] = slot
+            return slot
+
+    @contextmanager
+    def locked(self, slots):
+        """Verrouille les bandes des slots donnés, toujours dans le même ordre (pas d'interblocage)."""
+        locks = [self._stripes[index] for index in sorted({slot % len(self._stripes) for slot in slots})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def push_values(self, slots, values, timestamps):
+        """
+        Ajoute une valeur et son horodatage (secondes epoch) à chacun des slots.
+        Les slots d'un même appel doivent être distincts.
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        pos = self.value_pos[slots]
+        self.values[slots, pos] = values
+        self.values[slots, pos + self.window] = values
+        self.timestamps[slots, pos] = timestamps
+        self.timestamps[slots, pos + self.window] = timestamps
+        self.value_pos[slots] = (pos + 1) % self.window
+        self.value_count[slots] = np.minimum(self.value_count[slots] + 1, self.window)
+        self.versions[slots] += 1
+        rows = self.value_stats[slots]
+        update_value_stats(rows, values, self.alpha)
+        self.value_stats[slots] = rows
+
+    def push_risks(self, slots, risks):
+        """Ajoute un risque à chacun des slots (slots distincts)."""
+        slots = np.asarray(slots, dtype=np.intp)
+        pos = self.risk_pos[slots]
+        self.risks[slots, pos] = risks
+        self.risks[slots, pos + self.window] = risks
+        self.risk_pos[slots] = (pos + 1) % self.window
+        self.risk_count[slots] = np.minimum(self.risk_count[slots] + 1, self.window)
+        rows = self.risk_stats[slots]
+        update_risk_stats(rows, risks, self.alpha)
+        self.risk_stats[slots] = rows
+
+    def seed(self, slot, values, timestamps, risks):
+        """
+        Remplace l'historique d'un slot par des lectures passées, triées de la plus ancienne à la
+        plus récente: toutes alimentent les statistiques, les window dernières les tampons.
+        """
+        value_rows, risk_rows = np.zeros((1, 6)), np.zeros((1, 3))
+        for value in np.asarray(values, dtype=float):
+            update_value_stats(value_rows, value, self.alpha)
+        for risk in np.asarray(risks, dtype=float):
+            update_risk_stats(risk_rows, risk, self.alpha)
+        self.value_stats[slot] = value_rows[0]
+        self.risk_stats[slot] = risk_rows[0]
+        
+        values = np.asarray(values, dtype=float)[-self.window:]
+        timestamps = np.asarray(timestamps, dtype=float)[-self.window:]
+        risks = np.asarray(risks, dtype=float)[-self.window:]
+        count, risk_count = len(values), len(risks)
+        for offset in (0, self.window):
+            self.values[slot, offset:offset + count] = values
+            self.timestamps[slot, offset:offset + count] = timestamps
+            self.risks[slot, offset:offset + risk_count] = risks
+        self.value_pos[slot] = count % self.window
+        self.value_count[slot] = count
+        self.risk_pos[slot] = risk_count % self.window
+        self.risk_count[slot] = risk_count
+        self.versions[slot] += 1
+
+    def recent_values(self, slot):
+        """Vue des dernières valeurs du slot, de la plus ancienne à la plus récente."""
+        end = self.value_pos[slot] + self.window
+        return self.values[slot, end - self.value_count[slot]:end]
+
+    def recent_timestamps(self, slot):
+        """Vue des horodatages alignés sur recent_values."""
+        end = self.value_pos[slot] + self.window
+        return self.timestamps[slot, end - self.value_count[slot]:end]
+
+    def recent_risks(self, slot):
+        """Vue des derniers risques du slot, du plus ancien au plus récent."""
+        end = self.risk_pos[slot] + self.window
+        return self.risks[slot, end - self.risk_count[slot]:end]
+
+    def windows(self, slots):
+        """
+        Copies des fenêtres de plusieurs slots en une seule indexation: horodatages et valeurs
+        (slots, window), de la plus ancienne à la plus récente (dernière colonne), et nombre de
+        valeurs valides de chaque ligne (les dernières colonnes).
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        columns = self.value_pos[slots, None] + np.arange(self.window)
+        return self.timestamps[slots[:, None], columns], self.values[slots[:, None], columns], \
+            self.value_count[slots].copy()
+
+    def sensor_stats(self, slot, value=None):
+        """
+        Statistiques glissantes du slot (SensorStats); avec value, celles qu'il aurait si la valeur
+        était ajoutée, sans la lui ajouter (slot=None: capteur sans historique).
+        """
+        if value is None:
+            return SensorStats(*self.value_stats[slot].tolist(), *self.risk_stats[slot].tolist())
+        value_row = np.zeros((1, 6)) if slot is None else self.value_stats[slot:slot + 1].copy()
+        update_value_stats(value_row, value, self.alpha)
+        risk_row = np.zeros(3) if slot is None else self.risk_stats[slot]
+        return SensorStats(*value_row[0].tolist(), *risk_row.tolist())
+
+    def stats(self):
+        """Retourne le nombre de capteurs suivis et la mémoire occupée par les tampons."""
+        nbytes = sum(getattr(self, name).nbytes for name in
+                     ('values', 'timestamps', 'risks', 'value_pos', 'value_count', 'risk_pos', 'risk_count', 'versions',
+                      'value_stats', 'risk_stats', 'limits'))
+        return {
+            'sensors': len(self.keys),
+            'capacity': self.capacity,
+            'window': self.window,
+            'span': self.span,
+            'stripes': len(self._stripes),
+            'bytes': nbytes
+        }
@@ -0,0 +1,111 @@
+"""
+Profil SQLite de production: pragmas appliqués à chaque connexion (WAL, synchronous=NORMAL,
+mmap, cache, busy_timeout), une seule connexion d'écriture par processus et un pool de
+connexions de lecture.
+
+En mode WAL, les lecteurs ne bloquent pas l'écrivain et inversement, mais SQLite n'accepte
+qu'une écriture à la fois: plutôt que de laisser les threads (planificateur, requêtes, tampon
+d'écriture) se disputer le verrou de la base jusqu'à "database is locked", les écritures
+passent toutes par l'unique connexion du moteur principal (pool de taille 1) et attendent leur
+tour dans le pool. Les lectures utilisent le moteur READER_BIND, en lecture seule.
+"""
+import sqlalchemy as sa
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Clé de bind (SQLALCHEMY_BINDS) du pool de connexions de lecture
+READER_BIND = 'sqlite_reader'
+
+# Premiers mots des requêtes textuelles exécutables sur une connexion de lecture
+READ_STATEMENTS = ('SELECT', 'WITH', 'EXPLAIN')
+
+
+def sqlite_pragmas(busy_timeout_ms=5000, cache_size_kb=32768, mmap_size=268435456):
+    """Pragmas du profil, dans l'ordre d'application (cache_size négatif = taille en Kio)"""
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', int(busy_timeout_ms)),
+        ('cache_size', -int(cache_size_kb)),
+        ('mmap_size', int(mmap_size)),
+    ]
+
+
+def install_pragmas(engine, pragmas, read_only=False):
+    """Applique les pragmas à chaque nouvelle connexion du moteur (query_only pour les lecteurs)"""
+    pragmas = list(pragmas) + ([('query_only', 1)] if read_only else [])
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def engine_options(busy_timeout_ms=5000, reader_pool_size=4):
+    """
+    Options des moteurs d'écriture et de lecture (SQLALCHEMY_ENGINE_OPTIONS et bind lecteur):
+    une connexion d'écriture partagée par tous les threads, attendue au plus busy_timeout_ms,
+    et reader_pool_size connexions de lecture (autant en débordement).
+    """
+    common = {
+        'poolclass': QueuePool,
+        'pool_timeout': busy_timeout_ms / 1000,
+        'connect_args': {'check_same_thread': False, 'timeout': busy_timeout_ms / 1000}
+    }
+    writer = dict(common, pool_size=1, max_overflow=0)
+    reader = dict(common, pool_size=max(1, reader_pool_size), max_overflow=max(1, reader_pool_size))
+    return writer, reader
+
+
+def is_read_only(clause):
+    """Vrai pour une requête sans effet de bord: SELECT (ORM ou Core) ou texte SELECT/WITH/EXPLAIN"""
+    if isinstance(clause, (sa.sql.Select, sa.sql.CompoundSelect)):
+        return True
+    if isinstance(clause, sa.sql.elements.TextClause):
+        return clause.text.lstrip().upper().startswith(READ_STATEMENTS)
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Session Flask-SQLAlchemy qui envoie les lectures au pool READER_BIND lorsqu'il est configuré.
+
+    Tout le reste (flush, INSERT/UPDATE/DELETE, DDL, connection()) utilise le moteur principal,
+    c'est-à-dire la connexion d'écriture. Dès qu'une transaction a écrit, ses lectures suivantes
+    restent sur cette connexion jusqu'au commit ou rollback, afin de voir ses propres écritures.
+    Sans bind de lecture (PostgreSQL, tests), le comportement est celui de Flask-SQLAlchemy.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        reader = self._db.engines.get(READER_BIND) if bind is None else None
+        if reader is not None and not self.info.get('flushing') and not self.info.get('writing') and is_read_only(clause):
+            return reader
+        if reader is not None:
+            self.info['writing'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def start_flush(session, flush_context, instances):
+    """Pendant un flush, toutes les requêtes (y compris les SELECT internes) utilisent la connexion d'écriture"""
+    session.info['flushing'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush_postexec')
+def end_flush(session, flush_context):
+    """Fin du flush: les lectures peuvent de nouveau aller au pool de lecture (hors transaction d'écriture)"""
+    session.info.pop('flushing', None)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def release_writer(session, transaction):
+    """Fin de la transaction principale: les lectures retournent au pool de lecture"""
+    if transaction.parent is None:
+        session.info.pop('writing', None)
+        # Flush interrompu par une erreur: after_flush_postexec n'a pas été appelé
+        session.info.pop('flushing', None)
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import warnings
+
+import numpy as np
+import pytest
+
+from machine_learning import IsolationForestModel
+
+THREADS = 16
+READINGS_PER_THREAD = 400
+MACHINES = ['machine-001', 'machine-002', 'machine-003']
+SENSOR_TYPES = ['temperature', 'pressure', 'vibration']
+
+
+@pytest.fixture
+def detector():
+    # Les modèles sont chargés depuis le dossier du backend
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            detector = IsolationForestModel()
+            detector.preload()
+            yield detector
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    # Forcer des changements de thread fréquents pour provoquer les entrelacements
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _value(sensor_type, thread_index, sequence):
+    # Valeurs croissantes par thread et disjointes entre threads, pour retrouver leur origine
+    base = {'temperature': 30.0, 'pressure': 60.0, 'vibration': 0.1}[sensor_type]
+    step = {'temperature': 2.0, 'pressure': 4.0, 'vibration': 0.05}[sensor_type]
+    return base + thread_index * step + sequence * step / (2 * READINGS_PER_THREAD)
+
+
+def _hammer(detector, thread_index, errors, use_batch):
+    try:
+        for sequence in range(READINGS_PER_THREAD):
+            readings = [{'machine_id': machine_id, 'sensor_type': sensor_type,
+                         'value': _value(sensor_type, thread_index, sequence)}
+                        for machine_id in MACHINES for sensor_type in SENSOR_TYPES]
+            if use_batch:
+                detector.predict_batch(readings)
+            else:
+                for reading in readings:
+                    detector.predict(reading)
+    except Exception as e:  # pragma: no cover - remonté par l'assertion du test
+        errors.append(e)
+
+
+@pytest.mark.parametrize('use_batch', [False, True])
+def test_concurrent_predict_keeps_history_consistent(detector, frequent_thread_switches, use_batch):
+    errors = []
+    threads = [threading.Thread(target=_hammer, args=(detector, index, errors, use_batch))
+               for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    state = detector.state
+    window = state.window
+    total = THREADS * READINGS_PER_THREAD
+    assert len(state) == len(MACHINES) * len(SENSOR_TYPES)
+
+    for key, slot in state.slots.items():
+        sensor_type = key.rsplit('_', 1)[1]
+        # Aucune écriture perdue: chaque lecture a fait avancer les deux tampons d'une position
+        assert state.value_pos[slot] == total % window
+        assert state.risk_pos[slot] == total % window
+        assert state.value_count[slot] == state.risk_count[slot] == window
+        # Chaque lecture a aussi mis à jour les statistiques glissantes une seule fois
+        stats = state.sensor_stats(slot)
+        assert stats.count == stats.risk_count == total
+        # Les deux copies du tampon miroir sont identiques (pas d'écriture à moitié faite)
+        assert np.array_equal(state.values[slot, :window], state.values[slot, window:])
+        assert np.array_equal(state.risks[slot, :window], state.risks[slot, window:])
+
+        # L'historique ne contient que des lectures envoyées, dans l'ordre d'envoi de chaque thread
+        history = state.recent_values(slot)
+        expected = {_value(sensor_type, t, s): (t, s)
+                    for t in range(THREADS) for s in range(READINGS_PER_THREAD - window, READINGS_PER_THREAD)}
+        origins = [expected.get(value) for value in history]
+        assert None not in origins
+        for thread_index in range(THREADS):
+            sequences = [s for t, s in origins if t == thread_index]
+            assert sequences == sorted(sequences)
+        assert np.all((state.recent_risks(slot) >= 0) & (state.recent_risks(slot) <= 100))
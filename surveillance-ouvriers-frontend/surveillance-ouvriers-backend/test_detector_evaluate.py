@@ -0,0 +1,65 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from machine_learning import IsolationForestModel
+
+VALUES = [50.0, 55.0, 61.0, 68.0, 74.0]
+
+
+def _reading(value, machine_id='machine-001', sensor_type='temperature'):
+    return {'machine_id': machine_id, 'sensor_type': sensor_type, 'value': value}
+
+
+@pytest.fixture
+def make_detector():
+    # Les modèles sont chargés depuis le dossier du backend
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            yield IsolationForestModel
+    finally:
+        os.chdir(cwd)
+
+
+def _snapshot(state):
+    return [array.copy() for array in (state.values, state.risks, state.value_pos, state.risk_pos, state.versions)]
+
+
+def test_evaluate_latest_value_returns_last_prediction(make_detector):
+    detector = make_detector()
+    predictions = [detector.predict(_reading(value)) for value in VALUES]
+    before = _snapshot(detector.state)
+
+    for _ in range(3):
+        assert detector.evaluate(_reading(VALUES[-1])) == predictions[-1]
+
+    assert all(np.array_equal(a, b) for a, b in zip(before, _snapshot(detector.state)))
+    assert detector.evaluation_hits == 3
+
+
+def test_evaluate_new_value_matches_predict_without_mutating(make_detector):
+    detector, reference = make_detector(), make_detector()
+    for value in VALUES:
+        detector.predict(_reading(value))
+        reference.predict(_reading(value))
+    before = _snapshot(detector.state)
+
+    assert detector.evaluate(_reading(80.0)) == reference.predict(_reading(80.0))
+    assert detector.evaluate(_reading(80.0, machine_id='unknown')) == make_detector().predict(_reading(80.0))
+    assert all(np.array_equal(a, b) for a, b in zip(before, _snapshot(detector.state)))
+
+
+def test_new_reading_invalidates_cached_evaluation(make_detector):
+    detector = make_detector()
+    for value in VALUES:
+        detector.predict(_reading(value))
+    detector.evaluate(_reading(VALUES[-1]))
+
+    latest = detector.predict(_reading(90.0))
+
+    assert detector.evaluate(_reading(90.0)) == latest
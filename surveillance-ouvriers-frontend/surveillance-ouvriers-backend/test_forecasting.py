@@ -0,0 +1,85 @@
+import contextlib
+import io
+import warnings
+
+import numpy as np
+import pytest
+
+import forecasting
+from forecasting import fit_trends, forecast
+from machine_learning import IsolationForestModel
+
+
+def _windows(rng, sensors=50, window=10):
+    # Horodatages irréguliers (5 à 120 s entre lectures) et nombre de lectures variable
+    timestamps = 1.7e9 + np.cumsum(rng.uniform(5, 120, (sensors, window)), axis=1)
+    values = 50 + rng.normal(0, 1, (sensors, 1)) * (timestamps - timestamps[:, :1]) / 60 + rng.normal(0, 2, (sensors, window))
+    counts = rng.integers(0, window + 1, sensors)
+    return timestamps, values, counts
+
+
+def test_batched_fit_matches_polyfit_on_real_timestamps():
+    timestamps, values, counts = _windows(np.random.default_rng(1))
+    level, slope, _, valid = fit_trends(timestamps, values, counts)
+
+    assert valid.tolist() == (counts >= 3).tolist()
+    for row in np.flatnonzero(valid):
+        minutes = (timestamps[row, -counts[row]:] - timestamps[row, -1]) / 60
+        expected_slope, expected_level = np.polyfit(minutes, values[row, -counts[row]:], 1)
+        assert slope[row] == pytest.approx(expected_slope)
+        assert level[row] == pytest.approx(expected_level)
+
+
+def test_projection_and_threshold_crossing_times():
+    minutes = np.arange(10.0)
+    timestamps = np.tile(minutes * 60, (4, 1))
+    values = np.array([
+        60 + minutes,               # +1 par minute: seuil haut (85) dans 16 minutes
+        60 - 2 * minutes,           # -2 par minute: seuil bas (20) dans 11 minutes
+        np.full(10, 90.0),          # déjà au-dessus du seuil haut
+        60 + np.resize([2.0, -2.0], 10)  # bruit sans tendance
+    ])
+    result = forecast(timestamps, values, np.full(4, 10), low=[20] * 4, high=[85] * 4, horizon=30)
+
+    assert result['slope'][:2] == pytest.approx([1, -2])
+    assert result['projected'][:2] == pytest.approx([99, -18])
+    assert result['minutes_to_high'].tolist()[:3] == pytest.approx([16, np.inf, 0])
+    assert result['minutes_to_low'].tolist()[:3] == pytest.approx([np.inf, 11, np.inf])
+    # Pente non significative: pas d'extrapolation du bruit
+    assert result['slope'][3] == 0 and np.isinf(result['minutes_to_high'][3])
+
+
+def test_robust_fit_resists_outlier():
+    minutes = np.arange(10.0)
+    values = 50 + 0.5 * minutes
+    values[4] = 500  # lecture aberrante
+    args = (minutes[None] * 60, values[None], np.array([10]))
+
+    least_squares = fit_trends(*args)[1][0]
+    huber = fit_trends(*args, robust=True, iterations=10)[1][0]
+    assert abs(huber - 0.5) < 0.1 < abs(least_squares - 0.5)
+
+
+def test_fleet_forecast_is_one_vectorized_call(monkeypatch):
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter('ignore')
+        detector = IsolationForestModel()
+        sensors = [(f"machine-{index:03d}", 'temperature') for index in range(100)]
+        # Lectures toutes les 30 s, +0,5 °C par minute: seuil critique (85) dans 55,5 minutes
+        for step in range(10):
+            detector.predict_batch([{'machine_id': machine_id, 'sensor_type': sensor_type,
+                                     'value': 55 + 0.25 * step, 'timestamp': 1.7e9 + 30 * step}
+                                    for machine_id, sensor_type in sensors])
+
+    calls = []
+    monkeypatch.setattr('machine_learning.forecast', lambda *args, **kwargs: calls.append(args[1].shape)
+                        or forecasting.forecast(*args, **kwargs))
+    results = detector.forecast_sensors(sensors + [('machine-999', 'temperature'), ('machine-000', 'humidity')])
+
+    assert calls == [(100, 10)]
+    assert results[-2:] == [None, None]
+    assert results[0]['slope_per_minute'] == pytest.approx(0.5)
+    assert results[0]['minutes_to_critical_high'] == pytest.approx(55.5)
+    assert results[0]['minutes_to_critical_low'] is None
+    assert results[0]['time_to_threshold'] == detector.FORECAST_HORIZON
+    assert results[0]['future_value'] == pytest.approx(57.25 + 15)
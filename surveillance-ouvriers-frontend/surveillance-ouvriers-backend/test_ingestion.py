@@ -0,0 +1,122 @@
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from ingestion import SensorDataBuffer
+
+
+class Store:
+    """
+    Écriture factice: refuse tout lot contenant une valeur None (contrainte NOT NULL) et tout
+    lot tant que la base est indisponible (down)
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        self.down = False
+
+    def write(self, rows):
+        self.calls += 1
+        if self.down:
+            raise OperationalError('INSERT', None, Exception('database is locked'))
+        if any(row['value'] is None for row in rows):
+            raise IntegrityError('INSERT', None, Exception('NOT NULL constraint failed: sensor_data.value'))
+        self.rows.extend(rows)
+
+
+def readings(*values):
+    return [{'sensor_id': 1, 'value': value} for value in values]
+
+
+def test_data_error_sets_bad_rows_aside():
+    store = Store()
+    buffer = SensorDataBuffer(store.write)
+    buffer.extend(readings(1.0, None, 2.0))
+
+    # Lot refusé pour une ligne invalide: écriture ligne par ligne, sans attendre de nouvelle tentative
+    assert buffer.flush() == 2
+    assert [row['value'] for row in store.rows] == [1.0, 2.0]
+    assert list(buffer.dead_letter) == readings(None)
+    stats = buffer.stats()
+    assert (stats['queue_depth'], stats['failed_flushes'], stats['dead_letter_rows']) == (0, 1, 1)
+
+    # Les lots suivants sont de nouveau écrits en une fois
+    calls = store.calls
+    buffer.extend(readings(3.0, 4.0))
+    assert buffer.flush() == 2 and store.calls == calls + 1
+
+
+def test_transient_errors_keep_rows_and_back_off():
+    store = Store()
+    store.down = True
+    buffer = SensorDataBuffer(store.write, retry_backoff_ms=100, max_backoff_ms=300)
+    buffer.extend(readings(1.0, 2.0))
+
+    delays = []
+    for _ in range(4):
+        assert buffer.flush() == 0
+        delays.append(round(buffer._retry_at - time.monotonic(), 1))
+    # Délai doublé à chaque échec consécutif, plafonné, et aucune ligne écartée
+    assert delays == [0.1, 0.2, 0.3, 0.3]
+    assert buffer.stats()['queue_depth'] == 2 and not buffer.dead_letter
+
+    store.down = False
+    buffer.extend(readings(3.0))
+    assert buffer.flush() == 3
+    assert [row['value'] for row in store.rows] == [1.0, 2.0, 3.0]
+    assert buffer.stats()['consecutive_failures'] == 0
+
+
+def test_flusher_waits_between_retries_during_an_outage():
+    store = Store()
+    store.down = True
+    buffer = SensorDataBuffer(store.write, max_rows=1, max_delay_ms=1, retry_backoff_ms=50, max_backoff_ms=1000)
+    buffer.start()
+    try:
+        buffer.extend(readings(1.0, 2.0, 3.0))
+        time.sleep(0.3)
+        # Tentatives à 0, 50, 150 ms (puis 350 ms): pas de boucle d'écritures contre la base indisponible
+        assert store.calls <= 4
+        store.down = False
+    finally:
+        buffer.stop()
+
+    assert [row['value'] for row in store.rows] == [1.0, 2.0, 3.0]
+    assert not buffer.dead_letter
+
+
+def test_full_buffer_drops_and_counts_excess_rows():
+    buffer = SensorDataBuffer(Store().write, max_rows=2, max_buffered_rows=4, max_wait_ms=0)
+
+    assert buffer.extend(readings(1.0, 2.0, 3.0)) == 3
+    assert buffer.extend(readings(4.0, 5.0, 6.0)) == 1
+    assert buffer.append(readings(7.0)[0]) == 0
+    assert buffer.stats()['dropped_rows'] == 3
+    assert buffer.stats()['queue_depth'] == 4
+
+
+def test_full_buffer_waits_for_the_flusher():
+    store = Store()
+    release = threading.Event()
+
+    def slow_write(rows):
+        release.wait(5)
+        store.write(rows)
+
+    buffer = SensorDataBuffer(slow_write, max_rows=2, max_delay_ms=10, max_buffered_rows=4, max_wait_ms=5000)
+    buffer.start()
+    try:
+        # Premier lot en cours d'écriture (bloquée), second lot en attente: le tampon est plein
+        buffer.extend(readings(1.0, 2.0, 3.0, 4.0))
+        buffer.extend(readings(5.0, 6.0, 7.0, 8.0))
+        threading.Timer(0.2, release.set).start()
+        # L'appel attend que le thread d'écriture libère de la place au lieu d'abandonner les lignes
+        assert buffer.extend(readings(9.0, 10.0)) == 2
+    finally:
+        release.set()
+        buffer.stop()
+
+    assert [row['value'] for row in store.rows] == [float(value) for value in range(1, 11)]
+    assert buffer.stats()['dropped_rows'] == 0
@@ -0,0 +1,62 @@
+import os
+import warnings
+
+import pytest
+
+from machine_learning import IsolationForestModel
+
+FLEET = {
+    'machine-001': {'temperature': 52.0, 'pressure': 95.0, 'vibration': 0.4},
+    # Chaque valeur est dans sa plage normale, mais la combinaison est incohérente:
+    # vibration élevée sur une machine froide et peu chargée
+    'machine-002': {'temperature': 40.0, 'pressure': 78.0, 'vibration': 0.62},
+    'machine-003': {'temperature': 52.0}
+}
+
+
+@pytest.fixture
+def detector():
+    # Le modèle multivarié est chargé depuis le dossier du backend
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            yield IsolationForestModel()
+    finally:
+        os.chdir(cwd)
+
+
+def test_correlated_anomaly_missed_by_univariate_models(detector):
+    scores = detector.score_machines(FLEET)
+
+    assert not scores['machine-001']['anomaly']
+    assert scores['machine-002']['anomaly']
+    assert scores['machine-002']['main_sensor'] == 'vibration'
+    for sensor_type, value in FLEET['machine-002'].items():
+        prediction = detector.evaluate({'machine_id': 'machine-002', 'sensor_type': sensor_type, 'value': value})
+        assert not prediction['anomaly']
+
+
+def test_whole_fleet_is_scored_in_one_model_call(detector):
+    model = detector.get_machine_model()
+    calls = []
+    score_samples = model.score_samples
+    model.score_samples = lambda X: calls.append(X.shape) or score_samples(X)
+    try:
+        fleet = {f"machine-{index:03d}": FLEET['machine-001'] for index in range(250)}
+        assert len(detector.score_machines(fleet)) == 250
+    finally:
+        del model.score_samples
+
+    assert calls == [(250, len(detector.MACHINE_FEATURES))]
+
+
+def test_missing_sensors_are_imputed_and_reported(detector):
+    machine_ids, X, present = detector.machine_features(FLEET)
+
+    row = machine_ids.index('machine-003')
+    assert present[row].tolist() == [True, False, False]
+    assert X[row, 1] == (detector.thresholds['pressure']['min_normal'] + detector.thresholds['pressure']['max_normal']) / 2
+    assert detector.score_machines(FLEET)['machine-003']['missing'] == ['pressure', 'vibration']
+    assert detector.score_machines({}) == {}
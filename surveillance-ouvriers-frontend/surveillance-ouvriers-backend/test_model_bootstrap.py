@@ -0,0 +1,49 @@
+import contextlib
+import io
+import os
+import threading
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from machine_learning import IsolationForestModel
+
+
+@pytest.fixture
+def detector():
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter('ignore')
+        yield IsolationForestModel()
+
+
+def test_generated_training_data_is_columnar(detector):
+    with contextlib.redirect_stdout(io.StringIO()):
+        frame = detector._generate_training_data('pressure', n_samples=500)
+        sample = detector.generate_sample_training_data(n_samples=600)
+
+    assert len(frame) == 500 and frame['timestamp'].dtype == np.dtype('datetime64[us]')
+    assert (np.diff(frame['timestamp'].to_numpy()) == -np.timedelta64(1, 'm')).all()
+    assert len(sample) == 600
+    assert {(data['machine_id'], data['sensor_type']) for data in sample} == {
+        (machine_id, sensor_type) for machine_id in ('machine-001', 'machine-002') for sensor_type in detector.thresholds}
+    assert isinstance(sample[0]['value'], float)
+    datetime.fromisoformat(sample[-1]['timestamp'])
+
+
+def test_cold_start_trains_missing_models_concurrently(detector, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert detector.missing_models() == list(detector.thresholds)
+
+    threads = set()
+    create = detector._create_new_model
+    monkeypatch.setattr(detector, '_create_new_model',
+                        lambda sensor_type: threads.add(threading.get_ident()) or create(sensor_type))
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector.preload()
+
+    assert len(threads) == len(detector.thresholds)
+    assert detector.missing_models() == []
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        f"model_{sensor_type}.{suffix}" for sensor_type in detector.thresholds for suffix in ('joblib', 'lut.npy'))
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from machine_learning import IsolationForestModel
+from model_registry import DEFAULT_SCOPE, ModelRegistry, machine_type_scope, sensor_scope
+
+
+def _reading(value, machine_id='machine-001', sensor_type='temperature'):
+    return {'machine_id': machine_id, 'sensor_type': sensor_type, 'value': value}
+
+
+def _forest(center, seed=0):
+    rng = np.random.RandomState(seed)
+    return IsolationForest(n_estimators=20, random_state=seed).fit(rng.normal(center, 5, (200, 1)))
+
+
+@pytest.fixture
+def make_detector(tmp_path):
+    # Les modèles d'origine sont chargés depuis le dossier du backend, le registre est temporaire
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            yield lambda: IsolationForestModel(registry_dir=str(tmp_path / 'registry'))
+    finally:
+        os.chdir(cwd)
+
+
+def test_resolve_prefers_sensor_then_machine_type_then_default(make_detector):
+    detector = make_detector()
+    registry = detector.registry
+    registry.set_machine_types({'machine-001': 'Drill Press', 'machine-002': 'Drill Press'})
+
+    registry.publish(DEFAULT_SCOPE, 'temperature', _forest(60))
+    registry.publish(machine_type_scope('Drill Press'), 'temperature', _forest(60, seed=1))
+    registry.publish(sensor_scope('machine-001'), 'temperature', _forest(60, seed=2))
+
+    assert registry.resolve('machine-001', 'temperature').label == 'sensor/machine-001/temperature@v1'
+    assert registry.resolve('machine-002', 'temperature').label == 'machine_type/Drill Press/temperature@v1'
+    assert registry.resolve('machine-003', 'temperature').label == 'default/temperature@v1'
+    assert registry.resolve('machine-003', 'pressure') is None
+    assert detector.predict(_reading(60.0, 'machine-002'))['model_version'] == 'machine_type/Drill Press/temperature@v1'
+    assert detector.predict(_reading(7.0, 'machine-001', 'pressure'))['model_version'] == 'default/pressure@legacy'
+
+
+def test_published_versions_are_reloaded_from_disk(make_detector, tmp_path):
+    detector = make_detector()
+    detector.registry.publish(DEFAULT_SCOPE, 'temperature', _forest(60))
+    assert detector.registry.publish(DEFAULT_SCOPE, 'temperature', _forest(70)) == 'default/temperature@v2'
+
+    registry = ModelRegistry(str(tmp_path / 'registry'), detector.thresholds)
+    assert registry.available() == {(DEFAULT_SCOPE, 'temperature'): ['v1', 'v2']}
+    for future in registry.load_latest():
+        future.result(timeout=30)
+    assert registry.resolve('machine-001', 'temperature').version == 'v2'
+    assert registry.load(DEFAULT_SCOPE, 'temperature', 'v1').result(timeout=30) == 'default/temperature@v1'
+    assert registry.resolve('machine-001', 'temperature').version == 'v1'
+
+
+def test_swap_under_live_traffic(make_detector):
+    detector = make_detector()
+    detector.registry.publish(DEFAULT_SCOPE, 'temperature', _forest(60))
+    detector.registry.publish(DEFAULT_SCOPE, 'temperature', _forest(65))
+    detector.registry.load(DEFAULT_SCOPE, 'temperature', 'v1').result(timeout=30)
+
+    stop = threading.Event()
+    labels, errors = [], []
+
+    def client(index):
+        try:
+            while not stop.is_set():
+                batch = [_reading(55.0 + i, f"machine-{index}-{i}") for i in range(20)]
+                labels.append({prediction['model_version'] for prediction in detector.predict_batch(batch)})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        assert detector.load_model(DEFAULT_SCOPE, 'temperature', 'v2').result(timeout=30) == 'default/temperature@v2'
+        seen = len(labels)
+        while len(labels) < seen + 8:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors
+    # Un lot est scoré entièrement avec une seule version, et les lots suivants utilisent la nouvelle
+    assert all(len(batch_labels) == 1 for batch_labels in labels)
+    assert labels[-1] == {'default/temperature@v2'}
+    assert {'default/temperature@v1'} in labels
+    assert detector.model_versions()['swaps'] == 4
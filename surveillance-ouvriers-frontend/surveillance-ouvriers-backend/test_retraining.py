@@ -0,0 +1,77 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from machine_learning import IsolationForestModel
+from retraining import ReservoirSampler, retrain_models
+
+
+def test_reservoir_keeps_everything_until_full():
+    sampler = ReservoirSampler(100, seed=0)
+    for chunk in np.array_split(np.arange(60.0), 7):
+        sampler.add(chunk)
+    assert sampler.seen == 60
+    np.testing.assert_array_equal(sampler.values(), np.arange(60.0))
+
+
+def test_reservoir_sample_is_uniform_across_chunks():
+    counts = np.zeros(1000)
+    for seed in range(300):
+        sampler = ReservoirSampler(50, seed=seed)
+        for chunk in np.array_split(np.arange(1000), 13):
+            sampler.add(chunk)
+        sample = sampler.values().astype(int)
+        assert len(sample) == 50 and len(set(sample)) == 50
+        counts[sample] += 1
+    # Chaque valeur est retenue avec probabilité 50/1000: 15 fois en moyenne sur 300 tirages
+    first, last = counts[:500].mean(), counts[500:].mean()
+    assert abs(first - 15) < 1.5 and abs(last - 15) < 1.5
+
+
+def test_reservoir_last_value_drawn_for_a_slot_wins():
+    # Même tirage que l'algorithme R lecture par lecture: la dernière valeur tirée pour une case la remplace
+    sampler = ReservoirSampler(5, seed=1)
+    sampler.add(np.arange(1000.0))
+    expected = np.arange(5.0)
+    positions = np.random.default_rng(1).integers(0, np.arange(5, 1000) + 1)
+    for value, position in zip(range(5, 1000), positions):
+        if position < 5:
+            expected[position] = value
+    np.testing.assert_array_equal(sampler.values(), expected)
+
+
+@pytest.fixture
+def detector(tmp_path):
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            yield IsolationForestModel(registry_dir=str(tmp_path / 'registry'))
+    finally:
+        os.chdir(cwd)
+
+
+def test_retrain_publishes_new_versions(detector):
+    rng = np.random.default_rng(0)
+    stored = {'temperature': rng.normal(60, 5, 25000), 'pressure': rng.normal(7, 1, 300)}
+
+    def iter_values(sensor_type, chunk_size):
+        values = stored.get(sensor_type, np.empty(0))
+        for start in range(0, len(values), chunk_size):
+            yield values[start:start + chunk_size]
+
+    report = retrain_models(detector, iter_values, sensor_types=['temperature', 'pressure'],
+                            sample_size=5000, chunk_size=4000, min_samples=1000, n_jobs=1, seed=0)
+
+    temperature = report['sensor_types']['temperature']
+    assert temperature['status'] == 'published'
+    assert (temperature['rows'], temperature['samples']) == (25000, 5000)
+    assert temperature['model_version'] == 'default/temperature@v1'
+    assert report['sensor_types']['pressure']['status'] == 'skipped'
+    assert report['wall_time_s'] > 0 and report['training_peak_rss_mb'] > 0
+
+    prediction = detector.predict({'machine_id': 'machine-001', 'sensor_type': 'temperature', 'value': 60.0})
+    assert prediction['model_version'] == 'default/temperature@v1'
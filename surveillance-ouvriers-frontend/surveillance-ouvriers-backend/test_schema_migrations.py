@@ -0,0 +1,80 @@
+import contextlib
+import io
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect, text
+
+from database import MIGRATIONS, migrate_schema
+from models import Alert, Machine, Sensor, SensorData, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    db.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def create_legacy_schema():
+    """Tables telles qu'avant les migrations: sans alerts.model_version ni index composites"""
+    db.create_all()
+    for table in (SensorData.__table__, Alert.__table__):
+        for index in table.indexes:
+            index.drop(db.engine)
+    with db.engine.begin() as connection:
+        connection.execute(text("ALTER TABLE alerts DROP COLUMN model_version"))
+
+
+def query_plan(query):
+    """Détails de EXPLAIN QUERY PLAN (SQLite) pour une requête ORM"""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def test_migrations_upgrade_legacy_schema_once(app):
+    create_legacy_schema()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert migrate_schema() == [version for version, _, _ in MIGRATIONS]
+        assert migrate_schema() == []
+
+    inspector = inspect(db.engine)
+    assert 'model_version' in {column['name'] for column in inspector.get_columns('alerts')}
+    assert {index['name'] for index in inspector.get_indexes('alerts')} >= {
+        'ix_alerts_machine_sensor_status', 'ix_alerts_status_timestamp'}
+    assert [index['column_names'] for index in inspector.get_indexes('sensor_data')] == [['sensor_id', 'timestamp']]
+    versions = db.session.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+
+def test_hot_queries_use_composite_indexes(app):
+    db.create_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate_schema()
+    machine = Machine(machine_id='machine-001', name='Alpha', type='presse', location='A')
+    db.session.add(machine)
+    db.session.flush()
+    sensor = Sensor(machine_id=machine.id, type='temperature')
+    db.session.add(sensor)
+    db.session.flush()
+    db.session.add_all([SensorData(sensor_id=sensor.id, value=float(value), timestamp=datetime(2024, 1, 1, 0, value))
+                        for value in range(50)])
+    db.session.add(Alert(machine_id=machine.id, sensor_id=sensor.id, sensor_type='temperature', value=90.0))
+    db.session.commit()
+
+    hot_queries = {
+        'ix_sensor_data_sensor_timestamp':
+            SensorData.query.filter_by(sensor_id=sensor.id).order_by(SensorData.timestamp.desc()).limit(1),
+        'ix_alerts_machine_sensor_status':
+            Alert.query.filter_by(machine_id=machine.id, sensor_type='temperature', status='active').limit(1),
+        'ix_alerts_status_timestamp':
+            Alert.query.filter(Alert.status == 'active').order_by(Alert.timestamp.desc()).limit(100)
+    }
+    for index, query in hot_queries.items():
+        plan = query_plan(query)
+        assert any(detail.startswith('SEARCH') and index in detail for detail in plan), plan
+        # Ni parcours complet de la table, ni tri temporaire: l'index fournit déjà l'ordre
+        assert not any(detail.startswith('SCAN') or 'TEMP B-TREE' in detail for detail in plan), plan
@@ -0,0 +1,52 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from machine_learning import IsolationForestModel
+
+# Écart maximal toléré entre la table de score et la forêt (en points de risque, 0-100)
+RISK_TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope='module')
+def detector():
+    # Les modèles sont chargés depuis le dossier du backend
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            yield IsolationForestModel()
+    finally:
+        os.chdir(cwd)
+
+
+def _risk(scores):
+    # Même conversion score -> risque que AdvancedAnomalyDetector.predict
+    return np.clip(50 - scores * 20, 0, 100)
+
+
+@pytest.mark.parametrize('sensor_type', ['temperature', 'pressure', 'vibration'])
+def test_table_matches_forest_within_range(detector, sensor_type):
+    table = detector.get_score_table(sensor_type)
+    model = detector.get_model(sensor_type)
+    values = np.random.default_rng(42).uniform(table.low, table.high, 20000)
+
+    table_scores, inside = table.lookup(values)
+    forest_scores = model.decision_function(values.reshape(-1, 1))
+
+    assert inside.all()
+    assert np.max(np.abs(_risk(table_scores) - _risk(forest_scores))) <= RISK_TOLERANCE
+
+
+@pytest.mark.parametrize('sensor_type', ['temperature', 'pressure', 'vibration'])
+def test_forest_fallback_outside_range(detector, sensor_type):
+    table = detector.get_score_table(sensor_type)
+    model = detector.get_model(sensor_type)
+    values = np.array([table.low - 10.0, table.low, table.high, table.high * 2])
+
+    scores = detector._decision_scores(sensor_type, values)
+
+    assert np.max(np.abs(scores - model.decision_function(values.reshape(-1, 1)))) <= RISK_TOLERANCE / 20
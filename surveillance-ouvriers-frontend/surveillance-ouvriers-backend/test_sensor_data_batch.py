@@ -0,0 +1,135 @@
+import contextlib
+import importlib
+import io
+import os
+import warnings
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def api(tmp_path_factory):
+    """Application complète (app.py) sur une base SQLite temporaire, scoring synchrone et sans planificateur"""
+    os.environ.update(SQLITE_DB=str(tmp_path_factory.mktemp('api') / 'monitoring.db'), DB_TYPE='sqlite',
+                      ASYNC_SCORING='false', SENSOR_DATA_BUFFERING='false')
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter('ignore')
+        module = importlib.import_module('app')
+    module.scheduler.shutdown(wait=False)
+    with module.app.app_context():
+        yield module
+
+
+def post_batch(api, readings):
+    response = api.app.test_client().post('/api/sensor-data/batch', json={'readings': readings})
+    return response.status_code, response.get_json()
+
+
+def test_offset_timestamps_are_stored_in_utc(api):
+    status, _ = post_batch(api, [
+        {'machine_id': 'machine-001', 'sensor_type': 'temperature', 'value': 50, 'timestamp': '2024-03-01T10:00:00+02:00'},
+        {'machine_id': 'machine-001', 'sensor_type': 'temperature', 'value': 51, 'timestamp': '2024-03-01T08:30:00Z'},
+        {'machine_id': 'machine-001', 'sensor_type': 'temperature', 'value': 52, 'timestamp': '2024-03-01T09:00:00'}])
+
+    assert status == 201
+    sensor = api.Sensor.query.join(api.Machine).filter(api.Machine.machine_id == 'machine-001',
+                                                       api.Sensor.type == 'temperature').one()
+    stored = api.SensorData.query.filter_by(sensor_id=sensor.id).order_by(api.SensorData.timestamp).all()
+    assert [(row.timestamp, row.value) for row in stored] == [
+        (datetime(2024, 3, 1, 8, 0), 50.0), (datetime(2024, 3, 1, 8, 30), 51.0), (datetime(2024, 3, 1, 9, 0), 52.0)]
+    assert sensor.latest.timestamp == datetime(2024, 3, 1, 9, 0)
+
+
+def test_readings_after_an_emergency_stop_are_not_scored(api, monkeypatch):
+    scored = []
+
+    def predict_batch(readings):
+        """Détecteur factice: risque de 99 % au-delà de 100, enregistre les lectures reçues"""
+        scored.extend(readings)
+        return [{'anomaly': reading['value'] > 100, 'risk_probability': 99.0 if reading['value'] > 100 else 10.0,
+                 'prediction': 'test', 'suggestions': []} for reading in readings]
+
+    monkeypatch.setattr(api.anomaly_model, 'predict_batch', predict_batch)
+    readings = [{'machine_id': machine_id, 'sensor_type': 'temperature', 'value': value,
+                 'timestamp': f"2024-03-01T08:0{minute}:00"}
+                for minute, (machine_id, value) in enumerate([('machine-002', 50), ('machine-001', 50),
+                                                              ('machine-002', 500), ('machine-002', 51),
+                                                              ('machine-001', 52)])]
+
+    status, body = post_batch(api, readings)
+
+    assert status == 201
+    assert [result.get('error') for result in body['results']] == [
+        None, None, None, 'Machine is in emergency stop state', None]
+    # Seules les lectures acceptées sont passées au détecteur, avec leur propre horodatage
+    assert sorted((reading['machine_id'], reading['value'], reading['timestamp']) for reading in scored) == [
+        ('machine-001', 50.0, datetime(2024, 3, 1, 8, 1)), ('machine-001', 52.0, datetime(2024, 3, 1, 8, 4)),
+        ('machine-002', 50.0, datetime(2024, 3, 1, 8, 0)), ('machine-002', 500.0, datetime(2024, 3, 1, 8, 2))]
+
+
+def test_queued_readings_are_scored_at_their_ingest_time(api, monkeypatch):
+    scored = []
+    monkeypatch.setattr(api.anomaly_model, 'predict_batch', lambda readings: scored.extend(readings) or [
+        {'anomaly': False, 'risk_probability': 10.0, 'prediction': 'test', 'suggestions': []} for _ in readings])
+    resolved = api.resolve_sensor('machine-001', 'pressure')
+    ingested = datetime(2024, 3, 1, 8, 0, 0, 125000)
+
+    api.score_sensor_readings([{'machine_id': 'machine-001', 'machine_pk': resolved.machine_pk,
+                                'sensor_pk': resolved.sensor_pk, 'sensor_type': 'pressure', 'value': 3.0,
+                                'timestamp': ingested, 'hard_stop': False}])
+
+    assert [reading['timestamp'] for reading in scored] == [ingested]
+
+
+def test_readings_rejected_by_a_full_buffer_are_not_scored(api, monkeypatch):
+    scored = []
+    monkeypatch.setattr(api.anomaly_model, 'predict', lambda reading: scored.append(reading))
+    monkeypatch.setattr(api.anomaly_model, 'predict_batch', lambda readings: scored.extend(readings) or [
+        {'anomaly': False, 'risk_probability': 10.0, 'prediction': 'test', 'suggestions': []} for _ in readings])
+    pool = api.ScoringWorkerPool(api.score_sensor_readings)
+    buffer = api.SensorDataBuffer(api.flush_sensor_readings, max_rows=1, max_buffered_rows=1, max_wait_ms=0)
+    monkeypatch.setattr(api, 'sensor_data_buffer', buffer)
+    client = api.app.test_client()
+
+    # Place pour une seule lecture du lot: la suivante est refusée, sans alerte ni scoring
+    status, body = post_batch(api, [
+        {'machine_id': 'machine-001', 'sensor_type': 'vibration', 'value': 0.5, 'timestamp': '2024-03-02T08:00:00'},
+        {'machine_id': 'machine-001', 'sensor_type': 'vibration', 'value': 0.6, 'timestamp': '2024-03-02T08:01:00'}])
+    assert status == 201 and body['accepted'] == 1
+    assert [result.get('error') for result in body['results']] == [None, 'Sensor data buffer is full, retry later']
+    assert buffer.stats()['queue_depth'] == 1
+
+    # Tampon plein: rien n'est accepté, et une lecture unitaire n'est ni analysée ni mise en file,
+    # en mode synchrone comme en mode asynchrone
+    status, _ = post_batch(api, [
+        {'machine_id': 'machine-001', 'sensor_type': 'vibration', 'value': 0.7, 'timestamp': '2024-03-02T08:02:00'}])
+    assert status == 503
+    scored.clear()
+    reading = {'machine_id': 'machine-001', 'sensor_type': 'vibration', 'value': 0.7}
+    assert client.post('/api/sensor-data', json=reading).status_code == 503
+    monkeypatch.setattr(api, 'scoring_pool', pool)
+    assert client.post('/api/sensor-data', json=reading).status_code == 503
+    assert scored == [] and pool.stats()['queue_depth'] == 0
+
+
+def test_queued_readings_after_an_emergency_stop_are_not_scored(api, monkeypatch):
+    scored = []
+    monkeypatch.setattr(api.anomaly_model, 'predict_batch', lambda readings: scored.extend(readings) or [
+        {'anomaly': reading['value'] > 100, 'risk_probability': 99.0 if reading['value'] > 100 else 10.0,
+         'prediction': 'test', 'suggestions': []} for reading in readings])
+    resolved = api.resolve_sensor('machine-003', 'temperature')
+
+    def queued(value, second):
+        return {'machine_id': 'machine-003', 'machine_pk': resolved.machine_pk, 'sensor_pk': resolved.sensor_pk,
+                'sensor_type': 'temperature', 'value': value, 'timestamp': datetime(2024, 3, 3, 8, 0, second),
+                'hard_stop': False}
+
+    # La première lecture déclenche l'arrêt: la seconde, du même micro-lot, puis celle du micro-lot
+    # suivant ne sont ni analysées ni alertées
+    api.score_sensor_readings([queued(500, 0), queued(501, 1)])
+    api.score_sensor_readings([queued(502, 2)])
+
+    assert [reading['value'] for reading in scored] == [500]
+    assert api.Machine.query.filter_by(machine_id='machine-003').one().status == 'emergency_stop'
+    assert [alert.value for alert in api.Alert.query.filter_by(machine_id=resolved.machine_pk)] == [500.0]
@@ -0,0 +1,89 @@
+import contextlib
+import io
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from database import get_latest_sensor_states, insert_sensor_readings, migrate_schema
+from models import Machine, Sensor, SensorLatest, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+@pytest.fixture
+def sensors(app):
+    """Deux machines de deux capteurs: {(machine_id, type): id du capteur}"""
+    ids = {}
+    for machine_id in ('machine-001', 'machine-002'):
+        machine = Machine(machine_id=machine_id, name=machine_id, type='presse', location='A')
+        db.session.add(machine)
+        db.session.flush()
+        for sensor_type in ('temperature', 'pressure'):
+            sensor = Sensor(machine_id=machine.id, type=sensor_type)
+            db.session.add(sensor)
+            db.session.flush()
+            ids[(machine_id, sensor_type)] = sensor.id
+    db.session.commit()
+    return ids
+
+
+def reading(sensor_id, value, minute):
+    return {'sensor_id': sensor_id, 'value': value, 'timestamp': datetime(2024, 1, 1, 12, minute)}
+
+
+def test_writes_maintain_latest_value_and_count(sensors):
+    temperature = sensors[('machine-001', 'temperature')]
+    pressure = sensors[('machine-001', 'pressure')]
+    insert_sensor_readings([reading(temperature, 50.0, 0), reading(temperature, 52.0, 2),
+                            reading(temperature, 51.0, 1), reading(pressure, 90.0, 0)])
+    db.session.commit()
+    # Lecture arrivée en retard dans un lot suivant: comptée, mais la dernière valeur est conservée
+    insert_sensor_readings([reading(temperature, 40.0, 1), reading(pressure, 95.0, 5)])
+    db.session.commit()
+
+    latest = {row.sensor_id: (row.value, row.timestamp, row.reading_count) for row in SensorLatest.query}
+    assert latest == {temperature: (52.0, datetime(2024, 1, 1, 12, 2), 4),
+                      pressure: (95.0, datetime(2024, 1, 1, 12, 5), 2)}
+
+
+def test_fleet_state_is_read_with_one_query(sensors):
+    insert_sensor_readings([reading(sensor_id, float(sensor_id), 0) for key, sensor_id in sensors.items()
+                            if key != ('machine-002', 'pressure')])
+    db.session.commit()
+    db.session.expunge_all()
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    fleet = get_latest_sensor_states()
+    states = {(machine.machine_id, sensor.type): latest and latest.value for machine, sensor, latest in fleet}
+    one_machine = get_latest_sensor_states('machine-002', sensor_types=['temperature'])
+
+    assert len(statements) == 2
+    assert states == {key: float(sensor_id) for key, sensor_id in sensors.items()} | {('machine-002', 'pressure'): None}
+    assert [(machine.machine_id, sensor.type) for machine, sensor, _ in one_machine] == [('machine-002', 'temperature')]
+
+
+def test_migration_backfills_from_existing_readings(sensors):
+    temperature = sensors[('machine-001', 'temperature')]
+    db.session.execute(text("DROP TABLE sensor_latest"))
+    db.session.execute(text("INSERT INTO sensor_data (sensor_id, value, timestamp) VALUES "
+                            "(:id, 50, '2024-01-01 12:00:00.000000'), (:id, 55, '2024-01-01 12:03:00.000000'), "
+                            "(:id, 53, '2024-01-01 12:01:00.000000')"), {'id': temperature})
+    db.session.commit()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate_schema()
+
+    rows = SensorLatest.query.all()
+    assert [(row.sensor_id, row.value, row.timestamp, row.reading_count) for row in rows] == [
+        (temperature, 55.0, datetime(2024, 1, 1, 12, 3), 3)]
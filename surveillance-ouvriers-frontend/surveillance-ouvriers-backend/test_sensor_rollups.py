@@ -0,0 +1,125 @@
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from database import get_sensor_data_timeseries, insert_sensor_readings, migrate_schema, rollup_resolution
+from models import Machine, Sensor, SensorData, SensorRollup, db
+
+START = datetime(2024, 3, 1, 22, 0, 7, 500000)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+@pytest.fixture
+def sensor_id(app):
+    machine = Machine(machine_id='machine-001', name='Alpha', type='presse', location='A')
+    db.session.add(machine)
+    db.session.flush()
+    sensor = Sensor(machine_id=machine.id, type='temperature')
+    db.session.add(sensor)
+    db.session.commit()
+    return sensor.id
+
+
+@pytest.fixture
+def readings(sensor_id):
+    """Lectures toutes les 15 s pendant 5 h (à cheval sur deux jours), écrites en lots de 100 dans le désordre"""
+    rng = np.random.default_rng(3)
+    timestamps = [START + timedelta(seconds=15 * index) for index in range(1200)]
+    values = rng.normal(50, 5, len(timestamps))
+    rows = [{'sensor_id': sensor_id, 'value': float(value), 'timestamp': timestamp}
+            for value, timestamp in zip(values, timestamps)]
+    for batch in np.array_split(rng.permutation(len(rows)), 12):
+        insert_sensor_readings([rows[index] for index in batch])
+        db.session.commit()
+    return pd.DataFrame({'timestamp': pd.to_datetime(timestamps), 'value': values})
+
+
+def rollups():
+    return {(row.resolution, row.bucket_start): (row.count, row.sum_value, row.min_value, row.max_value)
+            for row in SensorRollup.query}
+
+
+def test_writes_maintain_every_resolution(readings):
+    stored = rollups()
+    for resolution, freq in [(60, '1min'), (3600, '1h'), (86400, '1D')]:
+        expected = readings.set_index('timestamp').resample(freq)['value'].agg(['count', 'sum', 'min', 'max'])
+        expected = expected[expected['count'] > 0]
+        actual = pd.DataFrame([(bucket_start,) + values for (key, bucket_start), values in sorted(stored.items())
+                               if key == resolution], columns=['timestamp', 'count', 'sum', 'min', 'max'])
+        pd.testing.assert_frame_equal(actual.set_index('timestamp'), expected, check_exact=False,
+                                      check_names=False, check_freq=False, check_dtype=False)
+
+
+def test_timeseries_reads_coarsest_rollup_and_raw_edges_only(readings):
+    assert [rollup_resolution(step) for step in (60, 300, 3600, 7200, 86400, 10, 90)] == [
+        60, 60, 3600, 3600, 86400, None, None]
+    # Période plus courte qu'un jour: agrégats horaires
+    assert rollup_resolution(86400, START, START + timedelta(hours=5)) == 3600
+    assert rollup_resolution(3600, START, START + timedelta(minutes=50)) == 60
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2:4]))
+    start, end = START + timedelta(minutes=47, seconds=21), START + timedelta(hours=4, minutes=2, seconds=10)
+    window = readings[(readings['timestamp'] >= start) & (readings['timestamp'] <= end)].set_index('timestamp')
+    for interval, freq, resolution in [('1 minute', '1min', 60), ('5 minutes', '5min', 60),
+                                       ('2 hours', '2h', 3600), ('1 day', '1D', 3600)]:
+        statements.clear()
+        expected = window.resample(freq).agg({'value': ['mean', 'min', 'max']})
+        expected.columns = ['avg_value', 'min_value', 'max_value']
+        expected.reset_index(inplace=True)
+
+        result = get_sensor_data_timeseries('machine-001', 'temperature', start_time=start.isoformat(),
+                                            end_time=end, interval=interval)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False)
+
+        # Machine, capteur, premier intervalle puis intervalles: agrégats de la résolution choisie et
+        # lectures brutes des seuls bords de la période
+        assert len(statements) == 4
+        query, parameters = statements[-1]
+        assert 'FROM sensor_rollups' in query and 'FROM sensor_data' in query
+        assert resolution in parameters and str(start) in parameters and str(end) in parameters
+
+
+def test_migration_backfills_from_existing_readings(readings):
+    incremental = rollups()
+    db.session.execute(text("DROP TABLE sensor_rollups"))
+    db.session.commit()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate_schema()
+
+    backfilled = rollups()
+    assert backfilled.keys() == incremental.keys()
+    for key, (count, total, minimum, maximum) in incremental.items():
+        assert backfilled[key][0] == count and backfilled[key][2:] == (minimum, maximum)
+        assert backfilled[key][1] == pytest.approx(total)
+
+
+def test_deleting_a_sensor_deletes_its_rollups(readings, sensor_id):
+    other = Sensor(machine_id=db.session.get(Sensor, sensor_id).machine_id, type='pressure')
+    db.session.add(other)
+    db.session.flush()
+    insert_sensor_readings([{'sensor_id': other.id, 'value': 3.0, 'timestamp': START}])
+    db.session.commit()
+
+    # Comme admin_update_machine pour un capteur retiré de la liste
+    SensorData.query.filter_by(sensor_id=sensor_id).delete()
+    db.session.delete(db.session.get(Sensor, sensor_id))
+    db.session.commit()
+
+    assert {row.sensor_id for row in SensorRollup.query} == {other.id}
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensor_state import SensorStateStore
+
+SPAN = 50
+
+
+def _series(seed, n=300):
+    rng = np.random.default_rng(seed)
+    return 50 + np.cumsum(rng.normal(0.1, 1, n)) + rng.normal(0, 3, n)
+
+
+def _expected(values, alpha):
+    # Définitions de référence: moyennes et variances exponentielles récursives de pandas
+    series = pd.Series(values)
+    steps = series.diff().dropna()
+    ewm = dict(alpha=alpha, adjust=False)
+    return {
+        'count': len(values),
+        'mean': series.ewm(**ewm).mean().iloc[-1],
+        'variance': series.ewm(**ewm).var(bias=True).iloc[-1],
+        'last': values[-1],
+        'slope': steps.ewm(**ewm).mean().iloc[-1],
+        'slope_variance': steps.ewm(**ewm).var(bias=True).iloc[-1]
+    }
+
+
+def _assert_stats(stats, expected):
+    for name, value in expected.items():
+        assert getattr(stats, name) == pytest.approx(value, rel=1e-9, abs=1e-9), name
+
+
+def test_streaming_stats_match_exponential_window_definitions():
+    store = SensorStateStore(window=10, span=SPAN)
+    series = {store.slot(f"machine-{index}_temperature"): _series(index) for index in range(5)}
+    slots = list(series)
+    for position in range(300):
+        store.push_values(slots, [series[slot][position] for slot in slots], [float(position)] * len(slots))
+        store.push_risks(slots, [series[slot][position] / 2 for slot in slots])
+
+    for slot, values in series.items():
+        stats = store.sensor_stats(slot)
+        _assert_stats(stats, _expected(values, store.alpha))
+        risk_steps = pd.Series(values / 2).diff().dropna()
+        assert stats.risk_count == 300
+        assert stats.risk_slope == pytest.approx(risk_steps.ewm(alpha=store.alpha, adjust=False).mean().iloc[-1])
+
+
+def test_preview_matches_push_without_mutating():
+    store, reference = SensorStateStore(span=SPAN), SensorStateStore(span=SPAN)
+    values = _series(7, 40)
+    for store_ in (store, reference):
+        slot = store_.slot('machine-001_pressure')
+        for value in values:
+            store_.push_values([slot], [value], [0.0])
+    before = store.value_stats.copy()
+
+    preview = store.sensor_stats(slot, 99.0)
+    reference.push_values([slot], [99.0], [0.0])
+
+    assert preview == reference.sensor_stats(slot)
+    assert np.array_equal(store.value_stats, before)
+    assert store.sensor_stats(None, 99.0).count == 1
+
+
+def test_seed_uses_full_history_beyond_window():
+    seeded, pushed = SensorStateStore(window=10, span=SPAN), SensorStateStore(window=10, span=SPAN)
+    values = _series(3, 200)
+    risks = np.linspace(10, 60, 200)
+    slot = seeded.slot('machine-001_vibration')
+    seeded.seed(slot, values, np.arange(200.0), risks)
+    pushed.slot('machine-001_vibration')
+    for value, risk in zip(values, risks):
+        pushed.push_values([slot], [value], [0.0])
+        pushed.push_risks([slot], [risk])
+
+    assert seeded.sensor_stats(slot) == pytest.approx(pushed.sensor_stats(slot))
+    np.testing.assert_array_equal(seeded.recent_values(slot), values[-10:])
+    _assert_stats(seeded.sensor_stats(slot), _expected(values, seeded.alpha))
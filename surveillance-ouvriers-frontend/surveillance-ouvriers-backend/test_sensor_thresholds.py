@@ -0,0 +1,81 @@
+import contextlib
+import io
+import warnings
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from database import load_sensor_thresholds
+from machine_learning import IsolationForestModel
+from models import Machine, Sensor, db
+
+# Four à température normale entre 150 et 250 °C: la plage du type (35-70) ne convient pas
+OVEN = {'min_normal': 150.0, 'max_normal': 250.0, 'critical_low': 100.0, 'critical_high': 300.0}
+
+
+@pytest.fixture
+def detector():
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter('ignore')
+        yield IsolationForestModel()
+
+
+def test_sensor_thresholds_override_type_defaults(detector):
+    detector.set_sensor_thresholds({('oven-1', 'temperature'): OVEN,
+                                    ('oven-2', 'temperature'): {'critical_high': 90.0}})
+
+    assert detector.sensor_thresholds('oven-1', 'temperature') == OVEN
+    assert detector.sensor_thresholds('oven-2', 'temperature') == dict(detector.thresholds['temperature'],
+                                                                      critical_high=90.0)
+    assert detector.sensor_thresholds('machine-001', 'temperature') == detector.thresholds['temperature']
+    assert detector.is_critical('temperature', 200, 'machine-001')
+    assert not detector.is_critical('temperature', 200, 'oven-1')
+
+    readings = [{'machine_id': machine_id, 'sensor_type': 'temperature', 'value': 120.0}
+                for machine_id in ('oven-1', 'machine-001')]
+    assert detector.prediction_states(readings, [45, 45]) == ['low', 'normal']
+
+    # Retour aux seuils du type
+    detector.set_sensor_thresholds({('oven-1', 'temperature'): None})
+    assert detector.sensor_thresholds('oven-1', 'temperature') == detector.thresholds['temperature']
+
+
+def test_vectorized_threshold_detection(detector):
+    limits = np.tile([35.0, 70.0, 20.0, 85.0], (5, 1))
+    predictions, risks = detector.threshold_risks(limits, [52.5, 40.0, 77.0, 95.0, 10.0])
+
+    assert predictions.tolist() == [1, 1, -1, -1, -1]
+    assert risks == pytest.approx([10, 10 + (1 - 5 / 17.5) * 30, 65 + 7 / 35 * 25, 91, 91])
+    for sensor_limits, value, risk in zip(limits, [52.5, 40.0, 77.0, 95.0, 10.0], risks):
+        assert detector._threshold_based_detection('temperature', value, sensor_limits)[1] == pytest.approx(risk)
+
+
+def test_thresholds_compiled_from_sensors_table():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        oven = Machine(machine_id='oven-1', name='Four', type='four', location='A')
+        press = Machine(machine_id='press-1', name='Presse', type='presse', location='B')
+        db.session.add_all([oven, press])
+        db.session.flush()
+        db.session.add_all([
+            Sensor(machine_id=oven.id, type='temperature', min_value=100, max_value=300,
+                   normal_range_min=150, normal_range_max=250),
+            # Plage physique du capteur (0-15) incohérente avec la plage normale: seuils critiques du type
+            Sensor(machine_id=press.id, type='pressure', min_value=0, max_value=15,
+                   normal_range_min=60, normal_range_max=110),
+            # Sans plage normale: seuils du type
+            Sensor(machine_id=press.id, type='temperature', min_value=0, max_value=100)
+        ])
+        db.session.commit()
+
+        thresholds = load_sensor_thresholds()
+        assert load_sensor_thresholds('oven-1') == {('oven-1', 'temperature'): OVEN}
+
+    assert thresholds[('oven-1', 'temperature')] == OVEN
+    assert thresholds[('press-1', 'pressure')] == {'min_normal': 60, 'max_normal': 110, 'critical_low': 0,
+                                                   'critical_high': None}
+    assert set(thresholds[('press-1', 'temperature')].values()) == {None}
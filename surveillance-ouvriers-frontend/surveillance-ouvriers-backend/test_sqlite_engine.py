@@ -0,0 +1,82 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from database import configure_database
+from models import Machine, db
+from sqlite_engine import READER_BIND
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '2500')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    configure_database(app, sqlite_tuning=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_every_connection_gets_the_production_pragmas(app):
+    for key in (None, READER_BIND):
+        with db.engines[key].connect() as connection:
+            pragmas = {name: connection.execute(text(f"PRAGMA {name}")).scalar()
+                       for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')}
+            assert pragmas == {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 2500,
+                               'cache_size': -32768, 'mmap_size': 268435456}
+    assert db.engines[None].pool.size() == 1
+
+    # Les connexions de lecture refusent toute écriture
+    with db.engines[READER_BIND].connect() as connection, pytest.raises(OperationalError):
+        connection.execute(text("DELETE FROM machines"))
+
+
+def test_reads_use_reader_pool_until_the_transaction_writes(app):
+    statements = []
+    for key, engine in db.engines.items():
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args, key=key: statements.append((key, statement.split()[0])))
+
+    Machine.query.count()
+    db.session.add(Machine(machine_id='machine-001', name='Alpha', type='presse', location='A'))
+    # Lecture après écriture dans la même transaction: connexion d'écriture (voit le flush)
+    assert Machine.query.count() == 1
+    db.session.commit()
+    assert Machine.query.count() == 1
+
+    assert statements == [(READER_BIND, 'SELECT'), (None, 'INSERT'), (None, 'SELECT'), (READER_BIND, 'SELECT')]
+
+
+def test_queries_during_a_flush_use_the_writer(app):
+    statements = []
+    for key, engine in db.engines.items():
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args, key=key: statements.append((key, statement.split()[0])))
+    # Requête émise pendant le flush, avant toute écriture de la transaction
+    event.listen(db.session(), 'before_flush',
+                 lambda session, *args: session.execute(text("SELECT count(*) FROM machines")).scalar())
+
+    db.session.add(Machine(machine_id='machine-001', name='Alpha', type='presse', location='A'))
+    db.session.flush()
+    assert statements == [(None, 'SELECT'), (None, 'INSERT')]
+
+    # Le flush échoue: la transaction suivante lit de nouveau sur le pool de lecture
+    db.session.add(Machine(machine_id='machine-001', name='Alpha', type='presse', location='A'))
+    with pytest.raises(Exception):
+        db.session.flush()
+    db.session.rollback()
+    statements.clear()
+    Machine.query.count()
+    assert statements == [(READER_BIND, 'SELECT')]
+
+
+def test_profile_only_applies_to_sqlite_files():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    configure_database(app, sqlite_tuning=True)
+    with app.app_context():
+        assert list(db.engines) == [None]
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from database import get_anomaly_count_by_machine, get_sensor_data_timeseries, insert_sensor_readings, parse_interval
+from models import Alert, Machine, Sensor, db
+
+START = datetime(2024, 3, 1, 8, 0, 3, 250000)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+@pytest.fixture
+def readings(app):
+    """Lectures toutes les 10 s pendant 3 h, avec une interruption d'une heure, et alertes de deux machines"""
+    rng = np.random.default_rng(7)
+    machines = [Machine(machine_id=f"machine-00{index}", name=str(index), type='presse', location='A')
+                for index in (1, 2)]
+    db.session.add_all(machines)
+    db.session.flush()
+    sensor = Sensor(machine_id=machines[0].id, type='temperature')
+    db.session.add(sensor)
+    db.session.flush()
+    timestamps = [START + timedelta(seconds=10 * index) for index in range(1080) if not 300 <= index < 660]
+    values = rng.normal(50, 5, len(timestamps))
+    insert_sensor_readings([{'sensor_id': sensor.id, 'value': float(value), 'timestamp': timestamp}
+                            for value, timestamp in zip(values, timestamps)])
+    db.session.add_all([Alert(machine_id=machines[index % 2].id, sensor_id=sensor.id, value=90.0,
+                              timestamp=START + timedelta(minutes=7 * index)) for index in range(25)])
+    db.session.commit()
+    return pd.DataFrame({'timestamp': pd.to_datetime(timestamps), 'value': values})
+
+
+def test_sensor_buckets_match_pandas_resample(readings):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    for interval, freq in [('1 minute', '1min'), ('5 minutes', '5min'), ('1 hour', '1h'), ('10s', '10s')]:
+        expected = readings.set_index('timestamp').resample(freq).agg({'value': ['mean', 'min', 'max']})
+        expected.columns = ['avg_value', 'min_value', 'max_value']
+        expected.reset_index(inplace=True)
+
+        result = get_sensor_data_timeseries('machine-001', 'temperature', interval=interval)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False)
+
+    # Seules les lignes agrégées sont lues (recherche de la machine, du capteur, premier intervalle, intervalles),
+    # à partir de sensor_rollups pour les multiples d'une minute et de sensor_data pour '10s'
+    assert len(statements) == 4 * 4
+    assert sum('FROM sensor_rollups' in statement for statement in statements) == 3 * 2
+
+    window = get_sensor_data_timeseries('machine-001', 'temperature', start_time='2024-03-01T08:10:00',
+                                        end_time=(START + timedelta(minutes=30)).isoformat(), interval='5 minutes')
+    assert window['timestamp'].tolist() == [pd.Timestamp(2024, 3, 1, 8, minute) for minute in (10, 15, 20, 25, 30)]
+
+
+def test_anomaly_counts_match_pandas_grouper(readings):
+    alerts = pd.DataFrame({'timestamp': pd.to_datetime([START + timedelta(minutes=7 * index) for index in range(25)]),
+                           'machine_id': [f"machine-00{index % 2 + 1}" for index in range(25)]}).set_index('timestamp')
+    for interval, freq in [('1 hour', '1h'), ('15 minutes', '15min')]:
+        expected = alerts.groupby([pd.Grouper(freq=freq), 'machine_id']).size().reset_index(name='anomaly_count')
+        pd.testing.assert_frame_equal(get_anomaly_count_by_machine(interval=interval), expected)
+
+    assert get_anomaly_count_by_machine(start_time=datetime(2025, 1, 1)).empty
+
+
+def test_interval_parsing():
+    assert [parse_interval(interval) for interval in ('1 minute', '5 minutes', '1 hour', '10s', '1D')] == [
+        60, 300, 3600, 10, 86400]
+    for interval in ('soon', '500ms'):
+        with pytest.raises(ValueError):
+            parse_interval(interval)